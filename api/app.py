@@ -1,21 +1,69 @@
-from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import logging
+import os
+import signal
+import tempfile
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Literal
 
 import numpy as np
-import onnxruntime as ort
-from fastapi import FastAPI, HTTPException
+from fastapi import APIRouter, Body, Depends, FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
-from api.database import close_db, get_predictions, init_db, is_db_enabled
-from api.middleware import LOG_DIR, PredictionLoggingMiddleware
+from api import drift, metrics, profiling
+from api.batching import MicroBatcher
+from api.cache import PredictionCache
+from api.database import (
+    close_db,
+    get_labeled_reference,
+    get_prediction_summary,
+    get_predictions,
+    init_db,
+    is_db_enabled,
+)
+from api.inference import SessionPool
+from api.registry import (
+    ModelRegistry,
+    ModelVersion,
+    background_pool,
+    load_registry,
+    manifest_from_env,
+    read_thresholds,
+    write_threshold,
+)
+from api.tree_backend import TreeEnsemblePredictor
+from api.log_writer import log_predictions, start_log_writer, stop_log_writer
+from api.parsing import FeatureParser, JSONRoute, request_body, validate
+from api.shadow import ShadowScorer
 from api.schemas import (
+    MAX_BATCH_SIZE,
+    BatchPredictionRequest,
+    BatchPredictionResponse,
     CreditFeatures,
+    DriftReport,
     HealthResponse,
+    ModelVersionInfo,
+    OutcomeAnalysisRequest,
     PredictionLog,
     PredictionResponse,
+    PredictionSummary,
+    ThresholdAnalysis,
+    ThresholdUpdate,
 )
+from api.telemetry import RequestMetricsMiddleware, observe_validation, stage
+from api.thresholds import COST_FN, COST_FP, GRID_STEP, ThresholdCurve, analyze
+
+logger = logging.getLogger(__name__)
 
 ONNX_MODEL_PATH = Path("results/lightgbm_optimized.onnx")
+TREE_MODEL_PATH = Path("results/lightgbm_optimized_trees.npz")
 OPTIMAL_THRESHOLD = 0.10
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+MAX_PROFILE_SECONDS = 300
 
 FEATURE_ORDER = [
     "EXT_SOURCES_MEAN",
@@ -31,16 +79,166 @@ FEATURE_ORDER = [
 ]
 
 session = None
+predictor: SessionPool | TreeEnsemblePredictor | None = None
+batcher: MicroBatcher | None = None
+registry: ModelRegistry | None = None
+shadow_scorer: ShadowScorer | None = None
+prediction_cache: PredictionCache | None = None
+reload_lock = asyncio.Lock()
+# Reference-data curve of each version, scored once per loaded model.
+threshold_curves: dict[str, tuple[ModelVersion, ThresholdCurve]] = {}
+threshold_lock = asyncio.Lock()
+drift_loader: asyncio.Task | None = None
+feature_parser = FeatureParser(CreditFeatures, FEATURE_ORDER)
+
+
+def load_models() -> ModelRegistry:
+    return load_registry(manifest_from_env(), ONNX_MODEL_PATH, TREE_MODEL_PATH, OPTIMAL_THRESHOLD, FEATURE_ORDER)
+
+
+def activate(new_registry: ModelRegistry) -> tuple[ModelRegistry | None, ShadowScorer | None]:
+    global registry, predictor, batcher, session, shadow_scorer
+    if os.environ.get("MICRO_BATCHING", "0") == "1":
+        for version in new_registry.versions.values():
+            version.start_batching(
+                max_batch_size=int(os.environ.get("MICRO_BATCH_MAX_SIZE", "64")),
+                max_wait_ms=float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", "2")),
+                max_queue_size=int(os.environ.get("MICRO_BATCH_QUEUE_SIZE", "1024")),
+            )
+    previous_shadow, shadow_scorer = shadow_scorer, None
+    if new_registry.shadows:
+        shadow_scorer = ShadowScorer(
+            list(new_registry.shadows.values()),
+            max_queue_rows=int(os.environ.get("SHADOW_QUEUE_ROWS", "10000")),
+            max_batch_size=int(os.environ.get("SHADOW_BATCH_SIZE", "256")),
+            sample_rate=float(os.environ.get("SHADOW_SAMPLE_RATE", "1.0")),
+            replay_interval=float(os.environ.get("LOG_REPLAY_INTERVAL", "30")),
+        )
+        shadow_scorer.start()
+    previous, registry = registry, new_registry
+    predictor = registry.default.predictor
+    batcher = registry.default.batcher
+    session = predictor.sessions[0] if isinstance(predictor, SessionPool) else None
+    if prediction_cache is not None:
+        prediction_cache.clear()
+    threshold_curves.clear()
+    return previous, previous_shadow
+
+
+async def load_drift_reference(version: ModelVersion):
+    # The reference probabilities come from the default model, so the
+    # reference is rebuilt when another one is loaded.
+    model = await asyncio.to_thread(drift.model_fingerprint, version.name, version.path)
+    await drift.load_reference(version.run, int(os.environ.get("DRIFT_REFERENCE_ROWS", "50000")), model)
+
+
+def start_drift_monitoring():
+    global drift_loader
+    if not is_db_enabled() or os.environ.get("DRIFT_MONITORING", "1") != "1":
+        return
+    if drift_loader is not None:
+        drift_loader.cancel()
+    drift_loader = asyncio.create_task(load_drift_reference(registry.default))
+
+
+async def stop_drift_monitoring():
+    global drift_loader
+    if drift_loader is not None:
+        drift_loader.cancel()
+        with suppress(asyncio.CancelledError):
+            await drift_loader
+        drift_loader = None
+
+
+async def retire(models: ModelRegistry, shadow: ShadowScorer | None):
+    if shadow is not None:
+        await shadow.stop()
+    await models.close()
+
+
+async def reload_models() -> ModelRegistry:
+    async with reload_lock:
+        previous, previous_shadow = activate(await asyncio.to_thread(load_models))
+    logger.info("Loaded model versions %s (default %s)", list(registry.versions), registry.default.name)
+    start_drift_monitoring()
+    await retire(previous, previous_shadow)
+    return registry
+
+
+def reload_on_signal():
+    def done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Model reload failed — keeping the current models", exc_info=task.exception())
+
+    asyncio.ensure_future(reload_models()).add_done_callback(done)
+
+
+async def reload_thresholds():
+    # Thresholds only, from the manifest another worker just wrote: the loaded
+    # sessions and the cached reference curves stay valid.
+    manifest = manifest_from_env()
+    if manifest is None:
+        return
+    thresholds = await asyncio.to_thread(read_thresholds, manifest)
+    async with reload_lock:
+        for version in [*registry.versions.values(), *registry.shadows.values()]:
+            version.threshold = thresholds.get(version.name, version.threshold)
+    logger.info("Reloaded model thresholds from %s", manifest)
+
+
+def reload_thresholds_on_signal():
+    def done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Threshold reload failed — keeping the current thresholds", exc_info=task.exception())
+
+    asyncio.ensure_future(reload_thresholds()).add_done_callback(done)
+
+
+def notify_workers():
+    # api.serve forwards SIGUSR1 to every worker, this one included.
+    supervisor = os.environ.get("API_SUPERVISOR_PID")
+    if supervisor:
+        os.kill(int(supervisor), signal.SIGUSR1)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global session
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
-    session = ort.InferenceSession(str(ONNX_MODEL_PATH))
+    global session, predictor, batcher, registry, prediction_cache, shadow_scorer
+    metrics_snapshots = metrics.start_snapshots()
+    drift_snapshots = drift.start_snapshots()
+    if int(os.environ.get("PREDICTION_CACHE_SIZE", "0")) > 0:
+        prediction_cache = PredictionCache(
+            max_size=int(os.environ["PREDICTION_CACHE_SIZE"]),
+            ttl=float(os.environ.get("PREDICTION_CACHE_TTL", "300")),
+            quantization_bits=int(os.environ.get("PREDICTION_CACHE_QUANTIZATION_BITS", "0")),
+        )
+    activate(load_models())
+    loop = asyncio.get_running_loop()
+    # Signal handlers can only be installed from the main thread (not under TestClient).
+    with suppress(NotImplementedError, RuntimeError, ValueError):
+        loop.add_signal_handler(signal.SIGHUP, reload_on_signal)
+        loop.add_signal_handler(signal.SIGUSR1, reload_thresholds_on_signal)
     await init_db()
+    start_log_writer()
+    start_drift_monitoring()
     yield
+    with suppress(NotImplementedError, RuntimeError, ValueError):
+        loop.remove_signal_handler(signal.SIGHUP)
+        loop.remove_signal_handler(signal.SIGUSR1)
+    await stop_drift_monitoring()
+    async with reload_lock:
+        await retire(registry, shadow_scorer)
+    await stop_log_writer()
+    drift.stop_snapshots(drift_snapshots)
+    drift.set_monitor(None)
     await close_db()
+    registry = None
+    shadow_scorer = None
+    predictor = None
+    batcher = None
+    prediction_cache = None
+    session = None
+    metrics.stop_snapshots(metrics_snapshots)
 
 
 app = FastAPI(
@@ -49,37 +247,157 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan,
 )
-app.add_middleware(PredictionLoggingMiddleware)
+# JSON bodies are decoded with pydantic-core rather than json.loads.
+app.router.route_class = JSONRoute
+app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.get("/health", response_model=HealthResponse)
 def health():
     return HealthResponse(
         status="healthy",
-        model_loaded=session is not None,
+        model_loaded=predictor is not None,
     )
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/monitoring/drift", response_model=DriftReport)
+async def drift_report():
+    monitor = drift.get_monitor()
+    if monitor is None:
+        raise HTTPException(status_code=503, detail="Drift reference data not available")
+    return monitor.report()
+
+
+def parse_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        timestamp, row_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="before must be '<ISO timestamp>,<id>'")
+
+
 @app.get("/predictions", response_model=list[PredictionLog])
-async def list_predictions(limit: int = 50, offset: int = 0):
+async def list_predictions(
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    before: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    decision: Literal["approved", "denied"] | None = None,
+):
+    cursor = parse_cursor(before) if before is not None else None
     if not is_db_enabled():
         raise HTTPException(status_code=503, detail="Database not available")
-    return await get_predictions(limit=limit, offset=offset)
 
+    rows = await get_predictions(limit, offset, cursor, start, end, decision)
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = f"{last['timestamp'].isoformat()},{last['id']}"
+    return rows
 
-@app.post("/predict", response_model=PredictionResponse)
-def predict(features: CreditFeatures):
-    if session is None:
+
+@app.get("/predictions/summary", response_model=PredictionSummary)
+async def predictions_summary(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    bucket: Literal["hour", "day", "week", "month"] = "day",
+):
+    if not is_db_enabled():
+        raise HTTPException(status_code=503, detail="Database not available")
+    return await get_prediction_summary(start, end, bucket)
+
+
+@app.get("/models", response_model=list[ModelVersionInfo])
+def list_models():
+    if registry is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
+    return describe_models(registry)
 
-    data = features.model_dump()
-    row = np.array([[data[f] for f in FEATURE_ORDER]], dtype=np.float32)
 
-    input_name = session.get_inputs()[0].name
-    result = session.run(None, {input_name: row})
-    probability = float(result[1][0][1])
+def describe_models(models: ModelRegistry) -> list[ModelVersionInfo]:
+    return [
+        ModelVersionInfo(
+            name=version.name,
+            threshold=version.threshold,
+            traffic=version.traffic,
+            features=version.features,
+            default=version is models.default,
+            shadow=version.shadow,
+        )
+        for version in [*models.versions.values(), *models.shadows.values()]
+    ]
 
-    prediction = int(probability >= OPTIMAL_THRESHOLD)
+
+def select_version(name: str | None) -> ModelVersion:
+    if registry is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    try:
+        return registry.select(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version {name!r}")
+
+
+def find_version(name: str) -> ModelVersion:
+    # Served or shadow version, by name.
+    if registry is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    version = registry.versions.get(name) or registry.shadows.get(name)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Unknown model version {name!r}")
+    return version
+
+
+async def reference_curve(version: ModelVersion) -> ThresholdCurve | None:
+    async with threshold_lock:
+        cached = threshold_curves.get(version.name)
+        if cached is not None and cached[0] is version:
+            return cached[1]
+        rows = await get_labeled_reference(int(os.environ.get("THRESHOLD_REFERENCE_ROWS", "50000")) or None)
+        if not rows:
+            return None
+        data = await asyncio.to_thread(np.array, rows, np.float64)
+        # Scored on a session of its own, like shadow versions, so that an
+        # analysis never holds up the pool serving predictions.
+        scorer = await asyncio.to_thread(background_pool, version.path, "threshold_model_run")
+        try:
+            probabilities = await scorer.run(version.inputs(data[:, :-1].astype(np.float32)))
+        finally:
+            await asyncio.to_thread(scorer.close)
+        curve = await asyncio.to_thread(ThresholdCurve, probabilities, data[:, -1])
+        threshold_curves[version.name] = (version, curve)
+        return curve
+
+
+@app.get("/models/{name}/thresholds", response_model=ThresholdAnalysis)
+async def model_thresholds(
+    name: str,
+    cost_fp: float = Query(COST_FP, ge=0),
+    cost_fn: float = Query(COST_FN, ge=0),
+    step: float = Query(GRID_STEP, gt=0, le=0.5),
+):
+    version = find_version(name)
+    if not is_db_enabled():
+        raise HTTPException(status_code=503, detail="Database not available")
+    curve = await reference_curve(version)
+    if curve is None:
+        raise HTTPException(status_code=503, detail="Labeled reference data not available")
+    return await asyncio.to_thread(analyze, curve, cost_fp, cost_fn, step, version.threshold)
+
+
+@app.post("/thresholds/analysis", response_model=ThresholdAnalysis)
+async def outcome_thresholds(outcomes: OutcomeAnalysisRequest):
+    curve = await asyncio.to_thread(ThresholdCurve, outcomes.probabilities, outcomes.labels)
+    return analyze(curve, outcomes.cost_fp, outcomes.cost_fn, outcomes.step)
+
+
+def to_response(probability: float, threshold: float = OPTIMAL_THRESHOLD) -> PredictionResponse:
+    prediction = int(probability >= threshold)
     credit_decision = "denied" if prediction == 1 else "approved"
 
     return PredictionResponse(
@@ -87,3 +405,167 @@ def predict(features: CreditFeatures):
         probability_default=round(probability, 6),
         credit_decision=credit_decision,
     )
+
+
+@app.post("/predict", response_model=PredictionResponse)
+async def predict(features: CreditFeatures, response: Response, x_model_version: str | None = Header(None)):
+    observe_validation()
+    version = select_version(x_model_version)
+    response.headers["X-Model-Version"] = version.name
+
+    with stage("array_build"):
+        data = features.model_dump()
+        row = np.array([[data[f] for f in FEATURE_ORDER]], dtype=np.float32)
+
+    cache_key = None
+    if prediction_cache is not None:
+        cache_key = prediction_cache.key(row, version.name)
+        probability = prediction_cache.get(cache_key)
+        if probability is not None:
+            result = to_response(probability, version.threshold)
+            with stage("log_enqueue"):
+                await log_predictions([data], [result], cached=True, model_version=version.name)
+            if shadow_scorer is not None:
+                shadow_scorer.submit([data], row, version, [probability])
+            return result
+
+    with version.use(), stage("inference"):
+        probability = await version.score(row)
+    if cache_key is not None:
+        prediction_cache.put(cache_key, probability)
+
+    result = to_response(probability, version.threshold)
+    with stage("log_enqueue"):
+        await log_predictions([data], [result], model_version=version.name)
+    if shadow_scorer is not None:
+        shadow_scorer.submit([data], row, version, [probability])
+    return result
+
+
+def parse_batch(payload) -> np.ndarray:
+    applicants = payload.get("applicants") if type(payload) is dict else None
+    if type(applicants) is list and 0 < len(applicants) <= MAX_BATCH_SIZE:
+        checked = feature_parser.check(applicants)
+        if checked is not None:
+            return checked
+    batch = validate(BatchPredictionRequest, payload)
+    return feature_parser.check([applicant.model_dump() for applicant in batch.applicants])
+
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse, openapi_extra=request_body(BatchPredictionRequest))
+async def predict_batch(response: Response, payload: Any = Body(), x_model_version: str | None = Header(None)):
+    # The body is checked by FeatureParser, not by FastAPI (see api.parsing).
+    checked = await run_in_threadpool(parse_batch, payload)
+    observe_validation()
+    version = select_version(x_model_version)
+    response.headers["X-Model-Version"] = version.name
+
+    with version.use():
+        with stage("array_build"):
+            inputs, rows = await run_in_threadpool(feature_parser.rows, checked)
+        with stage("inference"):
+            probabilities = await version.run(rows)
+    probabilities = probabilities.tolist()
+    responses = [to_response(p, version.threshold) for p in probabilities]
+
+    with stage("log_enqueue"):
+        await log_predictions(inputs, responses, model_version=version.name)
+    if shadow_scorer is not None:
+        shadow_scorer.submit(inputs, rows, version, probabilities)
+    return BatchPredictionResponse(predictions=responses)
+
+
+def require_admin(authorization: str | None = Header(None)):
+    # Compared as bytes: compare_digest rejects non-ASCII str, and header
+    # values are the latin-1 decoding of the bytes the client sent.
+    sent = (authorization or "").encode("latin-1")
+    if not ADMIN_TOKEN or not hmac.compare_digest(sent, f"Bearer {ADMIN_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Admin token required")
+
+
+admin = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)], include_in_schema=False)
+profiling_lock = asyncio.Lock()
+
+
+@asynccontextmanager
+async def profiling_window():
+    if profiling_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profiling_lock:
+        yield
+
+
+@admin.post("/profile/stacks", response_class=PlainTextResponse)
+async def profile_stacks(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    async with profiling_window():
+        folded = await asyncio.to_thread(profiling.sample_stacks, seconds, interval_ms / 1000)
+    return PlainTextResponse(folded)
+
+
+@admin.post("/profile/cprofile")
+async def profile_cprofile(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    format: Literal["pstats", "text"] = "pstats",
+    sort: Literal["cumulative", "tottime", "calls"] = "cumulative",
+    limit: int = Query(50, ge=1),
+):
+    async with profiling_window():
+        stats = await profiling.profile_calls(seconds)
+    if format == "text":
+        return PlainTextResponse(profiling.format_stats(stats, sort, limit))
+    return Response(
+        profiling.dump_stats(stats),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="api.pstats"'},
+    )
+
+
+@admin.post("/models/reload", response_model=list[ModelVersionInfo])
+async def reload_model_versions():
+    try:
+        models = await reload_models()
+    except Exception as exc:
+        logger.exception("Model reload failed — keeping the current models")
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {exc}")
+    return describe_models(models)
+
+
+@admin.put("/models/{name}/threshold", response_model=list[ModelVersionInfo])
+async def update_threshold(name: str, update: ThresholdUpdate, persist: bool = True):
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    async with reload_lock:
+        version = find_version(name)
+        manifest = manifest_from_env()
+        if workers > 1 and (manifest is None or not persist or not os.environ.get("API_SUPERVISOR_PID")):
+            # The other workers only learn of the change through the manifest,
+            # when api.serve forwards the signal to them.
+            raise HTTPException(
+                status_code=409,
+                detail=f"Changing a threshold across {workers} workers needs api.serve, MODEL_MANIFEST and persist=true",
+            )
+        if persist and manifest is not None:
+            try:
+                await asyncio.to_thread(write_threshold, manifest, name, update.threshold)
+            except (OSError, KeyError, ValueError) as exc:
+                raise HTTPException(status_code=409, detail=f"Could not update the manifest: {exc}")
+        version.threshold = update.threshold
+    if workers > 1:
+        notify_workers()
+    logger.info("Threshold of model version %s set to %s", name, update.threshold)
+    return describe_models(registry)
+
+
+@admin.post("/profile/onnx")
+async def profile_onnx(seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS)):
+    if not isinstance(predictor, SessionPool):
+        raise HTTPException(status_code=409, detail="ONNX Runtime profiling needs INFERENCE_BACKEND=onnxruntime")
+    async with profiling_window():
+        with tempfile.TemporaryDirectory() as directory:
+            return await predictor.profile_operators(seconds, Path(directory))
+
+
+if ADMIN_TOKEN:
+    app.include_router(admin)
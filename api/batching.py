@@ -0,0 +1,135 @@
+"""Dynamic micro-batching for single-row predictions.
+
+Concurrent ``/predict`` calls each submit a (1, 10) row. A single scheduler
+task collects rows until ``max_batch_size`` is reached or ``max_wait_ms`` has
+elapsed since the first row of the batch arrived, scores the stacked matrix
+with one awaited call, and resolves each caller's future. At most
+``max_concurrent_batches`` batches are in flight; while all slots are busy,
+new rows keep accumulating into the next batch.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+import numpy as np
+
+from api.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = Histogram(
+    "micro_batch_size",
+    "Number of rows scored per micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+BATCH_WAIT_SECONDS = Histogram(
+    "micro_batch_wait_seconds",
+    "Time a row spent queued before its micro-batch was dispatched",
+)
+QUEUE_DEPTH = Gauge("micro_batch_queue_depth", "Rows waiting for the micro-batch scheduler")
+BATCHES = Counter("micro_batches", "Micro-batches dispatched to the model")
+
+# Every served model version has its own batcher; the gauge sums their queues.
+_running: set["MicroBatcher"] = set()
+QUEUE_DEPTH.set_function(lambda: sum(batcher._queue.qsize() for batcher in _running))
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        score: Callable[[np.ndarray], Awaitable[np.ndarray]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_queue_size: int = 1024,
+        max_concurrent_batches: int = 1,
+    ):
+        self.score = score
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._slots = asyncio.Semaphore(max_concurrent_batches)
+        self._task: asyncio.Task | None = None
+        self._in_flight: set[asyncio.Task] = set()
+
+    def start(self):
+        _running.add(self)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        _running.discard(self)
+
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    async def submit(self, row: np.ndarray) -> float:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, time.perf_counter(), future))
+        return await future
+
+    async def _collect(self) -> list[tuple]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            batch = await self._collect()
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: list[tuple]):
+        try:
+            dispatched = time.perf_counter()
+            for _, enqueued, _ in batch:
+                BATCH_WAIT_SECONDS.observe(dispatched - enqueued)
+            BATCH_SIZE.observe(len(batch))
+            BATCHES.inc()
+
+            rows = np.concatenate([row for row, _, _ in batch])
+            try:
+                probabilities = await self.score(rows)
+            except Exception as exc:
+                logger.exception("Micro-batch inference failed")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+
+            for (_, _, future), probability in zip(batch, probabilities.tolist()):
+                if not future.done():
+                    future.set_result(probability)
+        finally:
+            self._slots.release()
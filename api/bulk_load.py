@@ -0,0 +1,172 @@
+"""Bulk-load CSV, Parquet or JSONL files into PostgreSQL with COPY.
+
+Files are read in chunks of ``--chunk-size`` rows and each chunk is streamed
+through binary ``COPY ... FROM STDIN``, so memory stays bounded by the chunk
+whatever the file size and values are never formatted as text. Columns are matched to the target table by name.
+Prediction logs in the JSONL format of the API fallback log, plain or as
+compressed ``.jsonl.gz``/``.jsonl.zst`` segments, have their nested
+``input_features`` flattened into the typed feature columns. The whole load is
+one transaction.
+
+With ``--rebuild-indexes``, secondary indexes of the target table are dropped
+before loading and recreated afterwards, which is much faster than updating
+them row by row. The table is analyzed after every load.
+
+Usage:
+    uv run --extra api python -m api.bulk_load data/dataset_top10_features_data.csv --table reference_data --truncate
+    uv run --extra api python -m api.bulk_load logs/predictions.jsonl --table predictions --rebuild-indexes
+"""
+
+import argparse
+import os
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import pandas as pd
+import psycopg
+from dotenv import load_dotenv
+from psycopg import sql
+
+from sqlalchemy import Boolean, DateTime, Double, Integer, SmallInteger, String
+
+from api.database import FEATURE_TYPES, metadata
+
+load_dotenv()
+
+CHUNK_SIZE = 100_000
+# Binary COPY needs the exact PostgreSQL type of every column.
+COPY_TYPES = {
+    Boolean: "bool",
+    DateTime: "timestamptz",
+    Double: "float8",
+    Integer: "int4",
+    SmallInteger: "int2",
+    String: "text",
+}
+
+
+def read_chunks(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    suffix = path.suffix.lower()
+    if suffix in (".gz", ".zst"):
+        # Compressed CSV or JSONL, such as rotated API log segments; pandas
+        # decompresses based on the extension.
+        suffix = Path(path.stem).suffix.lower()
+    if suffix == ".csv":
+        chunks = pd.read_csv(path, chunksize=chunk_size)
+    elif suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    elif suffix in (".jsonl", ".json"):
+        chunks = pd.read_json(
+            path, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False, precise_float=True
+        )
+    else:
+        raise ValueError(f"Unsupported file type {path.suffix!r}: expected .csv, .parquet or .jsonl")
+    for chunk in chunks:
+        yield normalize(chunk)
+
+
+def normalize(chunk: pd.DataFrame) -> pd.DataFrame:
+    if "timestamp" in chunk and not pd.api.types.is_datetime64_any_dtype(chunk["timestamp"]):
+        chunk["timestamp"] = pd.to_datetime(chunk["timestamp"], utc=True, format="ISO8601")
+    if "cached" in chunk:
+        # Logs written before the result cache existed have no cache hits.
+        chunk["cached"] = chunk["cached"].eq(True)
+    if "input_features" not in chunk:
+        return chunk
+    features = pd.DataFrame(chunk.pop("input_features").tolist(), index=chunk.index)
+    return chunk.join(features[[name for name in FEATURE_TYPES if name in features]])
+
+
+def copy_frames(conn: psycopg.Connection, table: str, frames: Iterable[pd.DataFrame], progress=None) -> int:
+    table_types = {
+        column.name: COPY_TYPES[type(column.type)]
+        for column in metadata.tables[table].columns
+        if column.name != "id" and type(column.type) in COPY_TYPES
+    }
+    rows = 0
+    for frame in frames:
+        columns = [name for name in table_types if name in frame.columns]
+        statement = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT binary)").format(
+            sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+        )
+        frame = frame[columns]
+        if frame.isna().values.any():
+            # NaN/NaT from missing values would be written as NaN or rejected.
+            frame = frame.astype(object).where(frame.notna(), None)
+        with conn.cursor().copy(statement) as copy:
+            copy.set_types([table_types[name] for name in columns])
+            for row in frame.itertuples(index=False, name=None):
+                copy.write_row(row)
+        rows += len(frame)
+        if progress is not None:
+            progress(rows)
+    return rows
+
+
+def drop_secondary_indexes(conn: psycopg.Connection, table: str) -> list[str]:
+    # Constraint-backed indexes (the primary key) stay; the rest are recreated
+    # from their definitions after the load.
+    definitions = conn.execute(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "WHERE i.schemaname = current_schema() AND i.tablename = %s "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)",
+        (table,),
+    ).fetchall()
+    for name, _ in definitions:
+        conn.execute(sql.SQL("DROP INDEX {}").format(sql.Identifier(name)))
+    # A partitioned parent reports "ON ONLY", which would not cascade to partitions.
+    return [definition.replace(" ON ONLY ", " ON ") for _, definition in definitions]
+
+
+def bulk_load(
+    conn: psycopg.Connection,
+    paths: list[Path],
+    table: str,
+    chunk_size: int = CHUNK_SIZE,
+    truncate: bool = False,
+    rebuild_indexes: bool = False,
+    progress=None,
+) -> int:
+    if truncate:
+        conn.execute(sql.SQL("TRUNCATE TABLE {}").format(sql.Identifier(table)))
+    indexes = drop_secondary_indexes(conn, table) if rebuild_indexes else []
+    frames = (chunk for path in paths for chunk in read_chunks(path, chunk_size))
+    rows = copy_frames(conn, table, frames, progress)
+    for definition in indexes:
+        conn.execute(definition)
+    conn.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table)))
+    return rows
+
+
+def connection_url() -> str:
+    return os.environ["DATABASE_URL"].replace("postgresql+psycopg://", "postgresql://", 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load CSV, Parquet or JSONL files into PostgreSQL with COPY.")
+    parser.add_argument("paths", type=Path, nargs="+")
+    parser.add_argument("--table", choices=["reference_data", "predictions"], required=True)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--truncate", action="store_true", help="Empty the table first")
+    parser.add_argument("--rebuild-indexes", action="store_true", help="Drop secondary indexes during the load")
+    args = parser.parse_args()
+
+    url = connection_url()
+    started = time.perf_counter()
+
+    def progress(rows: int):
+        print(f"  {rows:,} rows ({rows / (time.perf_counter() - started):,.0f} rows/s)")
+
+    print(f"Loading {len(args.paths)} file(s) into {args.table}...")
+    with psycopg.connect(url) as conn:
+        total = bulk_load(conn, args.paths, args.table, args.chunk_size, args.truncate, args.rebuild_indexes, progress)
+
+    elapsed = time.perf_counter() - started
+    print(f"\nLoaded {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""LRU + TTL cache of model outputs keyed on the feature vector.
+
+The key is the model version name followed by the raw bytes of the (1, 10)
+float32 row in ``FEATURE_ORDER``, so payloads that differ only in JSON key
+order or number formatting share an entry. With ``quantization_bits`` > 0, that many low mantissa bits are
+cleared first, so values within a relative ~2**(bits - 23) of each other hit
+the same entry. The cache stores probabilities, not decisions, so threshold
+changes take effect immediately; call ``clear()`` whenever the model changes.
+"""
+
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from api.metrics import Counter, Gauge
+
+HITS = Counter("prediction_cache_hits", "Predictions served from the cache")
+MISSES = Counter("prediction_cache_misses", "Predictions not found in the cache")
+EVICTIONS = Counter("prediction_cache_evictions", "Cache entries evicted because the cache was full")
+SIZE = Gauge("prediction_cache_size", "Entries currently in the prediction cache")
+
+
+class PredictionCache:
+    def __init__(self, max_size: int = 10_000, ttl: float = 300.0, quantization_bits: int = 0):
+        # Beyond 23 bits the exponent would be cleared too; 0 keeps keys exact.
+        if not 0 <= quantization_bits <= 23:
+            raise ValueError(f"Unknown quantization_bits {quantization_bits!r}: expected 0 (exact) to 23")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._mask = np.uint32((0xFFFFFFFF << quantization_bits) & 0xFFFFFFFF)
+        self._entries: OrderedDict[bytes, tuple[float, float]] = OrderedDict()
+        SIZE.set_function(lambda: len(self._entries))
+
+    def key(self, row: np.ndarray, model_version: str = "") -> bytes:
+        return model_version.encode() + b"\0" + (row.view(np.uint32) & self._mask).tobytes()
+
+    def get(self, key: bytes) -> float | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            MISSES.inc()
+            return None
+        self._entries.move_to_end(key)
+        HITS.inc()
+        return entry[0]
+
+    def put(self, key: bytes, probability: float):
+        self._entries[key] = (probability, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            EVICTIONS.inc()
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
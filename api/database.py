@@ -1,40 +1,137 @@
 import logging
 import os
+from datetime import date, datetime, time, timedelta, timezone
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from sqlalchemy import (
+    Boolean,
     Column,
     DateTime,
     Double,
+    Index,
     Integer,
     MetaData,
+    Select,
     SmallInteger,
     String,
     Table,
     desc,
     func,
     insert,
+    inspect,
+    or_,
     select,
+    tuple_,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, array
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
+from api.metrics import Gauge
+
 logger = logging.getLogger(__name__)
 
+POOL_CONNECTIONS = Gauge("db_pool_connections", "Connections of the PostgreSQL pool", ("state",))
+
 metadata = MetaData()
 
-predictions = Table(
-    "predictions",
+PARTITION_PERIODS = ("daily", "monthly")
+# 0.02 wide, fine enough to show the distribution around the 0.10 threshold.
+PROBABILITY_BINS = 50
+
+# The model inputs, typed as in the training data; shared by reference_data and
+# predictions so both can be compared with plain SQL.
+FEATURE_TYPES = {
+    "EXT_SOURCES_MEAN": Double,
+    "CREDIT_TERM": Double,
+    "EXT_SOURCE_3": Double,
+    "GOODS_PRICE_CREDIT_PERCENT": Double,
+    "INSTAL_AMT_PAYMENT_sum": Double,
+    "AMT_ANNUITY": Double,
+    "POS_CNT_INSTALMENT_FUTURE_mean": Double,
+    "DAYS_BIRTH": Integer,
+    "EXT_SOURCES_WEIGHTED": Double,
+    "EXT_SOURCE_2": Double,
+}
+
+
+def _feature_columns(nullable: bool) -> list[Column]:
+    return [Column(name, type_, nullable=nullable) for name, type_ in FEATURE_TYPES.items()]
+
+
+def _predictions_table(metadata: MetaData, partitioned: bool = False) -> Table:
+    # Range partitions on timestamp need the partition key in the primary key.
+    return Table(
+        "predictions",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("timestamp", DateTime(timezone=True), primary_key=partitioned, nullable=False, server_default=func.now()),
+        # Legacy JSONB copy of the features; new rows use the typed columns.
+        Column("input_features", JSONB),
+        *_feature_columns(nullable=True),
+        Column("prediction", SmallInteger),
+        Column("probability_default", Double),
+        Column("credit_decision", String(10)),
+        Column("cached", Boolean, nullable=False, server_default="false"),
+        Column("model_version", String(64)),
+        Index("ix_predictions_timestamp_id", "timestamp", "id"),
+        Index("ix_predictions_decision_timestamp", "credit_decision", "timestamp", "id"),
+        postgresql_partition_by="RANGE (timestamp)" if partitioned else None,
+    )
+
+
+predictions = _predictions_table(metadata)
+
+predictions_hourly = Table(
+    "predictions_hourly",
+    metadata,
+    Column("hour", DateTime(timezone=True), primary_key=True),
+    Column("n_predictions", Integer, nullable=False),
+    Column("n_denied", Integer, nullable=False),
+    Column("n_cached", Integer, nullable=False),
+    Column("probability_sum", Double, nullable=False),
+    # Counts of probability_default in PROBABILITY_BINS equal-width bins over [0, 1].
+    Column("probability_histogram", ARRAY(Integer), nullable=False),
+)
+
+# Hours that received rows since their rollup was last refreshed. A trigger
+# on predictions records them, so every way rows arrive (API logging, JSONL
+# replay, bulk loads, seeding) leads to the hour being rolled up again.
+predictions_dirty_hours = Table(
+    "predictions_dirty_hours",
+    metadata,
+    Column("hour", DateTime(timezone=True), primary_key=True),
+)
+
+# Candidate model outputs scored off the request path (see api.shadow), next
+# to the served model's output for the same applicant.
+shadow_predictions = Table(
+    "shadow_predictions",
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("timestamp", DateTime(timezone=True), nullable=False, server_default=func.now()),
-    Column("input_features", JSONB),
-    Column("prediction", SmallInteger),
+    Column("model_version", String(64), nullable=False),
+    Column("primary_version", String(64), nullable=False),
+    *_feature_columns(nullable=True),
     Column("probability_default", Double),
-    Column("credit_decision", String(10)),
+    Column("prediction", SmallInteger),
+    Column("primary_probability", Double),
+    Column("primary_prediction", SmallInteger),
+    Index("ix_shadow_predictions_version_timestamp", "model_version", "timestamp"),
+)
+
+# JSONL fallback segments replayed into predictions or shadow_predictions
+# (see api.log_writer),
+# recorded in the transaction that loads them, so a segment whose load
+# committed before its process died is not loaded twice.
+replayed_segments = Table(
+    "replayed_segments",
+    metadata,
+    Column("name", String(255), primary_key=True),
+    Column("rows", Integer, nullable=False),
+    Column("replayed_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
 )
 
 reference_data = Table(
@@ -42,21 +139,154 @@ reference_data = Table(
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("TARGET", SmallInteger, nullable=False),
-    Column("EXT_SOURCES_MEAN", Double, nullable=False),
-    Column("CREDIT_TERM", Double, nullable=False),
-    Column("EXT_SOURCE_3", Double, nullable=False),
-    Column("GOODS_PRICE_CREDIT_PERCENT", Double, nullable=False),
-    Column("INSTAL_AMT_PAYMENT_sum", Double, nullable=False),
-    Column("AMT_ANNUITY", Double, nullable=False),
-    Column("POS_CNT_INSTALMENT_FUTURE_mean", Double, nullable=False),
-    Column("DAYS_BIRTH", Integer, nullable=False),
-    Column("EXT_SOURCES_WEIGHTED", Double, nullable=False),
-    Column("EXT_SOURCE_2", Double, nullable=False),
+    *_feature_columns(nullable=False),
 )
 
+# Idempotent DDL for columns and indexes added after a table was first created;
+# create_all() only creates missing tables.
+MIGRATIONS = [
+    "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS cached BOOLEAN NOT NULL DEFAULT false",
+    "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS model_version VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_predictions_timestamp_id ON predictions (timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_predictions_decision_timestamp ON predictions (credit_decision, timestamp, id)",
+    *(
+        f'ALTER TABLE predictions ADD COLUMN IF NOT EXISTS "{name}" '
+        f'{"INTEGER" if type_ is Integer else "DOUBLE PRECISION"}'
+        for name, type_ in FEATURE_TYPES.items()
+    ),
+    # Rollups from before PROBABILITY_BINS changed: hours that still have raw
+    # rows are recomputed on the next refresh; the others keep each old bin's
+    # count in the first of the finer bins it covers.
+    "INSERT INTO predictions_dirty_hours (hour) SELECT hour FROM predictions_hourly "
+    f"WHERE cardinality(probability_histogram) <> {PROBABILITY_BINS} AND EXISTS ("
+    "SELECT 1 FROM predictions WHERE timestamp >= hour AND timestamp < hour + interval '1 hour') "
+    "ON CONFLICT DO NOTHING",
+    "UPDATE predictions_hourly SET probability_histogram = ARRAY("
+    f"SELECT CASE WHEN mod(i, {PROBABILITY_BINS} / cardinality(probability_histogram)) = 0 "
+    f"THEN probability_histogram[i / ({PROBABILITY_BINS} / cardinality(probability_histogram)) + 1] ELSE 0 END "
+    f"FROM generate_series(0, {PROBABILITY_BINS - 1}) AS i ORDER BY i) "
+    f"WHERE cardinality(probability_histogram) <> {PROBABILITY_BINS} "
+    f"AND mod({PROBABILITY_BINS}, cardinality(probability_histogram)) = 0",
+]
+
+# One statement-level trigger per INSERT or COPY, reading the new rows from its
+# transition table. When it is first created, the hours since the latest
+# rollup are marked too, to cover rows logged before the trigger existed.
+ROLLUP_TRIGGER = "predictions_mark_dirty_hours"
+ROLLUP_TRIGGER_DDL = [
+    """CREATE OR REPLACE FUNCTION mark_dirty_prediction_hours() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO predictions_dirty_hours (hour)
+    SELECT DISTINCT date_trunc('hour', timestamp) FROM inserted
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END
+$$""",
+    f"CREATE TRIGGER {ROLLUP_TRIGGER} AFTER INSERT ON predictions "
+    "REFERENCING NEW TABLE AS inserted FOR EACH STATEMENT EXECUTE FUNCTION mark_dirty_prediction_hours()",
+    "INSERT INTO predictions_dirty_hours (hour) "
+    "SELECT DISTINCT date_trunc('hour', timestamp) FROM predictions "
+    "WHERE timestamp >= coalesce((SELECT max(hour) FROM predictions_hourly), '-infinity') "
+    "ON CONFLICT DO NOTHING",
+]
+
 _engine: AsyncEngine | None = None
 
 
+def run_migrations(conn, partitioning: str | None = None, ahead: int = 3):
+    # Serialize schema changes between workers starting at the same time.
+    conn.exec_driver_sql("SELECT pg_advisory_xact_lock(hashtext('predictions_schema'))")
+    if partitioning and not inspect(conn).has_table("predictions"):
+        _predictions_table(MetaData(), partitioned=True).create(conn)
+    metadata.create_all(conn)
+    for statement in MIGRATIONS:
+        conn.exec_driver_sql(statement)
+    if not conn.exec_driver_sql(f"SELECT 1 FROM pg_trigger WHERE tgname = '{ROLLUP_TRIGGER}'").first():
+        for statement in ROLLUP_TRIGGER_DDL:
+            conn.exec_driver_sql(statement)
+
+    if partitioning:
+        if is_partitioned(conn):
+            for name in ensure_partitions(conn, partitioning, ahead):
+                logger.info("Created partition %s", name)
+        else:
+            logger.warning("predictions is not a partitioned table — PREDICTIONS_PARTITIONING ignored")
+
+
+def partition_range(day: date, period: str) -> tuple[date, date]:
+    if period == "daily":
+        return day, day + timedelta(days=1)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(start: date, period: str) -> str:
+    return f"predictions_p{start:%Y%m%d}" if period == "daily" else f"predictions_p{start:%Y%m}"
+
+
+def is_partitioned(conn) -> bool:
+    relkind = conn.exec_driver_sql("SELECT relkind FROM pg_class WHERE oid = to_regclass('predictions')").scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn) -> list[str]:
+    result = conn.exec_driver_sql(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'predictions'::regclass ORDER BY c.relname"
+    )
+    return list(result.scalars())
+
+
+def _utc(day: date) -> datetime:
+    return datetime.combine(day, time(), tzinfo=timezone.utc)
+
+
+def create_partition(conn, period: str, day: date) -> str:
+    # Rows already routed to the default partition for this range are moved
+    # first; ATTACH refuses to overlap rows left in the default partition.
+    start, end = partition_range(day, period)
+    name = partition_name(start, period)
+    bounds = {"start": _utc(start), "end": _utc(end)}
+    conn.exec_driver_sql(f"CREATE TABLE {name} (LIKE predictions)")
+    conn.exec_driver_sql(
+        f"WITH moved AS (DELETE FROM predictions_default "
+        f"WHERE timestamp >= %(start)s AND timestamp < %(end)s RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        bounds,
+    )
+    conn.exec_driver_sql(
+        f"ALTER TABLE predictions ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    )
+    return name
+
+
+def ensure_partitions(conn, period: str, ahead: int = 3) -> list[str]:
+    existing = set(list_partitions(conn))
+    if "predictions_default" not in existing:
+        conn.exec_driver_sql("CREATE TABLE predictions_default PARTITION OF predictions DEFAULT")
+
+    today = datetime.now(timezone.utc).date()
+    last = today
+    for _ in range(ahead):
+        last = partition_range(last, period)[1]
+    oldest = conn.exec_driver_sql("SELECT min(timestamp) FROM predictions_default").scalar()
+    day = min(today, oldest.astimezone(timezone.utc).date()) if oldest else today
+
+    created = []
+    while day <= last:
+        start, end = partition_range(day, period)
+        if partition_name(start, period) not in existing:
+            created.append(create_partition(conn, period, start))
+        day = end
+    return created
+
+
+def partitioning_from_env() -> str | None:
+    partitioning = os.environ.get("PREDICTIONS_PARTITIONING", "none")
+    return partitioning if partitioning in PARTITION_PERIODS else None
+
+
 async def init_db():
     global _engine
     database_url = os.environ.get("DATABASE_URL")
@@ -70,18 +300,28 @@ async def init_db():
     try:
         _engine = create_async_engine(database_url, pool_size=5, max_overflow=0)
         async with _engine.begin() as conn:
-            await conn.run_sync(metadata.create_all)
+            await conn.run_sync(
+                run_migrations,
+                partitioning_from_env(),
+                int(os.environ.get("PREDICTIONS_PARTITIONS_AHEAD", "3")),
+            )
     except Exception:
         logger.exception("Failed to connect to PostgreSQL — falling back to JSONL")
         _engine = None
         return
 
+    pool = _engine.pool
+    POOL_CONNECTIONS.set_function(pool.size, state="size")
+    POOL_CONNECTIONS.set_function(pool.checkedout, state="checked_out")
+    POOL_CONNECTIONS.set_function(pool.checkedin, state="idle")
     logger.info("PostgreSQL prediction logging initialized")
 
 
 async def close_db():
     global _engine
     if _engine is not None:
+        for state in ("size", "checked_out", "idle"):
+            POOL_CONNECTIONS.set_function(None, state=state)
         await _engine.dispose()
         _engine = None
 
@@ -90,34 +330,267 @@ def is_db_enabled() -> bool:
     return _engine is not None
 
 
-async def insert_prediction(log_entry: dict):
-    if _engine is None:
+async def insert_predictions(log_entries: list[dict]):
+    if _engine is None or not log_entries:
         return
 
-    try:
-        async with _engine.begin() as conn:
+    rows = [
+        {
+            "timestamp": entry["timestamp"],
+            **{name: entry["input_features"].get(name) for name in FEATURE_TYPES},
+            "prediction": entry.get("prediction"),
+            "probability_default": entry.get("probability_default"),
+            "credit_decision": entry.get("credit_decision"),
+            "cached": entry.get("cached", False),
+            "model_version": entry.get("model_version"),
+        }
+        for entry in log_entries
+    ]
+
+    async with _engine.begin() as conn:
+        await conn.execute(insert(predictions), rows)
+
+
+async def insert_shadow_predictions(log_entries: list[dict]):
+    if _engine is None or not log_entries:
+        return
+
+    rows = [
+        {
+            "timestamp": entry["timestamp"],
+            "model_version": entry["model_version"],
+            "primary_version": entry["primary_version"],
+            **{name: entry["input_features"].get(name) for name in FEATURE_TYPES},
+            "probability_default": entry["probability_default"],
+            "prediction": entry["prediction"],
+            "primary_probability": entry["primary_probability"],
+            "primary_prediction": entry["primary_prediction"],
+        }
+        for entry in log_entries
+    ]
+
+    async with _engine.begin() as conn:
+        await conn.execute(insert(shadow_predictions), rows)
+
+
+def to_log_row(row: dict) -> dict:
+    features = {name: row.pop(name) for name in FEATURE_TYPES}
+    if row["input_features"] is None and features["EXT_SOURCES_MEAN"] is not None:
+        row["input_features"] = features
+    return row
+
+
+def predictions_query(
+    limit: int = 50,
+    offset: int = 0,
+    before: tuple[datetime, int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    decision: str | None = None,
+) -> Select:
+    query = select(predictions)
+    if before is not None:
+        query = query.where(tuple_(predictions.c.timestamp, predictions.c.id) < tuple_(*before))
+    if start is not None:
+        query = query.where(predictions.c.timestamp >= start)
+    if end is not None:
+        query = query.where(predictions.c.timestamp < end)
+    if decision is not None:
+        query = query.where(predictions.c.credit_decision == decision)
+    return (
+        query
+        .order_by(desc(predictions.c.timestamp), desc(predictions.c.id))
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+async def get_predictions(
+    limit: int = 50,
+    offset: int = 0,
+    before: tuple[datetime, int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    decision: str | None = None,
+) -> list[dict]:
+    if _engine is None:
+        return []
+
+    async with _engine.connect() as conn:
+        result = await conn.execute(predictions_query(limit, offset, before, start, end, decision))
+        return [to_log_row(row._asdict()) for row in result]
+
+
+def rollup_aggregates() -> list:
+    # The predictions_hourly columns, aggregated from raw rows.
+    probability = predictions.c.probability_default
+    bucket = func.least(func.floor(probability * PROBABILITY_BINS), PROBABILITY_BINS - 1).cast(Integer)
+    return [
+        func.count(),
+        func.count().filter(predictions.c.credit_decision == "denied"),
+        func.count().filter(predictions.c.cached),
+        func.coalesce(func.sum(probability), 0.0),
+        array([func.count().filter(bucket == i) for i in range(PROBABILITY_BINS)]),
+    ]
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_boundary(latest_rollup: datetime | None, oldest_dirty: datetime | None) -> datetime | None:
+    # Rollups are exact before the latest (possibly partial) rolled-up hour,
+    # except for hours that received rows since the last refresh: from the
+    # oldest of those on, the summary reads raw rows.
+    if latest_rollup is None or oldest_dirty is None:
+        return latest_rollup
+    return min(latest_rollup, oldest_dirty)
+
+
+def summary_queries(
+    bucket: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    rolled_up_until: datetime | None = None,
+) -> list[Select]:
+    # Whole hours before rolled_up_until (see rollup_boundary) are read from
+    # predictions_hourly, the rest of the range from the raw rows. Both are
+    # grouped into the same buckets.
+    low = None
+    if start is not None:
+        low = _hour(start) if _hour(start) == start else _hour(start) + timedelta(hours=1)
+    high = rolled_up_until
+    if high is not None and end is not None:
+        high = min(high, _hour(end))
+    if high is not None and low is not None and low >= high:
+        high = None
+
+    timestamp = predictions.c.timestamp
+    period = func.date_trunc(bucket, timestamp)
+    raw = select(period, *rollup_aggregates()).group_by(period)
+    if start is not None:
+        raw = raw.where(timestamp >= start)
+    if end is not None:
+        raw = raw.where(timestamp < end)
+    if high is None:
+        return [raw]
+    raw = raw.where(timestamp >= high if low is None else or_(timestamp < low, timestamp >= high))
+
+    hour = predictions_hourly.c.hour
+    histogram = predictions_hourly.c.probability_histogram
+    period = func.date_trunc(bucket, hour)
+    rollups = select(
+        period,
+        func.sum(predictions_hourly.c.n_predictions),
+        func.sum(predictions_hourly.c.n_denied),
+        func.sum(predictions_hourly.c.n_cached),
+        func.sum(predictions_hourly.c.probability_sum),
+        array([func.sum(histogram[i + 1]) for i in range(PROBABILITY_BINS)]),
+    ).where(hour < high).group_by(period)
+    if low is not None:
+        rollups = rollups.where(hour >= low)
+    return [rollups, raw]
+
+
+def _add(totals: list, values) -> None:
+    totals[:4] = [a + b for a, b in zip(totals[:4], values[:4])]
+    totals[4] = [a + b for a, b in zip(totals[4], values[4])]
+
+
+def summarize(rows, bucket: str, start: datetime | None = None, end: datetime | None = None) -> dict:
+    # Rows are (bucket, count, denied, cached, probability sum, histogram); a
+    # bucket can come from both the rollups and the raw rows.
+    buckets: dict[datetime, list] = {}
+    overall = [0, 0, 0, 0.0, [0] * PROBABILITY_BINS]
+    for period, *values in rows:
+        _add(buckets.setdefault(period, [0, 0, 0, 0.0, [0] * PROBABILITY_BINS]), values)
+        _add(overall, values)
+
+    total, denied, cached, probability_sum, histogram = overall
+    return {
+        "start": start,
+        "end": end,
+        "bucket": bucket,
+        "total": total,
+        "approved": total - denied,
+        "denied": denied,
+        "cached": cached,
+        "approval_rate": (total - denied) / total if total else None,
+        "mean_probability": probability_sum / total if total else None,
+        "probability_bins": [i / PROBABILITY_BINS for i in range(PROBABILITY_BINS + 1)],
+        "probability_histogram": histogram,
+        "series": [
+            {
+                "start": period,
+                "total": count,
+                "denied": n_denied,
+                "cached": n_cached,
+                "mean_probability": period_sum / count if count else None,
+            }
+            for period, (count, n_denied, n_cached, period_sum, _) in sorted(buckets.items())
+        ],
+    }
+
+
+async def get_prediction_summary(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    bucket: str = "day",
+) -> dict | None:
+    if _engine is None:
+        return None
+
+    # Naive bounds are taken as UTC, so they compare with the rollup hours.
+    if start is not None and start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    # One snapshot for the boundary and both queries, so a concurrent refresh
+    # or insert cannot count rows twice or miss them.
+    async with _engine.connect() as conn:
+        await conn.execution_options(isolation_level="REPEATABLE READ")
+        latest_rollup, oldest_dirty = (
             await conn.execute(
-                insert(predictions).values(
-                    timestamp=log_entry["timestamp"],
-                    input_features=log_entry["input_features"],
-                    prediction=log_entry.get("prediction"),
-                    probability_default=log_entry.get("probability_default"),
-                    credit_decision=log_entry.get("credit_decision"),
+                select(
+                    select(func.max(predictions_hourly.c.hour)).scalar_subquery(),
+                    select(func.min(predictions_dirty_hours.c.hour)).scalar_subquery(),
                 )
             )
-    except Exception:
-        logger.exception("Failed to insert prediction into PostgreSQL")
+        ).one()
+        rows = []
+        for query in summary_queries(bucket, start, end, rollup_boundary(latest_rollup, oldest_dirty)):
+            rows.extend((await conn.execute(query)).all())
+    return summarize(rows, bucket, start, end)
+
+
+async def get_reference_sample(limit: int) -> list[tuple]:
+    if _engine is None:
+        return []
+
+    columns = [reference_data.c[name] for name in FEATURE_TYPES]
+    async with _engine.connect() as conn:
+        result = await conn.execute(select(*columns).order_by(func.random()).limit(limit))
+        return [tuple(row) for row in result]
+
+
+async def get_reference_version() -> str:
+    # Changes whenever reference_data is reloaded, which assigns new ids.
+    if _engine is None:
+        return ""
+
+    async with _engine.connect() as conn:
+        count, last = (await conn.execute(select(func.count(), func.max(reference_data.c.id)))).one()
+        return f"{count}-{last}"
 
 
-async def get_predictions(limit: int = 50, offset: int = 0) -> list[dict]:
+async def get_labeled_reference(limit: int | None = None) -> list[tuple]:
+    # Feature rows followed by TARGET; a random sample when limited.
     if _engine is None:
         return []
 
+    query = select(*(reference_data.c[name] for name in FEATURE_TYPES), reference_data.c.TARGET)
+    if limit:
+        query = query.order_by(func.random()).limit(limit)
     async with _engine.connect() as conn:
-        result = await conn.execute(
-            select(predictions)
-            .order_by(desc(predictions.c.timestamp))
-            .limit(limit)
-            .offset(offset)
-        )
-        return [row._asdict() for row in result]
+        result = await conn.execute(query)
+        return [tuple(row) for row in result]
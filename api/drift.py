@@ -0,0 +1,335 @@
+"""Streaming drift statistics over the logged prediction stream.
+
+Each model input and ``probability_default`` is binned on fixed edges taken
+from quantiles of a ``reference_data`` sample. Logged predictions are counted
+into time-sliced ring buffers (1h in minutes, 24h and 7d in hours), so memory
+does not grow with traffic. Reports compare each window's histogram with the
+reference histogram: population stability index, Kolmogorov–Smirnov distance
+on the binned CDFs and Jensen–Shannon divergence (base 2).
+
+When several worker processes serve the app (see ``api.serve``), they share
+``METRICS_MULTIPROC_DIR`` as for metrics. The first worker to load a
+reference publishes its bin edges and reference histograms there
+(``drift-reference.npz``) and later workers adopt them, so all ring buffers
+count into the same bins. The file records the model and the
+``reference_data`` version it was built from, and is rebuilt when either
+changes; snapshots binned on another reference are left out of reports. Each worker snapshots its ring buffers to
+``drift-<pid>.npz`` every ``SNAPSHOT_INTERVAL`` seconds when they changed, and
+reports sum the live slots of every snapshot, so any worker reports on the
+node's whole traffic. Snapshots of exited workers are kept until their slots
+age out of the windows.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from api.database import FEATURE_TYPES, get_reference_sample, get_reference_version
+from api.metrics import SNAPSHOT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+FEATURES = list(FEATURE_TYPES)
+N_BINS = 10
+PSI_THRESHOLD = 0.2
+# Window label -> (length in seconds, number of slots)
+WINDOWS = {"1h": (3600, 60), "24h": (86_400, 24), "7d": (7 * 86_400, 168)}
+# Keeps empty bins from making PSI and KL terms infinite.
+SMOOTHING = 1e-4
+REFERENCE_FILE = "drift-reference.npz"
+
+
+def model_fingerprint(name: str, path: Path | None) -> str:
+    if path is None:
+        return name
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"{name}:{digest.hexdigest()[:16]}"
+
+
+def quantile_edges(values: np.ndarray, n_bins: int = N_BINS) -> np.ndarray:
+    return np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> float:
+    expected, actual = expected + SMOOTHING, actual + SMOOTHING
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def kolmogorov_smirnov(expected: np.ndarray, actual: np.ndarray) -> float:
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+def jensen_shannon(expected: np.ndarray, actual: np.ndarray) -> float:
+    mixture = (expected + actual) / 2
+
+    def kl(p):
+        mask = p > 0
+        return np.sum(p[mask] * np.log2(p[mask] / mixture[mask]))
+
+    return float(max(0.0, (kl(expected) + kl(actual)) / 2))
+
+
+class RollingHistogram:
+    def __init__(self, window: float, slots: int, shape: tuple[int, ...]):
+        self.slots = slots
+        self.slot_width = window / slots
+        self._counts = np.zeros((slots, *shape), dtype=np.int64)
+        self._slot_ids = np.full(slots, -1, dtype=np.int64)
+
+    def add(self, timestamp: float, counts: np.ndarray):
+        slot = int(timestamp // self.slot_width)
+        index = slot % self.slots
+        if self._slot_ids[index] != slot:
+            self._counts[index] = 0
+            self._slot_ids[index] = slot
+        self._counts[index] += counts
+
+    def total(self, now: float, counts: np.ndarray | None = None, slot_ids: np.ndarray | None = None) -> np.ndarray:
+        # Another worker's ring buffer can be passed in place of this one.
+        counts = self._counts if counts is None else counts
+        slot_ids = self._slot_ids if slot_ids is None else slot_ids
+        current = int(now // self.slot_width)
+        live = (slot_ids > current - self.slots) & (slot_ids <= current)
+        return counts[live].sum(axis=0)
+
+
+class DriftMonitor:
+    def __init__(
+        self,
+        features: np.ndarray,
+        probabilities: np.ndarray,
+        n_bins: int = N_BINS,
+        model: str = "",
+        reference_version: str = "",
+    ):
+        reference = np.column_stack([features, probabilities])
+        self._setup([quantile_edges(column, n_bins) for column in reference.T], len(reference), model, reference_version)
+        self.reference = self._proportions(self._bin_counts(reference))
+
+    def _setup(self, edges: list[np.ndarray], reference_rows: int, model: str, reference_version: str):
+        self.reference_rows = reference_rows
+        # What the reference was built from: the scoring model and reference_data.
+        self.model = model
+        self.reference_version = reference_version
+        self.edges = edges
+        self.n_bins = max(len(column_edges) for column_edges in edges) + 1
+        shape = (len(edges), self.n_bins)
+        self.windows = {label: RollingHistogram(window, slots, shape) for label, (window, slots) in WINDOWS.items()}
+        self._lock = threading.Lock()
+        self._changes = 0
+        self._written = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "DriftMonitor":
+        monitor = cls.__new__(cls)
+        with np.load(path) as saved:
+            reference = saved["reference"]
+            # Files from before the model was recorded never match one.
+            model = str(saved["model"]) if "model" in saved.files else None
+            version = str(saved["reference_version"]) if "reference_version" in saved.files else None
+            monitor._setup([saved[f"edges_{j}"] for j in range(len(reference))], int(saved["reference_rows"]), model, version)
+        monitor.reference = reference
+        return monitor
+
+    def matches(self, model: str, reference_version: str) -> bool:
+        return self.model == model and self.reference_version == reference_version
+
+    def publish(self, path: Path) -> "DriftMonitor":
+        # Linking fails if another worker published first; its reference wins
+        # unless it was built from another model or reference sample.
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f, reference=self.reference, reference_rows=self.reference_rows,
+                model=self.model, reference_version=self.reference_version,
+                **{f"edges_{j}": edges for j, edges in enumerate(self.edges)},
+            )
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            published = DriftMonitor.load(path)
+            if published.matches(self.model, self.reference_version):
+                return published
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return self
+
+    def write_snapshot(self, directory: Path):
+        path = directory / f"drift-{os.getpid()}.npz"
+        with self._lock:
+            if self._written == self._changes and path.exists():
+                return
+            self._written = self._changes
+            arrays = {"model": self.model, "reference_version": self.reference_version}
+            for label, histogram in self.windows.items():
+                arrays[f"{label}_counts"] = histogram._counts.copy()
+                arrays[f"{label}_slots"] = histogram._slot_ids.copy()
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def _merged_totals(self, directory: Path, now: float) -> dict[str, np.ndarray]:
+        self.write_snapshot(directory)
+        totals = {label: 0 for label in self.windows}
+        for path in directory.glob("drift-*.npz"):
+            if path.name == REFERENCE_FILE:
+                continue
+            try:
+                with np.load(path) as snapshot:
+                    # Counted into the bins of another reference.
+                    if "model" not in snapshot.files or not self.matches(
+                        str(snapshot["model"]), str(snapshot["reference_version"])
+                    ):
+                        continue
+                    for label, histogram in self.windows.items():
+                        totals[label] = totals[label] + histogram.total(
+                            now, snapshot[f"{label}_counts"], snapshot[f"{label}_slots"]
+                        )
+            except (OSError, ValueError, KeyError):
+                continue
+        return totals
+
+    def _bin_counts(self, values: np.ndarray) -> np.ndarray:
+        return np.stack([
+            np.bincount(np.searchsorted(edges, values[:, j], side="right"), minlength=self.n_bins)
+            for j, edges in enumerate(self.edges)
+        ])
+
+    @staticmethod
+    def _proportions(counts: np.ndarray) -> np.ndarray:
+        return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+
+    def observe(self, features: np.ndarray, probabilities: np.ndarray, timestamps: np.ndarray):
+        values = np.column_stack([features, probabilities])
+        slots = timestamps // 60
+        for slot in np.unique(slots):
+            rows = slots == slot
+            counts = self._bin_counts(values[rows])
+            with self._lock:
+                for histogram in self.windows.values():
+                    histogram.add(float(timestamps[rows][0]), counts)
+                self._changes += 1
+
+    def report(self, now: float | None = None) -> dict:
+        now = time.time() if now is None else now
+        directory = _multiproc_dir()
+        if directory is None:
+            with self._lock:
+                totals = {label: histogram.total(now) for label, histogram in self.windows.items()}
+        else:
+            totals = self._merged_totals(directory, now)
+        windows = {}
+        for label, counts in totals.items():
+            n = int(counts[0].sum())
+            scores = []
+            if n:
+                actual = self._proportions(counts)
+                for expected, observed in zip(self.reference, actual):
+                    psi = population_stability_index(expected, observed)
+                    scores.append({
+                        "psi": psi,
+                        "ks": kolmogorov_smirnov(expected, observed),
+                        "js": jensen_shannon(expected, observed),
+                        "drift": psi >= PSI_THRESHOLD,
+                    })
+            windows[label] = {
+                "count": n,
+                "features": dict(zip(FEATURES, scores)),
+                "prediction": scores[-1] if scores else None,
+            }
+        return {"reference_rows": self.reference_rows, "psi_threshold": PSI_THRESHOLD, "windows": windows}
+
+
+def _multiproc_dir() -> Path | None:
+    directory = os.environ.get("METRICS_MULTIPROC_DIR")
+    return Path(directory) if directory else None
+
+
+_monitor: DriftMonitor | None = None
+
+
+def get_monitor() -> DriftMonitor | None:
+    return _monitor
+
+
+def set_monitor(monitor: DriftMonitor | None):
+    global _monitor
+    _monitor = monitor
+
+
+async def load_reference(score, sample_size: int = 50_000, model: str = ""):
+    # model identifies the scoring model (see model_fingerprint); a reference
+    # built from another one, or from other reference_data, is rebuilt.
+    directory = _multiproc_dir()
+    try:
+        reference_version = await get_reference_version()
+        current = _monitor
+        if current is not None and current.matches(model, reference_version):
+            return
+        monitor = None
+        if directory is not None and (directory / REFERENCE_FILE).exists():
+            monitor = DriftMonitor.load(directory / REFERENCE_FILE)
+            if not monitor.matches(model, reference_version):
+                logger.info("Drift reference was built for another model or reference_data — rebuilding it")
+                monitor = None
+        if monitor is None:
+            rows = await get_reference_sample(sample_size)
+            if not rows:
+                logger.info("reference_data is empty — drift monitoring disabled")
+                return
+            features = np.array(rows, dtype=np.float64)
+            probabilities = await score(features.astype(np.float32))
+            monitor = DriftMonitor(features, probabilities, model=model, reference_version=reference_version)
+            if directory is not None:
+                directory.mkdir(parents=True, exist_ok=True)
+                monitor = monitor.publish(directory / REFERENCE_FILE)
+        set_monitor(monitor)
+    except Exception:
+        logger.exception("Failed to load drift reference data — drift monitoring disabled")
+        return
+    logger.info("Drift monitor initialized from %d reference rows", monitor.reference_rows)
+
+
+def observe_entries(entries: list[dict]):
+    if _monitor is None or not entries:
+        return
+    features = np.array([[entry["input_features"][name] for name in FEATURES] for entry in entries], dtype=np.float64)
+    probabilities = np.array([entry["probability_default"] for entry in entries], dtype=np.float64)
+    timestamps = np.array([entry["timestamp"].timestamp() for entry in entries])
+    _monitor.observe(features, probabilities, timestamps)
+
+
+def start_snapshots() -> threading.Event | None:
+    directory = _multiproc_dir()
+    if directory is None:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    stopped = threading.Event()
+
+    def loop():
+        while not stopped.wait(SNAPSHOT_INTERVAL):
+            # The reference loads in the background, and is dropped on shutdown.
+            monitor = _monitor
+            if monitor is not None:
+                monitor.write_snapshot(directory)
+
+    threading.Thread(target=loop, name="drift-snapshot", daemon=True).start()
+    return stopped
+
+
+def stop_snapshots(stopped: threading.Event | None):
+    if stopped is None:
+        return
+    stopped.set()
+    if _monitor is not None:
+        _monitor.write_snapshot(_multiproc_dir())
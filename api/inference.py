@@ -0,0 +1,150 @@
+"""ONNX Runtime session pool.
+
+Holds ``size`` independent ``InferenceSession`` objects built from the same
+model with explicit threading and graph-optimization settings, and runs
+inference on a dedicated executor instead of Starlette's shared threadpool.
+Each executor thread is pinned to one session, so the total number of ONNX
+Runtime compute threads is bounded by ``size * intra_op_num_threads``.
+``profile_operators`` records ONNX Runtime's per-operator profile for a
+window of live traffic.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+from api.telemetry import stage
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def lower_thread_priority(niceness: int = 10):
+    # Linux applies setpriority to a single thread when given its native id.
+    with suppress(AttributeError, OSError):
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+
+
+def build_session_options(
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 0,
+    graph_optimization: str = "all",
+    execution_mode: str = "sequential",
+) -> ort.SessionOptions:
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization]
+    options.execution_mode = EXECUTION_MODES[execution_mode]
+    return options
+
+
+class SessionPool:
+    def __init__(
+        self,
+        model_path: Path,
+        size: int = 1,
+        options: ort.SessionOptions | None = None,
+        executor_threads: int | None = None,
+        executor_initializer=None,
+        timing_stage: str = "model_run",
+    ):
+        self.model_path = model_path
+        self.options = options or ort.SessionOptions()
+        self.sessions = [ort.InferenceSession(str(model_path), sess_options=self.options) for _ in range(size)]
+        self.input_name = self.sessions[0].get_inputs()[0].name
+        self.output_name = self.sessions[0].get_outputs()[1].name
+        self.concurrency = size
+        self.timing_stage = timing_stage
+        self._executor = ThreadPoolExecutor(
+            max_workers=executor_threads or size,
+            thread_name_prefix="onnx-inference",
+            initializer=executor_initializer,
+        )
+        self._local = threading.local()
+        self._next_session = itertools.count()
+
+    def _session(self) -> ort.InferenceSession:
+        # Threads are pinned to a slot rather than a session object, so that
+        # profile_operators can swap the sessions underneath them.
+        index = getattr(self._local, "index", None)
+        if index is None:
+            index = self._local.index = next(self._next_session) % len(self.sessions)
+        return self.sessions[index]
+
+    def predict_proba(self, rows: np.ndarray) -> np.ndarray:
+        with stage(self.timing_stage):
+            (probabilities,) = self._session().run([self.output_name], {self.input_name: rows})
+        return np.fromiter((p[1] for p in probabilities), dtype=np.float64, count=len(rows))
+
+    async def run(self, rows: np.ndarray) -> np.ndarray:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.predict_proba, rows)
+
+    def warm_up(self, rows: np.ndarray):
+        # The first run of a session allocates its buffers; keep it off requests.
+        for session in self.sessions:
+            session.run([self.output_name], {self.input_name: rows})
+
+    async def profile_operators(self, seconds: float, directory: Path) -> list[dict]:
+        # ONNX Runtime only profiles sessions created with profiling enabled, so
+        # profiling copies of the sessions serve for the window and are then
+        # swapped back out; their Chrome trace events are returned.
+        def build_sessions() -> list[ort.InferenceSession]:
+            self.options.enable_profiling = True
+            self.options.profile_file_prefix = str(Path(directory) / "onnxruntime")
+            try:
+                return [ort.InferenceSession(str(self.model_path), sess_options=self.options) for _ in self.sessions]
+            finally:
+                self.options.enable_profiling = False
+
+        profiling = await asyncio.to_thread(build_sessions)
+        sessions, self.sessions = self.sessions, profiling
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.sessions = sessions
+
+        events = []
+        loop = asyncio.get_running_loop()
+        for session in profiling:
+            # Queued behind any call still running on the profiling session.
+            trace = Path(await loop.run_in_executor(self._executor, session.end_profiling))
+            events.extend(json.loads(trace.read_text()))
+            trace.unlink()
+        return events
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def session_pool_from_env(model_path: Path) -> SessionPool:
+    options = build_session_options(
+        intra_op_threads=int(os.environ.get("ORT_INTRA_OP_THREADS", "0")),
+        inter_op_threads=int(os.environ.get("ORT_INTER_OP_THREADS", "0")),
+        graph_optimization=os.environ.get("ORT_GRAPH_OPTIMIZATION", "all"),
+        execution_mode=os.environ.get("ORT_EXECUTION_MODE", "sequential"),
+    )
+    executor_threads = os.environ.get("ORT_EXECUTOR_THREADS")
+    return SessionPool(
+        model_path,
+        size=int(os.environ.get("ORT_SESSION_POOL_SIZE", "1")),
+        options=options,
+        executor_threads=int(executor_threads) if executor_threads else None,
+    )
@@ -0,0 +1,236 @@
+"""Rotating JSONL log used when PostgreSQL is unavailable.
+
+Batches are appended to ``logs/predictions.jsonl`` with one ``O_APPEND``
+write, off the event loop, so several worker processes can share the file.
+Once the file reaches ``max_bytes`` or has been written to for ``max_age``
+seconds, it is renamed to a timestamped segment
+(``predictions-20250101T120000.000000Z-<pid>.jsonl``) and, a few seconds
+later, compressed with gzip or zstd. The delay lets writes that other
+processes started before the rename land in the segment first.
+
+``fsync`` chooses durability against write cost: ``none`` leaves flushing to
+the OS, ``batch`` syncs every batch and ``rotate`` syncs each segment when it
+is closed. Segments are replayed into PostgreSQL with ``api.bulk_load`` once
+the database is back (see ``api.log_writer``): a worker claims them by moving
+them into ``logs/replaying/`` under an exclusive ``flock``, so each segment is
+loaded by one process only, and deletes them after the load commits. The lock
+is held until then, so a claim left in ``replaying/`` by a process that died
+is unlocked and is claimed again. A segment that fails to load
+``MAX_REPLAY_ATTEMPTS`` times is moved to ``logs/failed/`` for inspection
+instead of being retried forever.
+"""
+
+import fcntl
+import gzip
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+FSYNC_POLICIES = ("none", "batch", "rotate")
+# Seconds a rotated segment is left alone before it is compressed or replayed.
+SETTLE_SECONDS = 2.0
+# Failed loads of a claimed segment before it is set aside in failed/.
+MAX_REPLAY_ATTEMPTS = 3
+
+
+def to_json_line(entry: dict) -> str:
+    return json.dumps({**entry, "timestamp": entry["timestamp"].isoformat()}) + "\n"
+
+
+def append_jsonl(entries: list[dict], path: Path, fsync: bool = False) -> os.stat_result:
+    # One O_APPEND write per batch keeps lines intact when several worker
+    # processes share the same file.
+    data = "".join(to_json_line(entry) for entry in entries).encode()
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        if fsync:
+            os.fsync(fd)
+        return os.fstat(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_path(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def compress_file(source: Path, destination: Path, compression: str):
+    # A fresh temporary file per call: the writer and replay threads of one
+    # process, or two processes, may compress the same segment at once.
+    with open(source, "rb") as src:
+        stat = os.fstat(src.fileno())
+        fd, partial = tempfile.mkstemp(prefix=f".{destination.name}.", suffix=".tmp", dir=destination.parent)
+        try:
+            with open(fd, "wb") as raw:
+                if compression == "zstd":
+                    import zstandard
+
+                    with zstandard.ZstdCompressor().stream_writer(raw, closefd=False) as dst:
+                        shutil.copyfileobj(src, dst)
+                else:
+                    with gzip.open(raw, "wb", compresslevel=6) as dst:
+                        shutil.copyfileobj(src, dst)
+            os.chmod(partial, 0o644)
+            # Keep the segment's time, which decides when it is settled.
+            os.utime(partial, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(partial, destination)
+        except BaseException:
+            Path(partial).unlink(missing_ok=True)
+            raise
+
+
+class RotatingJsonlLog:
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age: float = 3600.0,
+        compression: str = "gzip",
+        fsync: str = "none",
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown log compression {compression!r}: expected one of {sorted(COMPRESSIONS)}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}: expected one of {list(FSYNC_POLICIES)}")
+        if compression == "zstd" and importlib.util.find_spec("zstandard") is None:
+            raise ValueError("zstd log compression requires the zstandard package")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compression = compression
+        self.fsync = fsync
+        self.replay_dir = path.parent / "replaying"
+        self.failed_dir = path.parent / "failed"
+        # Locked descriptor of each claimed segment, and failed loads per segment.
+        self._claims: dict[Path, int] = {}
+        self._failures: dict[str, int] = {}
+        # Inode of the active file and when this process first wrote to it.
+        self._inode: int | None = None
+        self._since = 0.0
+
+    def append(self, entries: list[dict]) -> Path | None:
+        stat = append_jsonl(entries, self.path, fsync=self.fsync == "batch")
+        now = time.monotonic()
+        if stat.st_ino != self._inode:
+            self._inode, self._since = stat.st_ino, now
+        rotated = None
+        if stat.st_size >= self.max_bytes or now - self._since >= self.max_age:
+            rotated = self.rotate(stat.st_ino)
+        self.compress_segments()
+        return rotated
+
+    def rotate(self, inode: int | None = None) -> Path | None:
+        try:
+            if inode is not None and os.stat(self.path).st_ino != inode:
+                return None  # another process rotated it first
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+            segment = self.path.with_name(f"{self.path.stem}-{stamp}-{os.getpid()}{self.path.suffix}")
+            if self.fsync != "none":
+                fsync_path(self.path)
+            os.rename(self.path, segment)
+        except FileNotFoundError:
+            return None
+        self._inode = None
+        return segment
+
+    def segments(self, pattern: str = "") -> list[Path]:
+        return sorted(self.path.parent.glob(f"{self.path.stem}-*{self.path.suffix}{pattern}"))
+
+    def settled(self, segment: Path) -> bool:
+        try:
+            return time.time() - segment.stat().st_mtime >= SETTLE_SECONDS
+        except FileNotFoundError:
+            return False
+
+    def compress_segments(self):
+        if self.compression == "none":
+            return
+        for segment in self.segments():
+            if not self.settled(segment):
+                continue
+            compressed = segment.with_name(segment.name + COMPRESSIONS[self.compression])
+            try:
+                compress_file(segment, compressed, self.compression)
+            except FileNotFoundError:
+                continue  # compressed or claimed by another process
+            if self.fsync != "none":
+                fsync_path(compressed)
+            segment.unlink(missing_ok=True)
+
+    def _lock(self, path: Path) -> int | None:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            current = os.stat(path).st_ino
+        except (BlockingIOError, FileNotFoundError):
+            current = None
+        # Renamed or removed by its previous holder between open and flock.
+        if current != os.fstat(fd).st_ino:
+            os.close(fd)
+            return None
+        return fd
+
+    def claim_segments(self) -> list[Path]:
+        # The active file is rotated first so that it is replayed once settled,
+        # and settled segments are compressed before they are claimed. Claims
+        # whose process died are unlocked and are taken over.
+        if self.path.exists():
+            self.rotate()
+        self.compress_segments()
+        self.replay_dir.mkdir(exist_ok=True)
+        candidates = sorted(self.replay_dir.iterdir())
+        for suffix in (suffix for suffix in COMPRESSIONS.values() if suffix or self.compression == "none"):
+            candidates += [segment for segment in self.segments(suffix) if self.settled(segment)]
+        claimed = []
+        for segment in candidates:
+            fd = self._lock(segment)
+            if fd is None:
+                continue
+            replaying = self.replay_dir / segment.name
+            try:
+                os.rename(segment, replaying)
+            except FileNotFoundError:
+                os.close(fd)
+                continue
+            self._claims[replaying] = fd
+            claimed.append(replaying)
+        return sorted(claimed)
+
+    def release(self, claimed: list[Path]):
+        for replaying in claimed:
+            os.rename(replaying, self.path.parent / replaying.name)
+            os.close(self._claims.pop(replaying))
+
+    def remove(self, claimed: list[Path]):
+        for replaying in claimed:
+            replaying.unlink(missing_ok=True)
+            os.close(self._claims.pop(replaying))
+
+    def reject(self, replaying: Path) -> bool:
+        # Released for another attempt, or moved to failed/ once it has failed
+        # MAX_REPLAY_ATTEMPTS times; returns whether it was set aside.
+        failures = self._failures[replaying.name] = self._failures.get(replaying.name, 0) + 1
+        if failures < MAX_REPLAY_ATTEMPTS:
+            self.release([replaying])
+            return False
+        self.failed_dir.mkdir(exist_ok=True)
+        os.rename(replaying, self.failed_dir / replaying.name)
+        os.close(self._claims.pop(replaying))
+        del self._failures[replaying.name]
+        return True
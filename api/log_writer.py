@@ -0,0 +1,294 @@
+"""Background prediction logging pipeline.
+
+Prediction endpoints hand their validated inputs and responses to
+``log_predictions`` after scoring; entries are enqueued without waiting on I/O. A single writer
+task drains the bounded queue and flushes batches to PostgreSQL with one
+executemany (or to the rotating JSONL fallback log of ``api.jsonl_log``, off
+the event loop) whenever ``batch_size`` entries are pending or
+``flush_interval`` seconds have passed.
+
+At startup and then at most every ``replay_interval`` seconds while logging,
+the writer reconnects to PostgreSQL if it was unreachable and, once it is
+available, replays the fallback segments into it with ``COPY`` in a
+background thread. Each segment is loaded in its own transaction, which also
+records its name in ``replayed_segments``: a segment claimed again after a
+crash is not loaded twice, and a corrupt one does not hold back the others.
+``api.shadow`` replays its own log into ``shadow_predictions`` the same way.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from api.database import init_db, insert_predictions, is_db_enabled
+from api.drift import observe_entries
+from api.jsonl_log import RotatingJsonlLog
+from api.metrics import Counter, Gauge, Histogram
+from api.schemas import PredictionResponse
+
+logger = logging.getLogger(__name__)
+
+LOG_DIR = Path("logs")
+LOG_FILE = LOG_DIR / "predictions.jsonl"
+
+ENTRIES_WRITTEN = Counter("prediction_log_entries_written", "Prediction log entries persisted", ("sink",))
+ENTRIES_DROPPED = Counter("prediction_log_entries_dropped", "Prediction log entries dropped because the queue was full")
+FLUSH_ERRORS = Counter("prediction_log_flush_errors", "Failed prediction log flushes", ("sink",))
+FLUSH_SIZE = Histogram(
+    "prediction_log_flush_size",
+    "Entries written per prediction log flush",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 5000),
+)
+FLUSH_SECONDS = Histogram("prediction_log_flush_seconds", "Time to write one batch of prediction logs", ("sink",))
+QUEUE_DEPTH = Gauge("prediction_log_queue_depth", "Prediction log entries waiting to be written")
+SEGMENTS_ROTATED = Counter("prediction_log_segments_rotated", "JSONL fallback log segments closed by rotation")
+ENTRIES_REPLAYED = Counter("prediction_log_entries_replayed", "JSONL fallback log entries replayed into PostgreSQL")
+SEGMENTS_FAILED = Counter("prediction_log_segments_failed", "JSONL fallback log segments moved to failed/ after repeated replay errors")
+
+
+def replay_segment(conn, segment: Path, table: str = "predictions") -> int:
+    from api.bulk_load import copy_frames, read_chunks
+
+    with conn.transaction():
+        name = segment.name
+        if conn.execute("SELECT 1 FROM replayed_segments WHERE name = %s", (name,)).fetchone():
+            return 0
+        rows = copy_frames(conn, table, read_chunks(segment))
+        conn.execute("INSERT INTO replayed_segments (name, rows) VALUES (%s, %s)", (name, rows))
+    return rows
+
+
+def replay_segments(log: RotatingJsonlLog, table: str = "predictions") -> int:
+    # Imported before claiming, so that a missing dependency (pandas, through
+    # api.bulk_load) leaves the segments where they are.
+    import psycopg
+
+    from api.bulk_load import connection_url
+
+    claimed = log.claim_segments()
+    rows = 0
+    try:
+        if claimed:
+            with psycopg.connect(connection_url()) as conn:
+                while claimed:
+                    segment = claimed[0]
+                    try:
+                        rows += replay_segment(conn, segment, table)
+                    except psycopg.OperationalError:
+                        raise  # the database went away: retry every segment later
+                    except Exception:
+                        claimed.pop(0)
+                        if log.reject(segment):
+                            SEGMENTS_FAILED.inc()
+                            logger.exception("Moved %s to %s after repeated replay errors", segment.name, log.failed_dir)
+                        else:
+                            logger.exception("Failed to replay %s — it will be retried", segment.name)
+                        continue
+                    log.remove([claimed.pop(0)])
+    finally:
+        log.release(claimed)
+    return rows
+
+
+class PredictionLogWriter:
+    def __init__(
+        self,
+        max_queue_size: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        block_when_full: bool = False,
+        fallback: RotatingJsonlLog | None = None,
+        replay_interval: float = 30.0,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_when_full = block_when_full
+        self.fallback = fallback or RotatingJsonlLog(LOG_FILE)
+        self.replay_interval = replay_interval
+        self._next_replay = 0.0
+        self._replaying: asyncio.Task | None = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._pending: list[dict] = []
+        self._task: asyncio.Task | None = None
+        self._flushing: asyncio.Future | None = None
+
+    def start(self):
+        QUEUE_DEPTH.set_function(lambda: self._queue.qsize() + len(self._pending))
+        self._task = asyncio.create_task(self._run())
+        if is_db_enabled():
+            self._maybe_replay()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushing is not None:
+            await self._flushing
+            self._flushing = None
+
+        remaining, self._pending = self._pending, []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for i in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[i : i + self.batch_size])
+        if self._replaying is not None:
+            await self._replaying
+            self._replaying = None
+        QUEUE_DEPTH.set_function(None)
+
+    async def submit(self, entries: list[dict]):
+        for entry in entries:
+            if self.block_when_full:
+                await self._queue.put(entry)
+                continue
+            try:
+                self._queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                ENTRIES_DROPPED.inc()
+
+    async def _collect(self):
+        self._pending.append(await self._queue.get())
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+
+        while len(self._pending) < self.batch_size:
+            if not self._queue.empty():
+                self._pending.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                self._pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                break
+
+    async def _run(self):
+        while True:
+            await self._collect()
+            batch, self._pending = self._pending, []
+            # Shielded so that shutdown waits for an in-progress flush instead of cancelling it.
+            self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    def _maybe_replay(self):
+        now = time.monotonic()
+        if now < self._next_replay or (self._replaying is not None and not self._replaying.done()):
+            return
+        self._next_replay = now + self.replay_interval
+        self._replaying = asyncio.create_task(self._replay())
+
+    async def _replay(self):
+        if not is_db_enabled() and os.environ.get("DATABASE_URL"):
+            await init_db()
+        if not is_db_enabled():
+            return
+        try:
+            rows = await asyncio.to_thread(replay_segments, self.fallback)
+        except Exception:
+            FLUSH_ERRORS.inc(sink="replay")
+            logger.exception("Failed to replay JSONL prediction logs into PostgreSQL")
+            return
+        if rows:
+            ENTRIES_REPLAYED.inc(rows)
+            logger.info("Replayed %d JSONL prediction log entries into PostgreSQL", rows)
+
+    async def _flush(self, batch: list[dict]):
+        self._maybe_replay()
+        FLUSH_SIZE.observe(len(batch))
+        try:
+            observe_entries(batch)
+        except Exception:
+            logger.exception("Failed to update drift statistics")
+
+        if is_db_enabled():
+            try:
+                start = time.perf_counter()
+                await insert_predictions(batch)
+                FLUSH_SECONDS.observe(time.perf_counter() - start, sink="postgres")
+                ENTRIES_WRITTEN.inc(len(batch), sink="postgres")
+                return
+            except Exception:
+                FLUSH_ERRORS.inc(sink="postgres")
+                logger.exception("Failed to insert %d predictions — writing them to JSONL", len(batch))
+
+        try:
+            start = time.perf_counter()
+            rotated = await asyncio.to_thread(self.fallback.append, batch)
+            if rotated is not None:
+                SEGMENTS_ROTATED.inc()
+            FLUSH_SECONDS.observe(time.perf_counter() - start, sink="jsonl")
+            ENTRIES_WRITTEN.inc(len(batch), sink="jsonl")
+        except Exception:
+            FLUSH_ERRORS.inc(sink="jsonl")
+            logger.exception("Failed to write %d predictions to JSONL", len(batch))
+
+
+def rotating_log(path: Path) -> RotatingJsonlLog:
+    # The rotation settings shared by every JSONL log under LOG_DIR.
+    return RotatingJsonlLog(
+        path,
+        max_bytes=int(os.environ.get("LOG_ROTATE_BYTES", str(64 * 1024 * 1024))),
+        max_age=float(os.environ.get("LOG_ROTATE_SECONDS", "3600")),
+        compression=os.environ.get("LOG_COMPRESSION", "gzip"),
+        fsync=os.environ.get("LOG_FSYNC", "none"),
+    )
+
+
+_writer: PredictionLogWriter | None = None
+
+
+def start_log_writer():
+    global _writer
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    _writer = PredictionLogWriter(
+        max_queue_size=int(os.environ.get("LOG_QUEUE_SIZE", "10000")),
+        batch_size=int(os.environ.get("LOG_BATCH_SIZE", "500")),
+        flush_interval=float(os.environ.get("LOG_FLUSH_INTERVAL", "1.0")),
+        block_when_full=os.environ.get("LOG_QUEUE_POLICY", "drop") == "block",
+        fallback=rotating_log(LOG_FILE),
+        replay_interval=float(os.environ.get("LOG_REPLAY_INTERVAL", "30")),
+    )
+    _writer.start()
+
+
+async def stop_log_writer():
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
+
+
+async def enqueue_predictions(entries: list[dict]):
+    if _writer is None:
+        ENTRIES_DROPPED.inc(len(entries))
+        return
+    await _writer.submit(entries)
+
+
+async def log_predictions(
+    inputs: list[dict],
+    responses: list[PredictionResponse],
+    cached: bool = False,
+    model_version: str | None = None,
+):
+    timestamp = datetime.now(timezone.utc)
+    await enqueue_predictions([
+        {
+            "timestamp": timestamp,
+            "input_features": features,
+            "prediction": response.prediction,
+            "probability_default": response.probability_default,
+            "credit_decision": response.credit_decision,
+            "cached": cached,
+            "model_version": model_version,
+        }
+        for features, response in zip(inputs, responses)
+    ])
@@ -0,0 +1,164 @@
+"""Periodic maintenance of the predictions tables.
+
+1. Create the upcoming range partitions of a partitioned predictions table
+   (and move rows that landed in the default partition into their own).
+2. With ``--backfill-features``, copy the features of rows logged before the
+   typed feature columns existed out of the legacy input_features JSONB.
+3. Refresh the predictions_hourly rollups of the hours that received rows
+   since the last run, late ones included (replays, bulk loads, seeding),
+   from the raw rows.
+4. Drop partitions that are entirely older than the retention period. Rollups
+   are refreshed first and outlive the raw rows they were computed from.
+
+Run it from cron (hourly is enough). Every step is idempotent.
+
+Usage:
+    uv run --extra api python -m api.maintenance --retention-days 90
+    uv run --extra api python -m api.maintenance --backfill-features
+"""
+
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import Boolean, Double, Integer, and_, case, create_engine, func, null, select
+from sqlalchemy.dialects.postgresql import insert
+
+from api.database import (
+    FEATURE_TYPES,
+    PARTITION_PERIODS,
+    is_partitioned,
+    list_partitions,
+    partition_range,
+    partitioning_from_env,
+    predictions,
+    predictions_dirty_hours,
+    predictions_hourly,
+    rollup_aggregates,
+    run_migrations,
+)
+
+load_dotenv()
+
+logger = logging.getLogger("api.maintenance")
+
+
+def _json_number(name: str):
+    # Rows logged from raw request bodies may hold JSON booleans, which
+    # validation coerced to 0/1.
+    value = predictions.c.input_features[name]
+    return case(
+        (func.jsonb_typeof(value) == "boolean", value.astext.cast(Boolean).cast(Integer)),
+        else_=value.astext.cast(Double),
+    ).cast(FEATURE_TYPES[name])
+
+
+def backfill_feature_columns(conn, batch_size: int = 10_000) -> int:
+    # Clearing input_features both marks the row as done and frees its JSONB.
+    batch = select(predictions.c.id).where(predictions.c.input_features.isnot(None)).limit(batch_size)
+    statement = (
+        predictions.update()
+        .where(predictions.c.id.in_(batch.scalar_subquery()))
+        .values(
+            {name: _json_number(name) for name in FEATURE_TYPES}
+            | {"input_features": null()}
+        )
+    )
+    return conn.execute(statement).rowcount
+
+
+def refresh_statement(rebuild: bool = False):
+    # Recomputes the dirty hours, which it claims by deleting them in the same
+    # statement; an hour that receives more rows meanwhile is marked again.
+    # With rebuild, every hour that still has raw rows is recomputed. Rollups
+    # of hours whose rows retention dropped are never touched.
+    dirty = predictions_dirty_hours.delete().returning(predictions_dirty_hours.c.hour).cte("dirty")
+    timestamp = predictions.c.timestamp
+    if rebuild:
+        hour = func.date_trunc("hour", timestamp)
+        query = select(hour, *rollup_aggregates()).group_by(hour)
+    else:
+        hour = dirty.c.hour
+        rows = and_(timestamp >= hour, timestamp < hour + timedelta(hours=1))
+        query = select(hour, *rollup_aggregates()).select_from(dirty.join(predictions, rows)).group_by(hour)
+
+    columns = ["hour", "n_predictions", "n_denied", "n_cached", "probability_sum", "probability_histogram"]
+    statement = insert(predictions_hourly).from_select(columns, query).add_cte(dirty)
+    statement = statement.on_conflict_do_update(
+        index_elements=["hour"],
+        set_={name: statement.excluded[name] for name in columns[1:]},
+    )
+    return statement.returning(predictions_hourly.c.hour)
+
+
+def refresh_rollups(conn, rebuild: bool = False) -> int:
+    return len(conn.execute(refresh_statement(rebuild)).all())
+
+
+def drop_expired_partitions(conn, period: str, retention_days: int) -> list[str]:
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+    dropped = []
+    for name in list_partitions(conn):
+        suffix = name.removeprefix("predictions_p")
+        if not suffix.isdigit():
+            continue
+        start = date(int(suffix[:4]), int(suffix[4:6]), int(suffix[6:8]) if period == "daily" else 1)
+        if partition_range(start, period)[1] <= cutoff:
+            conn.exec_driver_sql(f"DROP TABLE {name}")
+            dropped.append(name)
+    return dropped
+
+
+def run_maintenance(
+    conn, partitioning: str | None, retention_days: int = 0, ahead: int = 3, rebuild_rollups: bool = False
+):
+    run_migrations(conn, partitioning, ahead)
+    logger.info("Refreshed %d hourly rollups", refresh_rollups(conn, rebuild_rollups))
+
+    if retention_days > 0:
+        if partitioning and is_partitioned(conn):
+            for name in drop_expired_partitions(conn, partitioning, retention_days):
+                logger.info("Dropped partition %s", name)
+        else:
+            logger.warning("Retention needs a partitioned predictions table — nothing dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain prediction partitions, rollups and retention.")
+    parser.add_argument("--partitioning", choices=["none", *PARTITION_PERIODS], default=partitioning_from_env() or "none")
+    parser.add_argument("--retention-days", type=int, default=int(os.environ.get("PREDICTIONS_RETENTION_DAYS", "0")))
+    parser.add_argument("--partitions-ahead", type=int, default=int(os.environ.get("PREDICTIONS_PARTITIONS_AHEAD", "3")))
+    parser.add_argument("--rebuild-rollups", action="store_true", help="Recompute the rollups of every hour with raw rows")
+    parser.add_argument("--backfill-features", action="store_true", help="Move legacy JSONB features into typed columns")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level="INFO", format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    url = os.environ["DATABASE_URL"]
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+psycopg://", 1)
+
+    engine = create_engine(url)
+    partitioning = None if args.partitioning == "none" else args.partitioning
+    with engine.begin() as conn:
+        run_migrations(conn, partitioning, args.partitions_ahead)
+
+    if args.backfill_features:
+        total = 0
+        while True:
+            with engine.begin() as conn:
+                updated = backfill_feature_columns(conn, args.batch_size)
+            if not updated:
+                break
+            total += updated
+            logger.info("Backfilled typed features for %d rows", total)
+
+    with engine.begin() as conn:
+        run_maintenance(conn, partitioning, args.retention_days, args.partitions_ahead, args.rebuild_rollups)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Minimal Prometheus text-format metrics registry.
+
+Kept dependency-free so the API image does not need ``prometheus_client``.
+Metrics are thread-safe; ``render()`` produces the exposition format served by
+``GET /metrics``.
+
+When several worker processes serve the app (see ``api.serve``), set
+``METRICS_MULTIPROC_DIR`` to a shared directory. Each worker then snapshots
+its values to ``<dir>/<pid>.json`` every ``SNAPSHOT_INTERVAL`` seconds and
+``render()`` merges all snapshots, so any worker answers a scrape with
+node-wide totals. Counters and histograms of exited workers are kept; gauges
+only count live workers.
+"""
+
+import json
+import math
+import os
+import threading
+from bisect import bisect_left
+from collections.abc import Callable
+from pathlib import Path
+
+REGISTRY: list["_Metric"] = []
+
+SNAPSHOT_INTERVAL = 1.0
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _format_labels(labelnames: tuple[str, ...], labelvalues: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect(self) -> dict[tuple[str, ...], object]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, into: dict, values: dict):
+        for key, value in values.items():
+            into[key] = into.get(key, 0.0) + value
+
+    def samples(self, values: dict) -> list[tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self, values: dict | None = None) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        values = self.collect() if values is None else values
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples(values))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self, values):
+        return [(f"{self.name}_total", _format_labels(self.labelnames, key), value) for key, value in values.items()]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._functions: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float] | None, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if function is None:
+                self._functions.pop(key, None)
+            else:
+                self._functions[key] = function
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        if key in self._functions:
+            return float(self._functions[key]())
+        return self._values.get(key, 0.0)
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            values[key] = float(function())
+        return values
+
+    def samples(self, values):
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def collect(self):
+        with self._lock:
+            return {key: [list(state[0]), state[1], state[2]] for key, state in self._values.items()}
+
+    def merge(self, into, values):
+        for key, (bucket_counts, total, count) in values.items():
+            state = into.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            state[0] = [a + b for a, b in zip(state[0], bucket_counts)]
+            state[1] += total
+            state[2] += count
+
+    def samples(self, values):
+        samples = []
+        for key, (bucket_counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                samples.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, le), cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), count))
+        return samples
+
+
+def _multiproc_dir() -> Path | None:
+    directory = os.environ.get("METRICS_MULTIPROC_DIR")
+    return Path(directory) if directory else None
+
+
+def write_snapshot(directory: Path):
+    snapshot = {
+        metric.name: [[list(key), value] for key, value in metric.collect().items()]
+        for metric in REGISTRY
+    }
+    path = directory / f"{os.getpid()}.json"
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(snapshot))
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merged_values(directory: Path) -> dict[str, dict]:
+    write_snapshot(directory)
+    merged = {metric.name: {} for metric in REGISTRY}
+    metrics_by_name = {metric.name: metric for metric in REGISTRY}
+
+    for path in directory.glob("*.json"):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        alive = _pid_alive(int(path.stem))
+        for name, entries in snapshot.items():
+            metric = metrics_by_name.get(name)
+            if metric is None or (metric.type == "gauge" and not alive):
+                continue
+            metric.merge(merged[name], {tuple(key): value for key, value in entries})
+
+    return merged
+
+
+def start_snapshots() -> threading.Event | None:
+    directory = _multiproc_dir()
+    if directory is None:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    stopped = threading.Event()
+
+    def loop():
+        while not stopped.wait(SNAPSHOT_INTERVAL):
+            write_snapshot(directory)
+
+    threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+    return stopped
+
+
+def stop_snapshots(stopped: threading.Event | None):
+    if stopped is None:
+        return
+    stopped.set()
+    write_snapshot(_multiproc_dir())
+
+
+def render() -> str:
+    directory = _multiproc_dir()
+    if directory is None:
+        return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+    merged = _merged_values(directory)
+    return "\n".join(metric.render(merged[metric.name]) for metric in REGISTRY) + "\n"
@@ -0,0 +1,317 @@
+"""Export logged predictions to a date-partitioned Parquet dataset, and query it.
+
+Predictions are written under ``<root>/date=YYYY-MM-DD/`` (UTC days), with
+the ten features as typed columns next to timestamp, prediction,
+probability_default, credit_decision, cached and model_version. Rows come
+from the ``predictions`` table through binary ``COPY ... TO STDOUT`` (one day
+at a time, ``--chunk-size`` rows per row group) or, with ``--jsonl``, from API
+fallback logs and their rotated segments. A day exported from the table is
+rewritten whole, to a temporary file renamed over the previous one, so
+exports are idempotent. Rows are exported once whichever way they arrive:
+``--jsonl`` skips segments that ``replayed_segments`` records as loaded into
+the table, and a day exported from the table drops the files of segments
+replayed since they were exported. Without ``--start``, the export resumes at the last
+exported day, which may have been partial, so an hourly cron job keeps the
+dataset current. Rows logged before the typed feature columns existed need
+``api.maintenance --backfill-features`` first.
+
+``read_predictions`` and ``scan_predictions`` read only the requested columns
+of the day partitions overlapping ``[start, end)``, from memory-mapped files,
+as Arrow data; analysing a month of traffic never goes through JSON or whole
+rows. Requires pyarrow.
+
+Usage:
+    uv run --extra api python -m api.parquet_export
+    uv run --extra api python -m api.parquet_export --start 2025-01-01 --end 2025-02-01
+    uv run --extra api python -m api.parquet_export --jsonl logs/predictions*.jsonl*
+"""
+
+import argparse
+import os
+import time
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from psycopg import sql
+from sqlalchemy import Boolean, DateTime, Double, Integer, SmallInteger, String
+
+from api.bulk_load import CHUNK_SIZE, COPY_TYPES, connection_url, read_chunks
+from api.database import predictions
+
+load_dotenv()
+
+EXPORT_DIR = Path("data/predictions_parquet")
+EXPORT_COLUMNS = [column.name for column in predictions.columns if column.name not in ("id", "input_features")]
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    arrow_types = {
+        Boolean: pa.bool_(),
+        DateTime: pa.timestamp("us", tz="UTC"),
+        Double: pa.float64(),
+        Integer: pa.int32(),
+        SmallInteger: pa.int16(),
+        String: pa.string(),
+    }
+    return pa.schema([(name, arrow_types[type(predictions.c[name].type)]) for name in EXPORT_COLUMNS])
+
+
+def partition_dir(root: Path, day: date) -> Path:
+    return root / f"date={day.isoformat()}"
+
+
+def exported_days(root: Path) -> list[date]:
+    return sorted(date.fromisoformat(path.name.removeprefix("date=")) for path in root.glob("date=*"))
+
+
+def jsonl_file_name(path: Path) -> str:
+    stem = path.name
+    for suffix in (".gz", ".zst", ".jsonl", ".json"):
+        stem = stem.removesuffix(suffix)
+    return f"jsonl-{stem}.parquet"
+
+
+def replayed_segments(conn) -> set[str]:
+    return {name for (name,) in conn.execute("SELECT name FROM replayed_segments")}
+
+
+def remove_replayed(directory: Path, replayed: set[str]) -> None:
+    # Rows of these segments are in the table now, and in its export.
+    for name in replayed:
+        (directory / jsonl_file_name(Path(name))).unlink(missing_ok=True)
+
+
+def _utc(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+class PartitionWriter:
+    """Writes record batches to one Parquet file, renamed into place on close."""
+
+    def __init__(self, path: Path, schema):
+        import pyarrow.parquet as pq
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.partial = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        self.writer = pq.ParquetWriter(self.partial, schema, compression="zstd")
+        self.rows = 0
+
+    def write(self, table):
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.partial, self.path)
+
+    def abort(self):
+        self.writer.close()
+        self.partial.unlink(missing_ok=True)
+
+
+def copy_day(conn, day: date, chunk_size: int = CHUNK_SIZE) -> Iterator[list[tuple]]:
+    statement = sql.SQL(
+        "COPY (SELECT {} FROM predictions WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp, id) "
+        "TO STDOUT WITH (FORMAT binary)"
+    ).format(sql.SQL(", ").join(map(sql.Identifier, EXPORT_COLUMNS)))
+    with conn.cursor().copy(statement, (_utc(day), _utc(day + timedelta(days=1)))) as copy:
+        copy.set_types([COPY_TYPES[type(predictions.c[name].type)] for name in EXPORT_COLUMNS])
+        rows = []
+        for row in copy.rows():
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+
+def export_day(
+    conn, root: Path, day: date, chunk_size: int = CHUNK_SIZE, replayed: set[str] = frozenset()
+) -> int:
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    writer = None
+    try:
+        for rows in copy_day(conn, day, chunk_size):
+            if writer is None:
+                writer = PartitionWriter(partition_dir(root, day) / "predictions.parquet", schema)
+            arrays = [pa.array(values, field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write(pa.Table.from_arrays(arrays, schema=schema))
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is None:
+        return 0
+    writer.close()
+    remove_replayed(writer.path.parent, replayed)
+    return writer.rows
+
+
+def export_days(
+    conn,
+    root: Path,
+    start: date | None = None,
+    end: date | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    progress=None,
+) -> int:
+    if start is None:
+        days = exported_days(root)
+        if days:
+            start = days[-1]
+        else:
+            first = conn.execute("SELECT min(timestamp) FROM predictions").fetchone()[0]
+            if first is None:
+                return 0
+            start = first.astimezone(timezone.utc).date()
+    end = end or datetime.now(timezone.utc).date() + timedelta(days=1)
+
+    replayed = replayed_segments(conn)
+    total = 0
+    day = start
+    while day < end:
+        rows = export_day(conn, root, day, chunk_size, replayed)
+        total += rows
+        if progress is not None:
+            progress(day, rows)
+        day += timedelta(days=1)
+    return total
+
+
+def export_jsonl(
+    paths: Iterable[Path],
+    root: Path,
+    chunk_size: int = CHUNK_SIZE,
+    progress=None,
+    replayed: set[str] = frozenset(),
+) -> int:
+    # One file per source and day, named after the source, so re-exporting a
+    # log replaces its own files only. Segments already replayed into the
+    # table are left to the table export.
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    total = 0
+    for path in paths:
+        if path.name in replayed:
+            if progress is not None:
+                progress(path, 0)
+            continue
+        name = jsonl_file_name(path)
+        writers: dict[date, PartitionWriter] = {}
+        try:
+            for chunk in read_chunks(path, chunk_size):
+                chunk = chunk.reindex(columns=EXPORT_COLUMNS)
+                # As on replay, logs written before the result cache existed
+                # have no cache hits.
+                chunk["cached"] = chunk["cached"].eq(True)
+                for day, rows in chunk.groupby(chunk["timestamp"].dt.date, sort=True):
+                    if day not in writers:
+                        writers[day] = PartitionWriter(partition_dir(root, day) / name, schema)
+                    writers[day].write(pa.Table.from_pandas(rows, schema=schema, preserve_index=False))
+                    total += len(rows)
+        except BaseException:
+            for writer in writers.values():
+                writer.abort()
+            raise
+        for writer in writers.values():
+            writer.close()
+        if progress is not None:
+            progress(path, sum(writer.rows for writer in writers.values()))
+    return total
+
+
+def _dataset(root: Path):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    return ds.dataset(
+        root,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("date", pa.date32())]), flavor="hive"),
+    )
+
+
+def _range_filter(start: datetime | date | None, end: datetime | date | None):
+    # The date predicate prunes partitions; the timestamp one trims the edge days.
+    import pyarrow.dataset as ds
+
+    expression = None
+    for bound, is_start in ((start, True), (end, False)):
+        if bound is None:
+            continue
+        if not isinstance(bound, datetime):
+            bound = _utc(bound)
+        bound = bound.astimezone(timezone.utc)
+        if is_start:
+            condition = (ds.field("date") >= bound.date()) & (ds.field("timestamp") >= bound)
+        else:
+            last_day = (bound - timedelta(microseconds=1)).date()
+            condition = (ds.field("date") <= last_day) & (ds.field("timestamp") < bound)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_predictions(
+    root: Path = EXPORT_DIR,
+    columns: list[str] | None = None,
+    start: datetime | date | None = None,
+    end: datetime | date | None = None,
+):
+    return _dataset(root).to_table(columns=columns, filter=_range_filter(start, end))
+
+
+def scan_predictions(
+    root: Path = EXPORT_DIR,
+    columns: list[str] | None = None,
+    start: datetime | date | None = None,
+    end: datetime | date | None = None,
+    batch_size: int = CHUNK_SIZE,
+):
+    # Record batches in bounded memory, for aggregations over long ranges.
+    return _dataset(root).to_batches(columns=columns, filter=_range_filter(start, end), batch_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", type=Path, default=EXPORT_DIR, help="Dataset directory")
+    parser.add_argument("--start", type=date.fromisoformat, help="First UTC day (default: last exported day)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Day after the last one (default: tomorrow)")
+    parser.add_argument("--jsonl", type=Path, nargs="+", help="Export API JSONL logs instead of the table")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    def progress(part, rows: int):
+        print(f"  {part}: {rows:,} rows")
+
+    print(f"Exporting predictions to {args.root}...")
+    import psycopg
+
+    if args.jsonl:
+        replayed = set()
+        if os.environ.get("DATABASE_URL"):
+            with psycopg.connect(connection_url()) as conn:
+                replayed = replayed_segments(conn)
+        total = export_jsonl(args.jsonl, args.root, args.chunk_size, progress, replayed)
+    else:
+        with psycopg.connect(connection_url()) as conn:
+            total = export_days(conn, args.root, args.start, args.end, args.chunk_size, progress)
+
+    elapsed = time.perf_counter() - started
+    print(f"\nExported {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Fast parsing of batch prediction payloads into float32 feature rows.
+
+FastAPI validates a JSON body by building a Pydantic model for every
+applicant, which costs more than scoring a batch. ``/predict/batch`` takes
+the decoded body instead: ``FeatureParser.check`` takes the applicant
+objects and, when every feature is a plain JSON number (an integer for
+integer fields), checks them all against the model's bounds with one
+vectorized comparison. Anything else (missing or mistyped fields, numeric
+strings, booleans, out-of-range values) goes through ``validate``, which runs
+the Pydantic model and raises the same ``RequestValidationError`` FastAPI
+would, so coercions and 422 responses are unchanged. The bounds are read from
+the model's fields, so both paths enforce the same limits.
+
+Bodies are still decoded by FastAPI, with its content-type rules and error
+responses; ``JSONRoute`` only swaps ``json.loads`` for pydantic-core's
+parser, which reads float-heavy batches about three times faster.
+"""
+
+import json
+
+import annotated_types
+import numpy as np
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
+from pydantic_core import from_json
+
+NUMBER_TYPES = {int, float}
+
+
+class JSONRequest(Request):
+    async def json(self):
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            try:
+                self._json = from_json(body)
+            except ValueError:
+                # jiter rejects a few documents json.loads accepts (BOMs, UTF-16,
+                # lone surrogates), and json.loads raises the errors FastAPI reports.
+                self._json = json.loads(body)
+        return self._json
+
+
+class JSONRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            return await handler(JSONRequest(request.scope, request.receive))
+
+        return route_handler
+
+
+def validate(model: type[BaseModel], payload) -> BaseModel:
+    if payload is None:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+    try:
+        return model.model_validate(payload, from_attributes=True)
+    except ValidationError as e:
+        errors = [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        raise RequestValidationError(errors, body=payload) from e
+
+
+def request_body(model: type[BaseModel]) -> dict:
+    # OpenAPI for endpoints that take the body undeclared, with nested models inlined.
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def inline(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(definitions[node["$ref"].rsplit("/", 1)[1]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": inline(schema)}}}}
+
+
+class FeatureParser:
+    def __init__(self, model: type[BaseModel], order: list[str]):
+        self.model = model
+        self.order = order
+        fields = model.model_fields
+        # Inclusive float64 bounds: x > gt is x >= nextafter(gt, inf) for any float.
+        self.lower = np.full(len(order), -np.inf)
+        self.upper = np.full(len(order), np.inf)
+        for i, name in enumerate(order):
+            for bound in fields[name].metadata:
+                if isinstance(bound, annotated_types.Ge):
+                    self.lower[i] = bound.ge
+                elif isinstance(bound, annotated_types.Gt):
+                    self.lower[i] = np.nextafter(bound.gt, np.inf)
+                elif isinstance(bound, annotated_types.Le):
+                    self.upper[i] = bound.le
+                elif isinstance(bound, annotated_types.Lt):
+                    self.upper[i] = np.nextafter(bound.lt, -np.inf)
+        self.integers = [name for name in order if fields[name].annotation is int]
+        self.integer_columns = [order.index(name) for name in self.integers]
+
+    def check(self, objects: list) -> np.ndarray | None:
+        # Validated float64 rows in feature order, or None if Pydantic must decide.
+        try:
+            values = [[obj[name] for name in self.order] for obj in objects]
+        except (KeyError, TypeError):
+            return None
+        if not {type(value) for row in values for value in row} <= NUMBER_TYPES:
+            return None
+        if any(type(row[i]) is not int for row in values for i in self.integer_columns):
+            return None
+        try:
+            array = np.array(values, dtype=np.float64)
+        except OverflowError:
+            return None
+        # NaN fails both comparisons and is left to Pydantic as well.
+        return array if ((array >= self.lower) & (array <= self.upper)).all() else None
+
+    def rows(self, checked: np.ndarray) -> tuple[list[dict], np.ndarray]:
+        # The logged inputs, typed as model_dump() would type them, and the model rows.
+        inputs = [dict(zip(self.order, row)) for row in checked.tolist()]
+        if self.integers:
+            for data in inputs:
+                for name in self.integers:
+                    data[name] = int(data[name])
+        return inputs, checked.astype(np.float32)
@@ -0,0 +1,68 @@
+"""On-demand profiling of a running worker.
+
+``sample_stacks`` samples the Python stack of every thread at a fixed interval
+and returns them in the folded format read by flamegraph.pl, speedscope and
+inferno (``root;caller;callee count`` per line). ``profile_calls`` runs
+cProfile for a window; on Python 3.12+ it sees every thread, on older versions
+only the event loop. Nothing runs until one of them is called, so they cost
+nothing while idle. ``api.app`` exposes them, with ONNX Runtime's per-operator
+profiler (``SessionPool.profile_operators``), under ``/admin/profile`` only
+when ``ADMIN_TOKEN`` is set.
+"""
+
+import asyncio
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> str:
+    sampler = threading.get_ident()
+    counts: Counter[str] = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == sampler:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+async def profile_calls(seconds: float) -> pstats.Stats:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    return pstats.Stats(profiler)
+
+
+def dump_stats(stats: pstats.Stats) -> bytes:
+    # The same bytes as Stats.dump_stats, readable with pstats.Stats(path) or snakeviz.
+    return marshal.dumps(stats.stats)
+
+
+def format_stats(stats: pstats.Stats, sort: str = "cumulative", limit: int = 50) -> str:
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
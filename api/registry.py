@@ -0,0 +1,231 @@
+"""Registry of the model versions served by the API.
+
+Versions are listed in a JSON manifest, given by ``MODEL_MANIFEST`` as a file
+or as a directory holding ``manifest.json``. Relative paths are resolved
+against the manifest's directory:
+
+    {
+      "default": "lightgbm-v1",
+      "versions": {
+        "lightgbm-v1": {"path": "lightgbm_optimized.onnx", "threshold": 0.10},
+        "lightgbm-v2": {"path": "candidate.onnx", "threshold": 0.12, "traffic": 10}
+      }
+    }
+
+Each version has its own decision ``threshold`` and may set ``features``, the
+order of the model inputs (the API's ``FEATURE_ORDER`` by default), and
+``trees``, its compiled ``.npz`` for ``INFERENCE_BACKEND=numpy``. ``traffic``
+is the percentage of requests routed to a version; the default version takes
+the rest. A request can pin a version with the ``X-Model-Version`` header.
+A version's threshold can be changed while it serves with
+``write_threshold``, which also records it in the manifest. Versions with
+``"shadow": true`` never answer requests: they are candidates
+scored off the request path by ``api.shadow`` on a single low-priority
+ONNX Runtime thread. Without a manifest, the registry holds the bundled model
+alone.
+
+``load_registry`` builds and warms every version with blocking calls, so the
+API runs it off the event loop while the current registry keeps serving, then
+swaps the new one in with a single assignment. ``ModelRegistry.close`` waits
+for the calls still using a version before releasing it.
+"""
+
+import asyncio
+import json
+import os
+import random
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from api.batching import MicroBatcher
+from api.inference import SessionPool, build_session_options, lower_thread_priority, session_pool_from_env
+from api.tree_backend import TreeEnsemblePredictor, tree_predictor_from_env
+
+
+class ModelVersion:
+    def __init__(
+        self,
+        name: str,
+        predictor: SessionPool | TreeEnsemblePredictor,
+        threshold: float,
+        features: list[str],
+        traffic: float = 0.0,
+        path: Path | None = None,
+        columns: np.ndarray | None = None,
+        shadow: bool = False,
+    ):
+        self.name = name
+        self.predictor = predictor
+        self.threshold = threshold
+        self.features = features
+        self.traffic = traffic
+        self.path = path
+        # Positions of the model inputs in the API's feature order; None if they match.
+        self.columns = columns
+        self.shadow = shadow
+        self.batcher: MicroBatcher | None = None
+        self._in_flight = 0
+        self._idle: asyncio.Event | None = None
+
+    @contextmanager
+    def use(self):
+        self._in_flight += 1
+        try:
+            yield self
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0 and self._idle is not None:
+                self._idle.set()
+
+    def inputs(self, rows: np.ndarray) -> np.ndarray:
+        return rows if self.columns is None else rows[:, self.columns]
+
+    async def run(self, rows: np.ndarray) -> np.ndarray:
+        return await self.predictor.run(self.inputs(rows))
+
+    async def score(self, row: np.ndarray) -> float:
+        if self.batcher is not None:
+            return await self.batcher.submit(self.inputs(row))
+        return float((await self.predictor.run(self.inputs(row)))[0])
+
+    def start_batching(self, **options):
+        self.batcher = MicroBatcher(self.predictor.run, max_concurrent_batches=self.predictor.concurrency, **options)
+        self.batcher.start()
+
+    async def close(self):
+        if self._in_flight:
+            self._idle = asyncio.Event()
+            await self._idle.wait()
+        if self.batcher is not None:
+            await self.batcher.stop()
+        await asyncio.to_thread(self.predictor.close)
+
+
+class ModelRegistry:
+    def __init__(self, versions: dict[str, ModelVersion], default: str, shadows: dict[str, ModelVersion] | None = None):
+        if default not in versions:
+            raise ValueError(f"Default model version {default!r} is not in the registry")
+        if sum(version.traffic for version in versions.values() if version.name != default) > 100:
+            raise ValueError("Traffic percentages of non-default model versions add up to more than 100")
+        self.versions = versions
+        self.default = versions[default]
+        self.shadows = shadows or {}
+        self._routes = [version for version in versions.values() if version.traffic > 0 and version is not self.default]
+
+    def select(self, name: str | None = None) -> ModelVersion:
+        if name is not None:
+            return self.versions[name]
+        draw = random.uniform(0, 100)
+        for version in self._routes:
+            draw -= version.traffic
+            if draw < 0:
+                return version
+        return self.default
+
+    async def close(self):
+        versions = [*self.versions.values(), *self.shadows.values()]
+        await asyncio.gather(*(version.close() for version in versions))
+
+
+def manifest_from_env() -> Path | None:
+    manifest = os.environ.get("MODEL_MANIFEST")
+    if not manifest:
+        return None
+    path = Path(manifest)
+    return path / "manifest.json" if path.is_dir() else path
+
+
+def write_threshold(manifest: Path, name: str, threshold: float):
+    # Replaces the manifest in one rename, so a concurrent reload never reads
+    # a half-written file.
+    spec = json.loads(manifest.read_text())
+    if name not in spec["versions"]:
+        raise KeyError(f"Model version {name!r} is not in {manifest}")
+    spec["versions"][name]["threshold"] = threshold
+    partial = manifest.with_name(f".{manifest.name}.{os.getpid()}.tmp")
+    partial.write_text(json.dumps(spec, indent=2) + "\n")
+    os.replace(partial, manifest)
+
+
+def read_thresholds(manifest: Path) -> dict[str, float]:
+    spec = json.loads(manifest.read_text())
+    return {name: float(entry["threshold"]) for name, entry in spec["versions"].items() if "threshold" in entry}
+
+
+def background_pool(model_path: Path, timing_stage: str) -> SessionPool:
+    # One single-threaded session on a low-priority thread, so background
+    # scoring only uses CPU time the served models leave idle.
+    return SessionPool(
+        model_path,
+        options=build_session_options(intra_op_threads=1, inter_op_threads=1),
+        executor_initializer=lower_thread_priority,
+        timing_stage=timing_stage,
+    )
+
+
+def build_predictor(model_path: Path, trees_path: Path | None, shadow: bool = False) -> SessionPool | TreeEnsemblePredictor:
+    if shadow:
+        return background_pool(model_path, "shadow_model_run")
+    if os.environ.get("INFERENCE_BACKEND", "onnxruntime") == "numpy":
+        return tree_predictor_from_env(trees_path or model_path.with_name(f"{model_path.stem}_trees.npz"), model_path)
+    return session_pool_from_env(model_path)
+
+
+def load_version(
+    name: str,
+    model_path: Path,
+    threshold: float,
+    features: list[str],
+    known_features: list[str],
+    traffic: float = 0.0,
+    trees_path: Path | None = None,
+    shadow: bool = False,
+) -> ModelVersion:
+    unknown = set(features) - set(known_features)
+    if unknown:
+        raise ValueError(f"Model version {name!r} uses unknown features {sorted(unknown)}")
+    predictor = build_predictor(model_path, trees_path, shadow)
+    try:
+        predictor.warm_up(np.zeros((1, len(features)), dtype=np.float32))
+    except Exception:
+        predictor.close()
+        raise
+    columns = None if features == known_features else np.array([known_features.index(f) for f in features])
+    return ModelVersion(name, predictor, threshold, features, traffic, model_path, columns, shadow)
+
+
+def load_registry(
+    manifest: Path | None,
+    default_model: Path,
+    default_trees: Path,
+    threshold: float,
+    features: list[str],
+) -> ModelRegistry:
+    if manifest is None:
+        version = load_version(default_model.stem, default_model, threshold, features, features, trees_path=default_trees)
+        return ModelRegistry({version.name: version}, version.name)
+
+    spec = json.loads(manifest.read_text())
+    root = manifest.parent
+    versions: dict[str, ModelVersion] = {}
+    shadows: dict[str, ModelVersion] = {}
+    try:
+        for name, entry in spec["versions"].items():
+            shadow = bool(entry.get("shadow", False))
+            (shadows if shadow else versions)[name] = load_version(
+                name,
+                root / entry["path"],
+                float(entry.get("threshold", threshold)),
+                list(entry.get("features", features)),
+                features,
+                float(entry.get("traffic", 0)),
+                root / entry["trees"] if "trees" in entry else None,
+                shadow,
+            )
+        return ModelRegistry(versions, spec.get("default", next(iter(versions), None)), shadows)
+    except Exception:
+        for version in [*versions.values(), *shadows.values()]:
+            version.predictor.close()
+        raise
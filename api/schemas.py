@@ -1,6 +1,8 @@
 from datetime import datetime
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+MAX_BATCH_SIZE = 10_000
 
 
 class CreditFeatures(BaseModel):
@@ -62,6 +64,17 @@ class PredictionResponse(BaseModel):
     credit_decision: str
 
 
+class BatchPredictionRequest(BaseModel):
+    applicants: list[CreditFeatures] = Field(
+        min_length=1, max_length=MAX_BATCH_SIZE,
+        description="Applicants to score in a single inference call",
+    )
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: list[PredictionResponse]
+
+
 class PredictionLog(BaseModel):
     id: int
     timestamp: datetime
@@ -69,6 +82,102 @@ class PredictionLog(BaseModel):
     prediction: int | None = None
     probability_default: float | None = None
     credit_decision: str | None = None
+    cached: bool | None = None
+    model_version: str | None = None
+
+
+class SummaryBucket(BaseModel):
+    start: datetime
+    total: int
+    denied: int
+    cached: int
+    mean_probability: float | None = None
+
+
+class PredictionSummary(BaseModel):
+    start: datetime | None = None
+    end: datetime | None = None
+    bucket: str
+    total: int
+    approved: int
+    denied: int
+    cached: int
+    approval_rate: float | None = None
+    mean_probability: float | None = None
+    # Edges of the probability_histogram bins over [0, 1].
+    probability_bins: list[float]
+    probability_histogram: list[int]
+    series: list[SummaryBucket]
+
+
+class ThresholdPoint(BaseModel):
+    threshold: float
+    cost: float
+    tn: int
+    fp: int
+    fn: int
+    tp: int
+    recall: float
+    precision: float
+    f1: float
+
+
+class ThresholdAnalysis(BaseModel):
+    rows: int
+    positives: int
+    cost_fp: float
+    cost_fn: float
+    optimal: ThresholdPoint
+    current: ThresholdPoint | None = None
+    curve: list[ThresholdPoint]
+
+
+class OutcomeAnalysisRequest(BaseModel):
+    probabilities: list[float] = Field(min_length=1, description="Predicted default probabilities")
+    labels: list[int] = Field(min_length=1, description="Observed outcomes (1 = default)")
+    cost_fp: float = Field(1.0, ge=0.0, description="Cost of denying a good client")
+    cost_fn: float = Field(10.0, ge=0.0, description="Cost of approving a defaulter")
+    step: float = Field(0.05, gt=0.0, le=0.5, description="Spacing of the returned curve")
+
+    @model_validator(mode="after")
+    def check_outcomes(self):
+        if len(self.probabilities) != len(self.labels):
+            raise ValueError("probabilities and labels must have the same length")
+        if not set(self.labels) <= {0, 1}:
+            raise ValueError("labels must be 0 or 1")
+        return self
+
+
+class ThresholdUpdate(BaseModel):
+    threshold: float = Field(ge=0.0, le=1.0)
+
+
+class ModelVersionInfo(BaseModel):
+    name: str
+    threshold: float
+    traffic: float
+    features: list[str]
+    default: bool
+    shadow: bool = False
+
+
+class DriftScore(BaseModel):
+    psi: float
+    ks: float
+    js: float
+    drift: bool
+
+
+class DriftWindow(BaseModel):
+    count: int
+    features: dict[str, DriftScore]
+    prediction: DriftScore | None = None
+
+
+class DriftReport(BaseModel):
+    reference_rows: int
+    psi_threshold: float
+    windows: dict[str, DriftWindow]
 
 
 class HealthResponse(BaseModel):
@@ -9,13 +9,14 @@ Usage:
 
 import os
 import pickle
-from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
+
+from api.bulk_load import copy_frames
+from monitoring.generate_traffic import FEATURE_COLUMNS, generate_chunks, write_postgres
 
 load_dotenv()
 
@@ -27,52 +28,22 @@ DATABASE_URL = os.environ["DATABASE_URL"]
 
 N_REQUESTS = 1000
 DAYS_SPAN = 7
-OPTIMAL_THRESHOLD = 0.10
-
-FEATURE_COLUMNS = [
-    "EXT_SOURCES_MEAN",
-    "CREDIT_TERM",
-    "EXT_SOURCE_3",
-    "GOODS_PRICE_CREDIT_PERCENT",
-    "INSTAL_AMT_PAYMENT_sum",
-    "AMT_ANNUITY",
-    "POS_CNT_INSTALMENT_FUTURE_mean",
-    "DAYS_BIRTH",
-    "EXT_SOURCES_WEIGHTED",
-    "EXT_SOURCE_2",
-]
-
-
-def sample_with_drift(ref_data: pd.DataFrame, rng: np.random.Generator) -> dict:
-    """Sample a row from reference data and apply drift to 3 features."""
-    row = ref_data.sample(n=1, random_state=int(rng.integers(0, 2**31))).iloc[0]
-    features = row[FEATURE_COLUMNS].to_dict()
-
-    features["EXT_SOURCE_2"] = max(0.0, min(1.0, features["EXT_SOURCE_2"] - 0.15))
-    features["DAYS_BIRTH"] = min(-1, int(features["DAYS_BIRTH"] + 3000))
-    features["AMT_ANNUITY"] = round(features["AMT_ANNUITY"] * 1.20, 2)
-
-    return features
-
-
-def generate_timestamps(n: int, rng: np.random.Generator) -> list[datetime]:
-    """Generate n sorted timestamps spread over DAYS_SPAN days."""
-    now = datetime.now(timezone.utc)
-    start = now - timedelta(days=DAYS_SPAN)
-    offsets = sorted(rng.uniform(0, DAYS_SPAN * 86400, size=n))
-    return [start + timedelta(seconds=float(s)) for s in offsets]
 
 
 def seed_reference_data(engine, ref_data: pd.DataFrame):
     """Truncate and re-insert reference data."""
     print(f"Seeding reference_data ({len(ref_data):,} rows)...")
     columns = ["TARGET"] + FEATURE_COLUMNS
-    df = ref_data[columns].copy()
-
-    with engine.begin() as conn:
-        conn.execute(text("TRUNCATE TABLE reference_data"))
-
-    df.to_sql("reference_data", engine, if_exists="append", index=False, method="multi", chunksize=5000)
+    df = ref_data[columns]
+
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        conn.execute("TRUNCATE TABLE reference_data")
+        copy_frames(conn, "reference_data", [df])
+        conn.commit()
+    finally:
+        raw.close()
     print(f"  Inserted {len(df):,} rows into reference_data.")
 
 
@@ -82,37 +53,9 @@ def seed_predictions(engine, ref_data: pd.DataFrame):
     with open(MODEL_PATH, "rb") as f:
         model = pickle.load(f)
 
-    rng = np.random.default_rng(42)
-
-    timestamps = generate_timestamps(N_REQUESTS, rng)
-    entries = []
-
     print(f"Generating {N_REQUESTS} synthetic predictions...")
-    for ts in timestamps:
-        features = sample_with_drift(ref_data, rng)
-        df = pd.DataFrame([features])
-        df = df[model.feature_name_]
-
-        probability = float(model.predict_proba(df)[0, 1])
-        prediction = int(probability >= OPTIMAL_THRESHOLD)
-        credit_decision = "denied" if prediction == 1 else "approved"
-
-        entries.append({
-            "timestamp": ts,
-            "input_features": features,
-            "prediction": prediction,
-            "probability_default": round(probability, 6),
-            "credit_decision": credit_decision,
-        })
-
-    from api.database import predictions as predictions_table
-
-    with engine.begin() as conn:
-        conn.execute(text("TRUNCATE TABLE predictions"))
-        for i in range(0, len(entries), 500):
-            conn.execute(predictions_table.insert(), entries[i : i + 500])
-
-    n_denied = sum(1 for e in entries if e["credit_decision"] == "denied")
+    chunks = generate_chunks(ref_data, model, N_REQUESTS, DAYS_SPAN, drift="default", seed=42)
+    n_denied = sum(int(chunk["prediction"].sum()) for chunk in write_postgres(chunks, engine, truncate=True))
 
     print(f"  Inserted {N_REQUESTS} entries into predictions.")
     print(f"  Denied: {n_denied}/{N_REQUESTS} ({n_denied / N_REQUESTS:.1%})")
@@ -126,10 +69,12 @@ def main():
     print("Connecting to database...")
     engine = create_engine(url)
 
-    # Create tables if they don't exist
-    from api.database import metadata
+    # Create or upgrade the schema as the API does at startup, partitions,
+    # indexes and the rollup trigger included.
+    from api.database import partitioning_from_env, run_migrations
 
-    metadata.create_all(engine)
+    with engine.begin() as conn:
+        run_migrations(conn, partitioning_from_env(), int(os.environ.get("PREDICTIONS_PARTITIONS_AHEAD", "3")))
 
     ref_data = pd.read_csv(DATA_PATH)
     print(f"Loaded {len(ref_data):,} rows from {DATA_PATH}")
@@ -0,0 +1,130 @@
+"""Pre-fork multi-process server for the scoring API.
+
+The supervisor binds the listening socket, then forks ``--workers`` uvicorn
+processes that accept on the shared socket. Each worker loads its own model
+sessions: ONNX Runtime builds a private copy of the graph per session whatever
+the source, so the model file is not shared. Workers that exit unexpectedly
+are restarted. SIGTERM or SIGINT is forwarded to all workers, which finish
+in-flight requests and drain their prediction log queues before exiting.
+SIGHUP is forwarded too, and makes every worker reload its model versions
+without dropping requests. SIGUSR1, which a worker sends after writing a
+threshold change to the manifest, makes every worker reload only the
+thresholds.
+
+Metrics and drift windows are aggregated across workers through
+``METRICS_MULTIPROC_DIR`` (a fresh temporary directory unless one is set). Each worker keeps its own
+log queue and writes to PostgreSQL independently. JSONL fallback batches are
+appended with a single ``O_APPEND`` write each, so workers can share the file.
+
+Usage:
+    python -m api.serve --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import tempfile
+import time
+
+import uvicorn
+
+from api.app import app
+
+logger = logging.getLogger("api.serve")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, args: argparse.Namespace):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Ignored until the app installs its model and threshold reload handlers.
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    config = uvicorn.Config(app, log_level=args.log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn_worker(sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            run_worker(sock, args)
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            status = 1
+        finally:
+            os._exit(status)
+    logger.info("Started worker %d", pid)
+    return pid
+
+
+def supervise(sock: socket.socket, args: argparse.Namespace):
+    workers = {spawn_worker(sock, args) for _ in range(args.workers)}
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def forward(signum, frame):
+        for pid in workers:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGHUP, forward)
+    signal.signal(signal.SIGUSR1, forward)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            logger.warning("Worker %d exited with status %d — restarting", pid, os.waitstatus_to_exitcode(status))
+            time.sleep(args.restart_delay)
+            workers.add(spawn_worker(sock, args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the credit scoring API with several worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--restart-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    os.environ.setdefault("METRICS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="api-metrics-"))
+    # Read by the workers' threshold endpoint to reach the other workers.
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    os.environ["API_SUPERVISOR_PID"] = str(os.getpid())
+
+    sock = bind_socket(args.host, args.port)
+    logger.info("Listening on %s:%d with %d workers", args.host, args.port, args.workers)
+    supervise(sock, args)
+
+
+if __name__ == "__main__":
+    main()
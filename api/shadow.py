@@ -0,0 +1,197 @@
+"""Shadow scoring of candidate models off the request path.
+
+After a prediction endpoint has its answer, it hands the feature rows and the
+served probabilities to ``ShadowScorer.submit``, a non-blocking call that
+only appends to a queue. A single background task drains the queue in
+batches of up to ``max_batch_size`` rows, scores each batch with every shadow
+model version and writes one row per applicant and candidate, next to the
+served model's output, to the ``shadow_predictions`` table (or
+``logs/shadow_predictions.jsonl`` without a database, rotated and compressed
+like the prediction log, see ``api.jsonl_log``). Once the database is
+available, rotated segments are replayed into ``shadow_predictions`` as the
+prediction log's are into ``predictions``, at most every
+``replay_interval`` seconds.
+
+Shadow work never delays a response: requests do not wait on it, shadow
+sessions run on one low-priority thread (see ``api.registry``), and load is
+shed rather than queued. Only ``sample_rate`` of the requests are mirrored,
+and rows that would grow the queue past ``max_queue_rows`` are dropped and
+counted.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from api.database import insert_shadow_predictions, is_db_enabled
+from api.jsonl_log import RotatingJsonlLog
+from api.log_writer import LOG_DIR, replay_segments, rotating_log
+from api.metrics import Counter, Gauge, Histogram
+from api.registry import ModelVersion
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE = LOG_DIR / "shadow_predictions.jsonl"
+
+ROWS_SCORED = Counter("shadow_rows_scored", "Rows scored by a shadow model", ("model_version",))
+DISAGREEMENTS = Counter(
+    "shadow_disagreements", "Rows where a shadow model's decision differs from the served one", ("model_version",)
+)
+ROWS_DROPPED = Counter("shadow_rows_dropped", "Rows not shadow-scored because the shadow queue was full")
+ERRORS = Counter("shadow_errors", "Failed shadow scoring, shadow log writes or replays", ("stage",))
+ROWS_REPLAYED = Counter("shadow_rows_replayed", "JSONL shadow log rows replayed into PostgreSQL")
+QUEUE_DEPTH = Gauge("shadow_queue_rows", "Rows waiting for shadow scoring")
+BATCH_SECONDS = Histogram("shadow_batch_seconds", "Time to score and write one shadow batch")
+
+
+class ShadowScorer:
+    def __init__(
+        self,
+        versions: list[ModelVersion],
+        max_queue_rows: int = 10_000,
+        max_batch_size: int = 256,
+        sample_rate: float = 1.0,
+        log: RotatingJsonlLog | None = None,
+        replay_interval: float = 30.0,
+    ):
+        self.versions = versions
+        self.max_queue_rows = max_queue_rows
+        self.max_batch_size = max_batch_size
+        self.sample_rate = sample_rate
+        self.log = log or rotating_log(LOG_FILE)
+        self.replay_interval = replay_interval
+        self._next_replay = 0.0
+        self._replaying: asyncio.Task | None = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._queued_rows = 0
+        self._task: asyncio.Task | None = None
+        self._scoring: asyncio.Future | None = None
+
+    def start(self):
+        QUEUE_DEPTH.set_function(lambda: self._queued_rows)
+        self._task = asyncio.create_task(self._run())
+        if is_db_enabled():
+            self._maybe_replay()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._scoring is not None:
+            await self._scoring
+            self._scoring = None
+        while not self._queue.empty():
+            await self._score(self._take(self._queue.get_nowait()))
+        if self._replaying is not None:
+            await self._replaying
+            self._replaying = None
+        QUEUE_DEPTH.set_function(None)
+
+    def submit(self, inputs: list[dict], rows: np.ndarray, primary: ModelVersion, probabilities: list[float]):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        if self._queued_rows + len(rows) > self.max_queue_rows:
+            ROWS_DROPPED.inc(len(rows))
+            return
+        self._queued_rows += len(rows)
+        self._queue.put_nowait((datetime.now(timezone.utc), inputs, rows, primary, probabilities))
+
+    def _take(self, first: tuple) -> list[tuple]:
+        items = [first]
+        size = len(first[2])
+        while size < self.max_batch_size and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+            size += len(items[-1][2])
+        self._queued_rows -= size
+        return items
+
+    async def _run(self):
+        while True:
+            items = self._take(await self._queue.get())
+            # Shielded so that shutdown waits for the batch instead of losing it.
+            self._scoring = asyncio.ensure_future(self._score(items))
+            await asyncio.shield(self._scoring)
+            self._scoring = None
+
+    async def _score(self, items: list[tuple]):
+        start = time.perf_counter()
+        rows = np.concatenate([item[2] for item in items])
+        served = [
+            (timestamp, features, primary, probability)
+            for timestamp, inputs, _, primary, probabilities in items
+            for features, probability in zip(inputs, probabilities)
+        ]
+
+        entries = []
+        for version in self.versions:
+            try:
+                with version.use():
+                    probabilities = (await version.run(rows)).tolist()
+            except Exception:
+                ERRORS.inc(stage="score")
+                logger.exception("Shadow scoring with %s failed", version.name)
+                continue
+
+            disagreements = 0
+            for (timestamp, features, primary, primary_probability), probability in zip(served, probabilities):
+                prediction = int(probability >= version.threshold)
+                primary_prediction = int(primary_probability >= primary.threshold)
+                disagreements += prediction != primary_prediction
+                entries.append({
+                    "timestamp": timestamp,
+                    "model_version": version.name,
+                    "primary_version": primary.name,
+                    "input_features": features,
+                    "probability_default": round(probability, 6),
+                    "prediction": prediction,
+                    "primary_probability": round(primary_probability, 6),
+                    "primary_prediction": primary_prediction,
+                })
+            ROWS_SCORED.inc(len(rows), model_version=version.name)
+            DISAGREEMENTS.inc(disagreements, model_version=version.name)
+
+        await self._write(entries)
+        BATCH_SECONDS.observe(time.perf_counter() - start)
+
+    async def _write(self, entries: list[dict]):
+        if not entries:
+            return
+        if is_db_enabled():
+            try:
+                await insert_shadow_predictions(entries)
+                self._maybe_replay()
+                return
+            except Exception:
+                ERRORS.inc(stage="postgres")
+                logger.exception("Failed to insert %d shadow predictions — writing them to JSONL", len(entries))
+        try:
+            await asyncio.to_thread(self.log.append, entries)
+        except Exception:
+            ERRORS.inc(stage="jsonl")
+            logger.exception("Failed to write %d shadow predictions to JSONL", len(entries))
+
+    def _maybe_replay(self):
+        now = time.monotonic()
+        if now < self._next_replay or (self._replaying is not None and not self._replaying.done()):
+            return
+        self._next_replay = now + self.replay_interval
+        self._replaying = asyncio.create_task(self._replay())
+
+    async def _replay(self):
+        try:
+            rows = await asyncio.to_thread(replay_segments, self.log, "shadow_predictions")
+        except Exception:
+            ERRORS.inc(stage="replay")
+            logger.exception("Failed to replay JSONL shadow logs into PostgreSQL")
+            return
+        if rows:
+            ROWS_REPLAYED.inc(rows)
+            logger.info("Replayed %d JSONL shadow log entries into PostgreSQL", rows)
@@ -0,0 +1,74 @@
+"""HTTP request metrics and per-stage latency of the prediction endpoints.
+
+``RequestMetricsMiddleware`` is a pure ASGI middleware: it counts requests by
+method, route template and status, times them, and counts exceptions that
+escape the app. It also records when each request arrived, so an endpoint can
+report everything before its body ran (reading, JSON decoding and Pydantic
+validation of the request) as the ``validation`` stage without hooking into
+FastAPI. The other stages are timed with ``stage()`` around their code.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from api.metrics import Counter, Histogram
+
+REQUESTS = Counter("http_requests", "HTTP requests handled", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency", ("route",))
+EXCEPTIONS = Counter("http_request_exceptions", "Unhandled exceptions raised while serving a request", ("route", "exception"))
+STAGE_SECONDS = Histogram("prediction_stage_seconds", "Time spent in each stage of a prediction request", ("stage",))
+
+_request_start: ContextVar[float | None] = ContextVar("request_start", default=None)
+
+
+def route_label(scope: dict) -> str:
+    # The route template keeps the label set bounded; unrouted paths share one label.
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        token = _request_start.set(start)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as exc:
+            EXCEPTIONS.inc(route=route_label(scope), exception=type(exc).__name__)
+            raise
+        finally:
+            _request_start.reset(token)
+            route = route_label(scope)
+            REQUESTS.inc(method=scope["method"], route=route, status=str(status))
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+
+
+def observe_validation():
+    start = _request_start.get()
+    if start is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="validation")
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
@@ -0,0 +1,99 @@
+"""Vectorized decision-threshold and business-cost analysis.
+
+An applicant is denied when the default probability is at or above the
+threshold, and a decision costs ``cost_fp`` per good client denied (false
+positive) and ``cost_fn`` per defaulter approved (false negative): 1 and 10,
+the costs the served threshold was chosen with in training.
+
+``ThresholdCurve`` sorts the scores once and keeps the running count of
+positives below each position. The confusion matrix at any threshold is then
+one ``searchsorted`` and a lookup, and the cost at every distinct score, which
+is where the optimal threshold lies, is a vectorized pass over the sorted
+arrays: O(n log n) overall instead of one ``confusion_matrix`` call per
+candidate threshold. The API serves it over the labeled reference data scored
+by a model version (``GET /models/{name}/thresholds``) or over outcomes posted
+with their probabilities (``POST /thresholds/analysis``).
+"""
+
+import numpy as np
+
+COST_FP = 1.0
+COST_FN = 10.0
+GRID_STEP = 0.05
+
+
+class ThresholdCurve:
+    def __init__(self, probabilities: np.ndarray, labels: np.ndarray):
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        labels = np.asarray(labels)
+        if probabilities.shape != labels.shape or probabilities.ndim != 1:
+            raise ValueError("probabilities and labels must be 1-D arrays of the same length")
+        order = np.argsort(probabilities, kind="stable")
+        self.scores = probabilities[order]
+        # positives_below[k]: positives among the k lowest scores.
+        self.positives_below = np.concatenate(([0], np.cumsum(labels[order] == 1)))
+        self.rows = len(self.scores)
+        self.positives = int(self.positives_below[-1])
+
+    def table(self, thresholds, cost_fp: float = COST_FP, cost_fn: float = COST_FN) -> dict[str, np.ndarray]:
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        approved = np.searchsorted(self.scores, thresholds, side="left")
+        return self._table(thresholds, approved, cost_fp, cost_fn)
+
+    def point(self, threshold: float, cost_fp: float = COST_FP, cost_fn: float = COST_FN) -> dict[str, float]:
+        return {name: values[0].item() for name, values in self.table([threshold], cost_fp, cost_fn).items()}
+
+    def optimal(self, cost_fp: float = COST_FP, cost_fn: float = COST_FN) -> dict[str, float]:
+        # Costs only change at a score, so the candidates are the distinct
+        # scores plus one threshold above them all (approve everyone).
+        first = np.flatnonzero(np.diff(self.scores, prepend=-np.inf))
+        above = np.nextafter(self.scores[-1], np.inf) if self.rows else 1.0
+        table = self._table(np.r_[self.scores[first], above], np.r_[first, self.rows], cost_fp, cost_fn)
+        # Ties go to the highest threshold, which denies the fewest applicants.
+        best = len(first) - np.argmin(table["cost"][::-1])
+        return {name: values[best].item() for name, values in table.items()}
+
+    def _table(self, thresholds, approved, cost_fp, cost_fn) -> dict[str, np.ndarray]:
+        fn = self.positives_below[approved]
+        tn = approved - fn
+        tp = self.positives - fn
+        fp = self.rows - approved - tp
+        with np.errstate(divide="ignore", invalid="ignore"):
+            recall = np.nan_to_num(tp / (tp + fn))
+            precision = np.nan_to_num(tp / (tp + fp))
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        return {
+            "threshold": thresholds,
+            "cost": cost_fp * fp + cost_fn * fn,
+            "tn": tn,
+            "fp": fp,
+            "fn": fn,
+            "tp": tp,
+            "recall": recall,
+            "precision": precision,
+            "f1": f1,
+        }
+
+
+def threshold_grid(step: float = GRID_STEP) -> np.ndarray:
+    return np.round(np.arange(0, 1 + step / 2, step), 10)
+
+
+def analyze(
+    curve: ThresholdCurve,
+    cost_fp: float = COST_FP,
+    cost_fn: float = COST_FN,
+    step: float = GRID_STEP,
+    current: float | None = None,
+) -> dict:
+    table = curve.table(threshold_grid(step), cost_fp, cost_fn)
+    points = [dict(zip(table, values)) for values in zip(*(column.tolist() for column in table.values()))]
+    return {
+        "rows": curve.rows,
+        "positives": curve.positives,
+        "cost_fp": cost_fp,
+        "cost_fn": cost_fn,
+        "optimal": curve.optimal(cost_fp, cost_fn),
+        "current": None if current is None else curve.point(current, cost_fp, cost_fn),
+        "curve": points,
+    }
@@ -0,0 +1,317 @@
+"""Pure-NumPy evaluator for shallow gradient-boosted tree ensembles.
+
+Trees are padded to complete binary trees of the ensemble's maximum depth, so
+each tree has ``2**depth`` leaves and every leaf set fits in one unsigned
+integer bitmask. Evaluation follows the QuickScorer scheme: a split
+``x[f] <= t`` that is false removes its left subtree's leaves from the tree's
+mask, and the exit leaf is the lowest bit still set.
+
+For every feature, the splits are sorted by threshold and the running AND of
+their masks is precomputed per tree. A row then needs only the number of
+thresholds below each feature value (one ``searchsorted`` over all ten
+features at once) and ten row lookups ANDed together. That is a few
+contiguous NumPy operations per batch, with no per-node Python work.
+
+Ensembles are compiled offline from the ONNX ``TreeEnsembleClassifier`` (needs
+the ``onnx`` package) or the pickled LightGBM model (needs ``lightgbm``) and
+saved as ``.npz``, so the API only needs NumPy to load and run them.
+
+Usage:
+    python -m api.tree_backend results/lightgbm_optimized.onnx results/lightgbm_optimized_trees.npz
+"""
+
+import argparse
+import asyncio
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from api.telemetry import stage
+
+ROW_CHUNK = 2048
+
+MASK_DTYPES = {1: np.uint8, 2: np.uint8, 3: np.uint8, 4: np.uint16, 5: np.uint32, 6: np.uint64}
+
+
+def _sortable_keys(values: np.ndarray) -> np.ndarray:
+    # Map float32 to uint64 keys with the same ordering; +0.0 folds -0.0 into 0.0.
+    bits = (np.asarray(values, dtype=np.float32) + np.float32(0.0)).view(np.uint32).astype(np.uint64)
+    negative = bits >= 0x80000000
+    return np.where(negative, 0xFFFFFFFF - bits, bits | 0x80000000)
+
+
+class _Node:
+    __slots__ = ("feature", "threshold", "missing_left", "left", "right", "value")
+
+    def __init__(self, feature=0, threshold=np.inf, missing_left=True, left=None, right=None, value=0.0):
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_left = missing_left
+        self.left = left
+        self.right = right
+        self.value = value
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.left is None
+
+    def depth(self) -> int:
+        return 0 if self.is_leaf else 1 + max(self.left.depth(), self.right.depth())
+
+
+class TreeEnsemble:
+    def __init__(
+        self,
+        features: np.ndarray,
+        thresholds: np.ndarray,
+        missing_left: np.ndarray,
+        leaf_values: np.ndarray,
+        base_score: float = 0.0,
+    ):
+        self.features = np.asarray(features, dtype=np.intp)
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.leaf_values = np.ascontiguousarray(leaf_values, dtype=np.float64)
+        self.base_score = float(base_score)
+        self.n_trees, n_internal = self.features.shape
+        self.depth = int(np.log2(n_internal + 1))
+        if self.depth not in MASK_DTYPES:
+            raise ValueError(f"Trees of depth {self.depth} are too deep for bitmask evaluation (max 6)")
+        self._build_tables()
+
+    def _build_tables(self):
+        n_leaves = 2**self.depth
+        dtype = MASK_DTYPES[self.depth]
+        all_leaves = (1 << n_leaves) - 1
+
+        # Mask left by a false split: every leaf except those of its left subtree.
+        node_masks = []
+        for d in range(self.depth):
+            span = 2 ** (self.depth - d)
+            for i in range(2**d):
+                left_leaves = ((1 << (span // 2)) - 1) << (i * span)
+                node_masks.append(all_leaves & ~left_leaves)
+        node_masks = np.array(node_masks, dtype=dtype)
+
+        self.n_features = int(self.features.max()) + 1
+        keys, blocks, nan_rows = [], [], []
+        n_rows = 0
+        for f in range(self.n_features):
+            # Padding splits (always-left, +inf threshold) can never be false.
+            usable = (self.features == f) & ~(np.isinf(self.thresholds) & self.missing_left)
+            trees, nodes = np.nonzero(usable)
+            order = np.argsort(self.thresholds[trees, nodes], kind="stable")
+            trees, nodes = trees[order], nodes[order]
+
+            # Row k: masks once the k smallest thresholds are below the value; last row: value is NaN.
+            block = np.full((len(trees) + 2, self.n_trees), all_leaves, dtype=dtype)
+            running = block[0].copy()
+            nan_row = block[0].copy()
+            for k, (tree, node) in enumerate(zip(trees, nodes)):
+                running[tree] &= node_masks[node]
+                block[k + 1] = running
+                if not self.missing_left[tree, node]:
+                    nan_row[tree] &= node_masks[node]
+            block[-1] = nan_row
+
+            keys.append((np.uint64(f) << np.uint64(32)) | _sortable_keys(self.thresholds[trees, nodes]))
+            blocks.append(block)
+            nan_rows.append(n_rows + len(block) - 1)
+            n_rows += len(block)
+
+        # Feature f's thresholds start at sum(len(keys[:f])) in the merged key array and its
+        # block at that position plus 2 * f, so a searchsorted position maps to row position + 2 * f.
+        self._keys = np.concatenate(keys)
+        self._feature_prefix = np.arange(self.n_features, dtype=np.uint64) << np.uint64(32)
+        self._row_offsets = 2 * np.arange(self.n_features, dtype=np.intp)
+        self._nan_rows = np.array(nan_rows, dtype=np.intp)
+        self._tables = np.concatenate(blocks)
+
+        if n_leaves <= 8:
+            # Few enough leaves to map every possible mask straight to its exit leaf value.
+            n_masks = 2**n_leaves
+            lowest_leaf = np.array([max((m & -m).bit_length() - 1, 0) for m in range(n_masks)], dtype=np.intp)
+            self._value_table = np.ascontiguousarray(self.leaf_values[:, lowest_leaf]).ravel()
+            self._tree_offsets = np.arange(self.n_trees, dtype=np.intp) * n_masks
+        else:
+            self._value_table = None
+            self._tree_offsets = np.arange(self.n_trees, dtype=np.intp) * n_leaves
+
+    @classmethod
+    def from_trees(cls, roots: list[_Node], base_score: float = 0.0) -> "TreeEnsemble":
+        depth = max(root.depth() for root in roots)
+        n_internal = 2**depth - 1
+        features = np.zeros((len(roots), n_internal), dtype=np.intp)
+        thresholds = np.full((len(roots), n_internal), np.inf, dtype=np.float32)
+        missing_left = np.ones((len(roots), n_internal), dtype=bool)
+        leaf_values = np.zeros((len(roots), 2**depth), dtype=np.float64)
+
+        for t, root in enumerate(roots):
+            level = [root]
+            for d in range(depth):
+                next_level = []
+                for i, node in enumerate(level):
+                    index = 2**d - 1 + i
+                    if node.is_leaf:
+                        next_level.extend([node, node])
+                        continue
+                    features[t, index] = node.feature
+                    thresholds[t, index] = node.threshold
+                    missing_left[t, index] = node.missing_left
+                    next_level.extend([node.left, node.right])
+                level = next_level
+            leaf_values[t] = [node.value for node in level]
+
+        return cls(features, thresholds, missing_left, leaf_values, base_score)
+
+    @classmethod
+    def from_onnx(cls, model_path: Path) -> "TreeEnsemble":
+        import onnx
+        from onnx.helper import get_attribute_value
+
+        model = onnx.load(str(model_path))
+        node = next(n for n in model.graph.node if n.op_type == "TreeEnsembleClassifier")
+        attrs = {a.name: get_attribute_value(a) for a in node.attribute}
+        if attrs.get("post_transform") != b"LOGISTIC" or set(attrs["class_ids"]) != {0}:
+            raise ValueError("Only binary TreeEnsembleClassifier models with a LOGISTIC transform are supported")
+        if set(attrs["nodes_modes"]) - {b"BRANCH_LEQ", b"LEAF"}:
+            raise ValueError("Only BRANCH_LEQ splits are supported")
+
+        nodes: dict[tuple[int, int], _Node] = {}
+        for i, (tree, node_id) in enumerate(zip(attrs["nodes_treeids"], attrs["nodes_nodeids"])):
+            nodes[tree, node_id] = _Node(
+                feature=attrs["nodes_featureids"][i],
+                threshold=attrs["nodes_values"][i],
+                missing_left=bool(attrs["nodes_missing_value_tracks_true"][i]),
+            )
+        for i, (tree, node_id) in enumerate(zip(attrs["nodes_treeids"], attrs["nodes_nodeids"])):
+            if attrs["nodes_modes"][i] != b"LEAF":
+                nodes[tree, node_id].left = nodes[tree, attrs["nodes_truenodeids"][i]]
+                nodes[tree, node_id].right = nodes[tree, attrs["nodes_falsenodeids"][i]]
+        for tree, node_id, weight in zip(attrs["class_treeids"], attrs["class_nodeids"], attrs["class_weights"]):
+            nodes[tree, node_id].value += weight
+
+        base_values = attrs.get("base_values") or [0.0]
+        n_trees = max(attrs["nodes_treeids"]) + 1
+        return cls.from_trees([nodes[tree, 0] for tree in range(n_trees)], base_score=base_values[0])
+
+    @classmethod
+    def from_lightgbm(cls, model_path: Path) -> "TreeEnsemble":
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+        booster = getattr(model, "booster_", model)
+        dump = booster.dump_model()
+
+        def build(spec: dict) -> _Node:
+            if "leaf_value" in spec:
+                return _Node(value=spec["leaf_value"])
+            if spec["decision_type"] != "<=":
+                raise ValueError(f"Unsupported LightGBM split {spec['decision_type']!r}")
+            return _Node(
+                feature=spec["split_feature"],
+                threshold=np.float32(spec["threshold"]),
+                missing_left=spec["default_left"],
+                left=build(spec["left_child"]),
+                right=build(spec["right_child"]),
+            )
+
+        return cls.from_trees([build(tree["tree_structure"]) for tree in dump["tree_info"]])
+
+    @classmethod
+    def load(cls, path: Path) -> "TreeEnsemble":
+        with np.load(path) as data:
+            return cls(
+                data["features"],
+                data["thresholds"],
+                data["missing_left"],
+                data["leaf_values"],
+                float(data["base_score"]),
+            )
+
+    def save(self, path: Path):
+        np.savez(
+            path,
+            features=self.features.astype(np.int32),
+            thresholds=self.thresholds,
+            missing_left=self.missing_left,
+            leaf_values=self.leaf_values,
+            base_score=np.float64(self.base_score),
+        )
+
+    def _exit_masks(self, rows: np.ndarray) -> np.ndarray:
+        values = rows[:, : self.n_features]
+        positions = np.searchsorted(self._keys, self._feature_prefix | _sortable_keys(values), side="left")
+        table_rows = positions + self._row_offsets
+        nan = np.isnan(values)
+        if nan.any():
+            table_rows = np.where(nan, self._nan_rows, table_rows)
+        return np.bitwise_and.reduce(self._tables[table_rows], axis=1)
+
+    def decision_function(self, rows: np.ndarray) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.float32)
+        scores = np.empty(len(rows), dtype=np.float64)
+        for start in range(0, len(rows), ROW_CHUNK):
+            masks = self._exit_masks(rows[start : start + ROW_CHUNK])
+            if self._value_table is not None:
+                leaves = self._tree_offsets + masks
+                values = self._value_table[leaves]
+            else:
+                lowest_bit = (masks & (~masks + masks.dtype.type(1))).astype(np.float64)
+                leaves = self._tree_offsets + np.frexp(lowest_bit)[1] - 1
+                values = self.leaf_values.ravel()[leaves]
+            scores[start : start + ROW_CHUNK] = values.sum(axis=1)
+        return scores + self.base_score
+
+    def predict_proba(self, rows: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-self.decision_function(rows)))
+
+
+class TreeEnsemblePredictor:
+    def __init__(self, ensemble: TreeEnsemble, executor_threads: int = 1):
+        self.ensemble = ensemble
+        self.concurrency = executor_threads
+        self._executor = ThreadPoolExecutor(max_workers=executor_threads, thread_name_prefix="tree-inference")
+
+    def predict_proba(self, rows: np.ndarray) -> np.ndarray:
+        with stage("model_run"):
+            return self.ensemble.predict_proba(rows)
+
+    async def run(self, rows: np.ndarray) -> np.ndarray:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.predict_proba, rows)
+
+    def warm_up(self, rows: np.ndarray):
+        self.ensemble.predict_proba(rows)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def compile_model(source: Path) -> TreeEnsemble:
+    if source.suffix == ".onnx":
+        return TreeEnsemble.from_onnx(source)
+    if source.suffix == ".pkl":
+        return TreeEnsemble.from_lightgbm(source)
+    raise ValueError(f"Cannot compile {source}: expected a .onnx or .pkl model")
+
+
+def tree_predictor_from_env(model_path: Path, onnx_fallback: Path) -> TreeEnsemblePredictor:
+    ensemble = TreeEnsemble.load(model_path) if model_path.exists() else compile_model(onnx_fallback)
+    return TreeEnsemblePredictor(ensemble, executor_threads=int(os.environ.get("ORT_EXECUTOR_THREADS", "1")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a tree-ensemble model into packed NumPy arrays.")
+    parser.add_argument("source", type=Path, help="ONNX (.onnx) or pickled LightGBM (.pkl) model")
+    parser.add_argument("output", type=Path, help="Destination .npz file")
+    args = parser.parse_args()
+
+    ensemble = compile_model(args.source)
+    ensemble.save(args.output)
+    print(f"Compiled {ensemble.n_trees} trees of depth {ensemble.depth} from {args.source} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
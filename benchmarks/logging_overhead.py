@@ -0,0 +1,113 @@
+"""Measure the per-request cost of the old body-buffering logging middleware.
+
+Runs the same /predict workload in-process against the API twice: as shipped
+(logging happens in an endpoint hook with the validated objects), and wrapped
+in a replica of the former ``BaseHTTPMiddleware`` that re-read the request
+body, concatenated the response body chunk by chunk, parsed both with
+``json.loads`` and rebuilt the ``Response``. The replica does not log, so the
+difference between the two runs is the overhead that was removed.
+
+Usage:
+    uv run --extra api python -m benchmarks.logging_overhead --requests 5000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from api.app import app
+
+PAYLOAD = {
+    "EXT_SOURCES_MEAN": 0.524,
+    "CREDIT_TERM": 0.05,
+    "EXT_SOURCE_3": 0.535,
+    "GOODS_PRICE_CREDIT_PERCENT": 0.9,
+    "INSTAL_AMT_PAYMENT_sum": 318619.5,
+    "AMT_ANNUITY": 24903.0,
+    "POS_CNT_INSTALMENT_FUTURE_mean": 6.95,
+    "DAYS_BIRTH": -15750,
+    "EXT_SOURCES_WEIGHTED": 1.5,
+    "EXT_SOURCE_2": 0.566,
+}
+
+
+class LegacyBodyBufferingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        body = await request.body()
+        try:
+            json.loads(body)
+        except (json.JSONDecodeError, ValueError):
+            pass
+
+        response = await call_next(request)
+
+        response_body = b""
+        async for chunk in response.body_iterator:
+            response_body += chunk if isinstance(chunk, bytes) else chunk.encode()
+
+        if response.status_code == 200:
+            try:
+                json.loads(response_body)
+            except (json.JSONDecodeError, ValueError):
+                pass
+
+        return Response(
+            content=response_body,
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            media_type=response.media_type,
+        )
+
+
+async def measure(asgi_app, n_requests: int, warmup: int) -> list[float]:
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(warmup):
+            await client.post("/predict", json=PAYLOAD)
+
+        latencies = []
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            response = await client.post("/predict", json=PAYLOAD)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+    return latencies
+
+
+def summarize(label: str, latencies: list[float]) -> float:
+    ordered = sorted(latencies)
+    mean_us = statistics.fmean(ordered) * 1e6
+    p50_us = ordered[len(ordered) // 2] * 1e6
+    p99_us = ordered[int(len(ordered) * 0.99)] * 1e6
+    print(f"  {label:<22} mean {mean_us:8.1f} µs   p50 {p50_us:8.1f} µs   p99 {p99_us:8.1f} µs")
+    return mean_us
+
+
+async def run(n_requests: int, warmup: int):
+    async with app.router.lifespan_context(app):
+        hook = await measure(app, n_requests, warmup)
+        legacy = await measure(LegacyBodyBufferingMiddleware(app), n_requests, warmup)
+
+    print(f"/predict, {n_requests} sequential in-process requests:")
+    hook_mean = summarize("endpoint hook", hook)
+    legacy_mean = summarize("+ legacy middleware", legacy)
+    print(f"  overhead removed: {legacy_mean - hook_mean:.1f} µs per request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
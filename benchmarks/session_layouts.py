@@ -0,0 +1,83 @@
+"""Compare ONNX Runtime session-pool layouts under concurrent load.
+
+Each layout is ``sessions x intra-op threads``. For every layout, ``--concurrency``
+asyncio clients each issue ``--calls`` inference calls of ``--rows`` rows
+through ``SessionPool.run``, the same path the API uses. Reports throughput and
+per-call latency percentiles so thread over-subscription shows up directly.
+
+Usage:
+    uv run --extra api python -m benchmarks.session_layouts --concurrency 32
+    uv run --extra api python -m benchmarks.session_layouts --layouts 1x0 4x4 16x1
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from api.app import ONNX_MODEL_PATH
+from api.inference import SessionPool, build_session_options
+
+
+def default_layouts() -> list[str]:
+    cores = os.cpu_count() or 1
+    layouts = {"1x0", f"1x{cores}", f"{cores}x1"}
+    if cores >= 4:
+        layouts.add(f"{cores // 4}x4")
+    return sorted(layouts, key=lambda layout: tuple(int(n) for n in layout.split("x")))
+
+
+async def drive(pool: SessionPool, rows: np.ndarray, concurrency: int, calls: int) -> list[float]:
+    latencies = []
+
+    async def client():
+        for _ in range(calls):
+            start = time.perf_counter()
+            await pool.run(rows)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies
+
+
+def bench_layout(layout: str, rows: np.ndarray, concurrency: int, calls: int, optimization: str) -> dict:
+    size, intra = (int(n) for n in layout.split("x"))
+    options = build_session_options(intra_op_threads=intra, graph_optimization=optimization)
+    pool = SessionPool(ONNX_MODEL_PATH, size=size, options=options)
+    try:
+        asyncio.run(drive(pool, rows, concurrency, max(1, calls // 10)))
+        start = time.perf_counter()
+        latencies = np.array(asyncio.run(drive(pool, rows, concurrency, calls)))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+
+    return {
+        "layout": layout,
+        "rows_per_s": concurrency * calls * len(rows) / elapsed,
+        "p50_ms": np.percentile(latencies, 50) * 1e3,
+        "p99_ms": np.percentile(latencies, 99) * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--layouts", nargs="+", default=default_layouts(), help="SESSIONSxINTRA_THREADS, 0 = ORT default")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=1)
+    parser.add_argument("--optimization", default="all", choices=["disable", "basic", "extended", "all"])
+    args = parser.parse_args()
+
+    rows = np.random.default_rng(0).random((args.rows, 10), dtype=np.float32)
+    print(f"{os.cpu_count()} cores, concurrency {args.concurrency}, {args.rows} row(s) per call")
+    print(f"{'layout':>8} {'rows/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for layout in args.layouts:
+        result = bench_layout(layout, rows, args.concurrency, args.calls, args.optimization)
+        print(f"{result['layout']:>8} {result['rows_per_s']:>12,.0f} {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare the ONNX Runtime and NumPy tree-ensemble inference backends.
+
+Scores random applicant matrices of several batch sizes with both backends
+through the same ``predict_proba`` call the API makes, checks that they agree,
+and reports per-call latency and rows/s for each batch size.
+
+Usage:
+    uv run --extra api python -m benchmarks.tree_backend --batch-sizes 1 64 1024 10000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from api.app import ONNX_MODEL_PATH, TREE_MODEL_PATH
+from api.inference import SessionPool, build_session_options
+from api.tree_backend import TreeEnsemble
+
+
+def applicant_rows(n: int, rng: np.random.Generator) -> np.ndarray:
+    rows = rng.random((n, 10), dtype=np.float32)
+    rows[:, 4] *= 1e6
+    rows[:, 5] *= 5e4
+    rows[:, 6] *= 20
+    rows[:, 7] = -rng.integers(7000, 25000, n)
+    rows[:, 8] *= 3
+    return rows
+
+
+def time_call(function, rows: np.ndarray, min_seconds: float) -> float:
+    function(rows)
+    calls, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < min_seconds:
+        function(rows)
+        calls += 1
+    return elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64, 256, 1024, 10000])
+    parser.add_argument("--intra-op-threads", type=int, default=1)
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    pool = SessionPool(ONNX_MODEL_PATH, options=build_session_options(intra_op_threads=args.intra_op_threads))
+    ensemble = TreeEnsemble.load(TREE_MODEL_PATH)
+    rng = np.random.default_rng(0)
+
+    print(f"{ensemble.n_trees} trees, depth {ensemble.depth}; ONNX Runtime intra-op threads: {args.intra_op_threads}")
+    print(f"{'batch':>7} {'onnx µs':>11} {'numpy µs':>11} {'onnx rows/s':>13} {'numpy rows/s':>13} {'speedup':>8} {'max |Δp|':>10}")
+    try:
+        for n in args.batch_sizes:
+            rows = applicant_rows(n, rng)
+            delta = np.abs(pool.predict_proba(rows) - ensemble.predict_proba(rows)).max()
+            onnx_s = time_call(pool.predict_proba, rows, args.min_seconds)
+            numpy_s = time_call(ensemble.predict_proba, rows, args.min_seconds)
+            print(
+                f"{n:>7} {onnx_s * 1e6:>11.1f} {numpy_s * 1e6:>11.1f} {n / onnx_s:>13,.0f} "
+                f"{n / numpy_s:>13,.0f} {onnx_s / numpy_s:>7.2f}x {delta:>10.1e}"
+            )
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,32 @@
 """Generate synthetic production predictions with intentional data drift.
 
-Writes 1000 prediction entries directly to logs/predictions.jsonl,
-simulating 7 days of production predictions with drift on 3 features:
-- EXT_SOURCE_2: mean shifted down by 0.15 (credit bureau change)
-- DAYS_BIRTH: shifted +3000 toward younger applicants
-- AMT_ANNUITY: increased 20% (inflation)
+Rows are sampled from the reference dataset in one shot per chunk, drifted
+with array operations, scored in batches with the LightGBM model and streamed
+to the output, so memory stays bounded by ``--chunk-size`` whatever the row
+count. Timestamps are spread evenly at random over ``--days`` ending now.
+
+Drift profiles:
+- none: reference distribution
+- default: drift on 3 features from the first row on
+    - EXT_SOURCE_2: mean shifted down by 0.15 (credit bureau change)
+    - DAYS_BIRTH: shifted +3000 toward younger applicants
+    - AMT_ANNUITY: increased 20% (inflation)
+- gradual: the same 3 shifts, growing linearly from none to full over the span
+
+Outputs: JSONL (default, same lines as the API fallback log), Parquet
+(requires pyarrow) or the PostgreSQL predictions table (``DATABASE_URL``).
+
+Usage:
+    uv run python -m monitoring.generate_traffic
+    uv run python -m monitoring.generate_traffic --rows 10000000 --days 30 --drift gradual --output parquet
 """
 
+import argparse
 import json
+import os
 import pickle
+import time
+from collections.abc import Iterator
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
@@ -24,6 +42,8 @@ LOG_FILE = LOG_DIR / "predictions.jsonl"
 N_REQUESTS = 1000
 DAYS_SPAN = 7
 OPTIMAL_THRESHOLD = 0.10
+CHUNK_SIZE = 100_000
+DRIFT_PROFILES = ("none", "default", "gradual")
 
 FEATURE_COLUMNS = [
     "EXT_SOURCES_MEAN",
@@ -44,71 +64,164 @@ def load_model():
         return pickle.load(f)
 
 
-def sample_with_drift(ref_data: pd.DataFrame, rng: np.random.Generator) -> dict:
-    """Sample a row from reference data and apply drift to 3 features."""
-    row = ref_data.sample(n=1, random_state=int(rng.integers(0, 2**31))).iloc[0]
-    features = row[FEATURE_COLUMNS].to_dict()
-
-    # Drift: EXT_SOURCE_2 shifted down by 0.15
-    features["EXT_SOURCE_2"] = max(0.0, min(1.0, features["EXT_SOURCE_2"] - 0.15))
-
-    # Drift: DAYS_BIRTH shifted +3000 (younger applicants)
-    features["DAYS_BIRTH"] = min(-1, int(features["DAYS_BIRTH"] + 3000))
-
-    # Drift: AMT_ANNUITY increased 20%
-    features["AMT_ANNUITY"] = round(features["AMT_ANNUITY"] * 1.20, 2)
-
+def apply_drift(features: pd.DataFrame, strength: np.ndarray) -> pd.DataFrame:
+    """Apply the 3 feature shifts, scaled per row by strength in [0, 1]."""
+    features["EXT_SOURCE_2"] = np.clip(features["EXT_SOURCE_2"] - 0.15 * strength, 0.0, 1.0)
+    features["DAYS_BIRTH"] = np.minimum(-1, (features["DAYS_BIRTH"] + 3000 * strength).astype(np.int64))
+    features["AMT_ANNUITY"] = (features["AMT_ANNUITY"] * (1 + 0.20 * strength)).round(2)
     return features
 
 
-def generate_timestamps(n: int, rng: np.random.Generator) -> list[datetime]:
-    """Generate n sorted timestamps spread over DAYS_SPAN days."""
-    now = datetime.now(timezone.utc)
-    start = now - timedelta(days=DAYS_SPAN)
-    offsets = sorted(rng.uniform(0, DAYS_SPAN * 86400, size=n))
-    return [start + timedelta(seconds=float(s)) for s in offsets]
+def generate_chunks(
+    ref_data: pd.DataFrame,
+    model,
+    n: int = N_REQUESTS,
+    days: float = DAYS_SPAN,
+    drift: str = "default",
+    seed: int = 42,
+    chunk_size: int = CHUNK_SIZE,
+    threshold: float = OPTIMAL_THRESHOLD,
+) -> Iterator[pd.DataFrame]:
+    """Yield DataFrames of timestamp, features, probability and decision."""
+    rng = np.random.default_rng(seed)
+    reference = ref_data[FEATURE_COLUMNS].reset_index(drop=True)
+    span = days * 86400
+    start = datetime.now(timezone.utc) - timedelta(seconds=span)
+
+    for first in range(0, n, chunk_size):
+        size = min(chunk_size, n - first)
+        features = reference.iloc[rng.integers(0, len(reference), size)].reset_index(drop=True)
+
+        # Each chunk covers its share of the span, so chunks come out in time order.
+        offsets = np.sort(rng.uniform(first, first + size, size)) / n * span
+        if drift == "default":
+            features = apply_drift(features, np.ones(size))
+        elif drift == "gradual":
+            features = apply_drift(features, offsets / span)
+
+        probability = model.predict_proba(features[model.feature_name_])[:, 1].round(6)
+        prediction = (probability >= threshold).astype(np.int16)
+        features.insert(0, "timestamp", pd.Timestamp(start) + pd.to_timedelta(offsets, unit="s"))
+        features["prediction"] = prediction
+        features["probability_default"] = probability
+        features["credit_decision"] = np.where(prediction == 1, "denied", "approved")
+        yield features
+
+
+def to_entries(chunk: pd.DataFrame) -> list[dict]:
+    """Convert a chunk to prediction log entries."""
+    features = chunk[FEATURE_COLUMNS].to_dict("records")
+    return [
+        {
+            "timestamp": ts,
+            "input_features": f,
+            "prediction": int(p),
+            "probability_default": float(prob),
+            "credit_decision": decision,
+        }
+        for ts, f, p, prob, decision in zip(
+            chunk["timestamp"].dt.to_pydatetime(),
+            features,
+            chunk["prediction"],
+            chunk["probability_default"],
+            chunk["credit_decision"],
+        )
+    ]
+
+
+def write_jsonl(chunks: Iterator[pd.DataFrame], path: Path) -> Iterator[pd.DataFrame]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        for chunk in chunks:
+            f.writelines(
+                json.dumps({**entry, "timestamp": entry["timestamp"].isoformat()}) + "\n"
+                for entry in to_entries(chunk)
+            )
+            yield chunk
+
+
+def write_parquet(chunks: Iterator[pd.DataFrame], path: Path) -> Iterator[pd.DataFrame]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            yield chunk
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_postgres(chunks: Iterator[pd.DataFrame], engine, truncate: bool = False) -> Iterator[pd.DataFrame]:
+    from api.bulk_load import copy_frames
+
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        if truncate:
+            conn.execute("TRUNCATE TABLE predictions")
+        for chunk in chunks:
+            copy_frames(conn, "predictions", [chunk])
+            conn.commit()
+            yield chunk
+    finally:
+        raw.close()
 
 
 def main():
-    rng = np.random.default_rng(42)
+    parser = argparse.ArgumentParser(description="Generate synthetic predictions with drift.")
+    parser.add_argument("--rows", type=int, default=N_REQUESTS)
+    parser.add_argument("--days", type=float, default=DAYS_SPAN, help="Time span ending now")
+    parser.add_argument("--drift", choices=DRIFT_PROFILES, default="default")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--threshold", type=float, default=OPTIMAL_THRESHOLD, help="Decision threshold (see GET /models)")
+    parser.add_argument("--reference", type=Path, default=DATA_PATH, help="Reference dataset CSV")
+    parser.add_argument("--output", choices=["jsonl", "parquet", "postgres"], default="jsonl")
+    parser.add_argument("--path", type=Path, help="Output file (jsonl/parquet)")
+    parser.add_argument("--truncate", action="store_true", help="Empty the predictions table first (postgres)")
+    args = parser.parse_args()
 
     print(f"Loading model from {MODEL_PATH}...")
     model = load_model()
 
-    print(f"Loading reference data from {DATA_PATH}...")
-    ref_data = pd.read_csv(DATA_PATH)
-
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
-
-    timestamps = generate_timestamps(N_REQUESTS, rng)
-    entries = []
-
-    print(f"Generating {N_REQUESTS} synthetic predictions...")
-    for ts in timestamps:
-        features = sample_with_drift(ref_data, rng)
-        df = pd.DataFrame([features])
-        df = df[model.feature_name_]
-
-        probability = float(model.predict_proba(df)[0, 1])
-        prediction = int(probability >= OPTIMAL_THRESHOLD)
-        credit_decision = "denied" if prediction == 1 else "approved"
-
-        entries.append({
-            "timestamp": ts.isoformat(),
-            "input_features": features,
-            "prediction": prediction,
-            "probability_default": round(probability, 6),
-            "credit_decision": credit_decision,
-        })
-
-    with open(LOG_FILE, "w") as f:
-        for entry in entries:
-            f.write(json.dumps(entry) + "\n")
-
-    n_denied = sum(1 for e in entries if e["credit_decision"] == "denied")
-
-    print(f"\nWritten {N_REQUESTS} entries to {LOG_FILE}")
-    print(f"  Denied: {n_denied}/{N_REQUESTS} ({n_denied/N_REQUESTS:.1%})")
+    print(f"Loading reference data from {args.reference}...")
+    ref_data = pd.read_csv(args.reference, usecols=FEATURE_COLUMNS)
+
+    chunks = generate_chunks(
+        ref_data, model, args.rows, args.days, args.drift, args.seed, args.chunk_size, args.threshold
+    )
+    if args.output == "jsonl":
+        destination = args.path or LOG_FILE
+        chunks = write_jsonl(chunks, destination)
+    elif args.output == "parquet":
+        destination = args.path or LOG_DIR / "predictions.parquet"
+        chunks = write_parquet(chunks, destination)
+    else:
+        from sqlalchemy import create_engine
+
+        url = os.environ["DATABASE_URL"]
+        if url.startswith("postgresql://"):
+            url = url.replace("postgresql://", "postgresql+psycopg://", 1)
+        destination = "predictions table"
+        chunks = write_postgres(chunks, create_engine(url), args.truncate)
+
+    print(f"Generating {args.rows:,} synthetic predictions ({args.drift} drift)...")
+    started = time.perf_counter()
+    written = denied = 0
+    for chunk in chunks:
+        written += len(chunk)
+        denied += int(chunk["prediction"].sum())
+        print(f"  {written:,}/{args.rows:,} rows ({written / (time.perf_counter() - started):,.0f} rows/s)")
+
+    print(f"\nWritten {written:,} entries to {destination}")
+    print(f"  Denied: {denied:,}/{written:,} ({denied / max(written, 1):.1%})")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timedelta, timezone
 
 import pandas as pd
 import plotly.express as px
@@ -7,7 +8,16 @@ import requests
 import streamlit as st
 
 API_URL = os.environ.get("API_URL", "http://localhost:8000")
-THRESHOLD = 0.10
+# Used when the API cannot report the served thresholds.
+DEFAULT_THRESHOLD = 0.10
+
+# History periods: how far back, and the bucket size of the volume chart.
+HISTORY_PERIODS = {
+    "Last 24 hours": (timedelta(days=1), "hour"),
+    "Last 7 days": (timedelta(days=7), "day"),
+    "Last 30 days": (timedelta(days=30), "day"),
+    "All time": (None, "week"),
+}
 
 FEATURE_IMPORTANCE = {
     "EXT_SOURCES_MEAN": 25.48,
@@ -33,8 +43,43 @@ def check_health():
         return None
 
 
+@st.cache_data(ttl=30)
+def fetch_thresholds():
+    # Decision threshold per model version, and the default version's name.
+    try:
+        resp = requests.get(f"{API_URL}/models", timeout=5)
+        resp.raise_for_status()
+        models = resp.json()
+    except Exception:
+        return {}, None
+    default = next((m["name"] for m in models if m["default"]), None)
+    return {m["name"]: m["threshold"] for m in models}, default
+
+
+def current_threshold(version=None):
+    thresholds, default = fetch_thresholds()
+    return thresholds.get(version or default, DEFAULT_THRESHOLD)
+
+
+@st.cache_data(ttl=10)
+def fetch_summary(period):
+    since, bucket = HISTORY_PERIODS[period]
+    params = {"bucket": bucket}
+    if since is not None:
+        start = datetime.now(timezone.utc) - since
+        params["start"] = start.replace(second=0, microsecond=0).isoformat()
+    try:
+        resp = requests.get(f"{API_URL}/predictions/summary", params=params, timeout=10)
+        if resp.status_code == 503:
+            return None
+        resp.raise_for_status()
+        return resp.json()
+    except Exception:
+        return None
+
+
 @st.cache_data(ttl=10)
-def fetch_predictions(limit=200):
+def fetch_predictions(limit=20):
     try:
         resp = requests.get(
             f"{API_URL}/predictions", params={"limit": limit}, timeout=10
@@ -47,7 +92,7 @@ def fetch_predictions(limit=200):
         return None
 
 
-def create_gauge(probability):
+def create_gauge(probability, threshold):
     fig = go.Figure(
         go.Indicator(
             mode="gauge+number",
@@ -65,7 +110,7 @@ def create_gauge(probability):
                 "threshold": {
                     "line": {"color": "black", "width": 4},
                     "thickness": 0.75,
-                    "value": THRESHOLD * 100,
+                    "value": threshold * 100,
                 },
             },
         )
@@ -207,7 +252,8 @@ if page == "Prediction":
                 m1.metric("Default Probability", f"{probability:.4%}")
                 m2.metric("Prediction Class", prediction)
 
-                st.plotly_chart(create_gauge(probability), use_container_width=True)
+                threshold = current_threshold(resp.headers.get("X-Model-Version"))
+                st.plotly_chart(create_gauge(probability, threshold), use_container_width=True)
 
         except requests.ConnectionError:
             st.error(
@@ -224,78 +270,90 @@ if page == "Prediction":
 if page == "History":
     st.title("Prediction History")
 
-    data = fetch_predictions(limit=200)
+    period = st.selectbox("Period", list(HISTORY_PERIODS), index=1)
+    summary = fetch_summary(period)
 
-    if data is None:
+    if summary is None:
         st.warning("Database not available. Predictions are logged to JSONL only.")
         st.stop()
 
-    if not data:
-        st.info("No predictions recorded yet.")
+    if not summary["total"]:
+        st.info("No predictions recorded in this period.")
         st.stop()
 
-    df = pd.DataFrame(data)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-
     # --- Summary metrics ---
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Predictions", len(df))
-    if len(df) > 0:
-        approval_rate = (df["credit_decision"] == "approved").mean()
-        col2.metric("Approval Rate", f"{approval_rate:.0%}")
-        denied_count = (df["credit_decision"] == "denied").sum()
-        col3.metric("Denied", denied_count)
-    else:
-        col2.metric("Approval Rate", "N/A")
-        col3.metric("Denied", "N/A")
+    col1.metric("Total Predictions", f"{summary['total']:,}")
+    col2.metric("Approval Rate", f"{summary['approval_rate']:.0%}")
+    col3.metric("Denied", f"{summary['denied']:,}")
 
     st.divider()
 
     # --- Charts ---
-    if len(df) > 0:
-        chart_col1, chart_col2 = st.columns(2)
-
-        with chart_col1:
-            decision_counts = df["credit_decision"].value_counts()
-            fig_pie = px.pie(
-                names=decision_counts.index,
-                values=decision_counts.values,
-                title="Decision Distribution",
-                color=decision_counts.index,
-                color_discrete_map={"approved": "#2ecc71", "denied": "#e74c3c"},
-            )
-            fig_pie.update_layout(height=350, margin=dict(t=40, b=20))
-            st.plotly_chart(fig_pie, use_container_width=True)
-
-        with chart_col2:
-            fig_hist = px.histogram(
-                df,
-                x="probability_default",
-                nbins=30,
-                title="Probability Distribution",
-                color_discrete_sequence=["#3498db"],
-            )
-            fig_hist.add_vline(
-                x=THRESHOLD, line_dash="dash", line_color="red",
-                annotation_text=f"Threshold ({THRESHOLD})",
-            )
-            fig_hist.update_layout(
-                height=350, margin=dict(t=40, b=20),
-                xaxis_title="Default Probability",
-                yaxis_title="Count",
-            )
-            st.plotly_chart(fig_hist, use_container_width=True)
+    threshold = current_threshold()
+    chart_col1, chart_col2 = st.columns(2)
+
+    with chart_col1:
+        fig_pie = px.pie(
+            names=["approved", "denied"],
+            values=[summary["approved"], summary["denied"]],
+            title="Decision Distribution",
+            color=["approved", "denied"],
+            color_discrete_map={"approved": "#2ecc71", "denied": "#e74c3c"},
+        )
+        fig_pie.update_layout(height=350, margin=dict(t=40, b=20))
+        st.plotly_chart(fig_pie, use_container_width=True)
+
+    with chart_col2:
+        edges = summary["probability_bins"]
+        fig_hist = px.bar(
+            x=[(low + high) / 2 for low, high in zip(edges, edges[1:])],
+            y=summary["probability_histogram"],
+            title="Probability Distribution",
+            color_discrete_sequence=["#3498db"],
+        )
+        fig_hist.update_traces(width=edges[1] - edges[0])
+        fig_hist.add_vline(
+            x=threshold, line_dash="dash", line_color="red",
+            annotation_text=f"Threshold ({threshold:g})",
+        )
+        fig_hist.update_layout(
+            height=350, margin=dict(t=40, b=20), bargap=0.05,
+            xaxis_title="Default Probability",
+            yaxis_title="Count",
+        )
+        st.plotly_chart(fig_hist, use_container_width=True)
+
+    series = pd.DataFrame(summary["series"])
+    series["start"] = pd.to_datetime(series["start"])
+    series["approved"] = series["total"] - series["denied"]
+    fig_volume = px.bar(
+        series,
+        x="start",
+        y=["approved", "denied"],
+        title=f"Predictions per {summary['bucket']}",
+        color_discrete_map={"approved": "#2ecc71", "denied": "#e74c3c"},
+    )
+    fig_volume.update_layout(
+        height=300, margin=dict(t=40, b=20),
+        xaxis_title=None, yaxis_title="Count", legend_title=None,
+    )
+    st.plotly_chart(fig_volume, use_container_width=True)
 
     st.divider()
 
     # --- Data table ---
     st.subheader("Recent Predictions")
 
-    display_df = df[
-        ["id", "timestamp", "credit_decision", "probability_default", "prediction"]
-    ].copy()
-    display_df.columns = [
-        "ID", "Timestamp", "Decision", "Probability", "Class",
-    ]
-
-    st.dataframe(display_df, use_container_width=True, hide_index=True)
+    data = fetch_predictions()
+    if data:
+        df = pd.DataFrame(data)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        display_df = df[
+            ["id", "timestamp", "credit_decision", "probability_default", "prediction"]
+        ].copy()
+        display_df.columns = [
+            "ID", "Timestamp", "Decision", "Probability", "Class",
+        ]
+
+        st.dataframe(display_df, use_container_width=True, hide_index=True)
@@ -0,0 +1,37 @@
+import json
+import shutil
+
+import pytest
+
+import api.log_writer as log_writer
+import api.shadow as shadow
+from api.app import ONNX_MODEL_PATH
+
+
+def write_manifest(directory, versions: dict, default: str):
+    (directory / "manifest.json").write_text(json.dumps({"default": default, "versions": versions}))
+
+
+@pytest.fixture(autouse=True)
+def log_dir(tmp_path, monkeypatch):
+    # Keep the JSONL logs written by the app under test out of the repository.
+    monkeypatch.setattr(log_writer, "LOG_DIR", tmp_path)
+    monkeypatch.setattr(log_writer, "LOG_FILE", tmp_path / "predictions.jsonl")
+    monkeypatch.setattr(shadow, "LOG_FILE", tmp_path / "shadow_predictions.jsonl")
+    return tmp_path
+
+
+@pytest.fixture
+def manifest_versions():
+    return {"primary": {"path": "model.onnx", "threshold": 0.10}}
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch, manifest_versions):
+    # A manifest over copies of the bundled model, served with "primary" as the
+    # default; test modules override manifest_versions to add versions.
+    shutil.copy(ONNX_MODEL_PATH, tmp_path / "model.onnx")
+    write_manifest(tmp_path, manifest_versions, default="primary")
+    monkeypatch.setenv("MODEL_MANIFEST", str(tmp_path))
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    return tmp_path
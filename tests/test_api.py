@@ -219,3 +219,36 @@ def test_boolean_coercion_for_float():
         response = c.post("/predict", json=payload)
         # Pydantic coerces bool to float (True -> 1.0), which is valid
         assert response.status_code == 200
+
+
+# === Batch prediction ===
+
+def test_predict_batch_status_code():
+    with TestClient(app) as c:
+        response = c.post("/predict/batch", json={"applicants": [VALID_PAYLOAD] * 3})
+        assert response.status_code == 200
+        assert len(response.json()["predictions"]) == 3
+
+
+def test_predict_batch_matches_single_predictions():
+    other = VALID_PAYLOAD.copy()
+    other["EXT_SOURCES_MEAN"] = 0.1
+    other["EXT_SOURCE_3"] = 0.2
+    with TestClient(app) as c:
+        batch = c.post("/predict/batch", json={"applicants": [VALID_PAYLOAD, other]}).json()
+        singles = [c.post("/predict", json=p).json() for p in (VALID_PAYLOAD, other)]
+        assert batch["predictions"] == singles
+
+
+def test_predict_batch_empty_returns_422():
+    with TestClient(app) as c:
+        response = c.post("/predict/batch", json={"applicants": []})
+        assert response.status_code == 422
+
+
+def test_predict_batch_invalid_row_returns_422():
+    payload = VALID_PAYLOAD.copy()
+    payload["DAYS_BIRTH"] = 0
+    with TestClient(app) as c:
+        response = c.post("/predict/batch", json={"applicants": [VALID_PAYLOAD, payload]})
+        assert response.status_code == 422
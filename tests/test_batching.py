@@ -0,0 +1,78 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import app
+from api.batching import MicroBatcher
+from tests.test_api import VALID_PAYLOAD
+
+
+def run_concurrently(batcher: MicroBatcher, rows: list[np.ndarray]) -> list[float]:
+    async def main():
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(row) for row in rows))
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(main())
+
+
+# === Scheduler ===
+
+def test_concurrent_rows_are_scored_together():
+    batch_sizes = []
+
+    async def score(rows):
+        batch_sizes.append(len(rows))
+        return rows[:, 0].astype(np.float64)
+
+    batcher = MicroBatcher(score, max_batch_size=64, max_wait_ms=50)
+    rows = [np.full((1, 10), i, dtype=np.float32) for i in range(20)]
+    results = run_concurrently(batcher, rows)
+
+    assert results == [float(i) for i in range(20)]
+    assert sum(batch_sizes) == 20
+    assert len(batch_sizes) < 20
+
+
+def test_batches_respect_max_batch_size():
+    batch_sizes = []
+
+    async def score(rows):
+        batch_sizes.append(len(rows))
+        return np.zeros(len(rows))
+
+    batcher = MicroBatcher(score, max_batch_size=4, max_wait_ms=50)
+    run_concurrently(batcher, [np.zeros((1, 10), dtype=np.float32)] * 10)
+
+    assert max(batch_sizes) <= 4
+    assert sum(batch_sizes) == 10
+
+
+def test_inference_error_is_propagated_to_callers():
+    async def score(rows):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(score, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="boom"):
+        run_concurrently(batcher, [np.zeros((1, 10), dtype=np.float32)])
+
+
+# === API integration ===
+
+def test_predict_with_micro_batching_matches_direct(monkeypatch):
+    with TestClient(app) as c:
+        expected = c.post("/predict", json=VALID_PAYLOAD).json()
+
+    monkeypatch.setenv("MICRO_BATCHING", "1")
+    with TestClient(app) as c:
+        response = c.post("/predict", json=VALID_PAYLOAD)
+        assert response.status_code == 200
+        assert response.json() == expected
+
+        metrics_text = c.get("/metrics").text
+        assert "micro_batch_size_count" in metrics_text
+        assert "micro_batch_queue_depth" in metrics_text
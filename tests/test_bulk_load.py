@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from api.bulk_load import COPY_TYPES, read_chunks
+from api.database import FEATURE_TYPES, predictions, reference_data
+from tests.test_api import VALID_PAYLOAD
+
+
+def log_line(i: int) -> str:
+    return json.dumps({
+        "timestamp": datetime(2025, 1, 1, 0, 0, i, tzinfo=timezone.utc).isoformat(),
+        "input_features": VALID_PAYLOAD,
+        "prediction": 0,
+        "probability_default": 0.05,
+        "credit_decision": "approved",
+    })
+
+
+# === Readers ===
+
+def test_jsonl_logs_are_flattened_into_feature_columns(tmp_path):
+    path = tmp_path / "predictions.jsonl"
+    path.write_text("\n".join(log_line(i) for i in range(5)) + "\n")
+
+    chunks = list(read_chunks(path, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    chunk = chunks[0]
+    assert "input_features" not in chunk
+    assert chunk.loc[0, list(FEATURE_TYPES)].to_dict() == VALID_PAYLOAD
+    assert chunk["timestamp"].iloc[1] == pd.Timestamp("2025-01-01T00:00:01Z")
+
+
+def test_logs_from_before_the_cache_default_to_not_cached(tmp_path):
+    path = tmp_path / "predictions.jsonl"
+    newer = json.loads(log_line(1)) | {"cached": True, "model_version": "v2"}
+    path.write_text(log_line(0) + "\n" + json.dumps(newer) + "\n")
+
+    [chunk] = read_chunks(path)
+    assert chunk["cached"].tolist() == [False, True]
+    assert chunk["model_version"].isna().tolist() == [True, False]
+
+
+def test_csv_is_read_in_chunks(tmp_path):
+    path = tmp_path / "reference.csv"
+    pd.DataFrame([{**VALID_PAYLOAD, "TARGET": i % 2} for i in range(7)]).to_csv(path, index=False)
+    assert [len(chunk) for chunk in read_chunks(path, chunk_size=3)] == [3, 3, 1]
+
+
+def test_unknown_extension_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        next(read_chunks(tmp_path / "data.xlsx"))
+
+
+# === Binary COPY types ===
+
+@pytest.mark.parametrize("table", [reference_data, predictions])
+def test_every_loadable_column_has_a_copy_type(table):
+    skipped = {c.name for c in table.columns if type(c.type) not in COPY_TYPES}
+    assert skipped <= {"input_features"}
@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api.cache as cache
+import api.log_writer as log_writer
+from api.app import app
+from api.cache import EVICTIONS, HITS, MISSES, PredictionCache
+from tests.test_api import VALID_PAYLOAD
+
+
+def row(*values: float) -> np.ndarray:
+    return np.array([values], dtype=np.float32)
+
+
+# === LRU / TTL ===
+
+def test_least_recently_used_entry_is_evicted():
+    evictions_before = EVICTIONS.value()
+    c = PredictionCache(max_size=2)
+    a, b, d = c.key(row(1.0)), c.key(row(2.0)), c.key(row(3.0))
+    c.put(a, 0.1)
+    c.put(b, 0.2)
+    assert c.get(a) == 0.1
+    c.put(d, 0.3)
+
+    assert len(c) == 2
+    assert c.get(b) is None
+    assert c.get(a) == 0.1
+    assert EVICTIONS.value() - evictions_before == 1
+
+
+def test_expired_entries_miss(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    c = PredictionCache(ttl=10)
+    key = c.key(row(1.0))
+    c.put(key, 0.5)
+    assert c.get(key) == 0.5
+
+    now += 11
+    assert c.get(key) is None
+    assert len(c) == 0
+
+
+def test_quantization_shares_nearby_keys():
+    exact = PredictionCache()
+    coarse = PredictionCache(quantization_bits=8)
+    x, y = row(0.5, 1234.5), row(0.50001, 1234.51)
+    assert exact.key(x) != exact.key(y)
+    assert coarse.key(x) == coarse.key(y)
+    assert coarse.key(x) != coarse.key(row(0.6, 1234.5))
+
+
+@pytest.mark.parametrize("bits", [-1, 24, 32])
+def test_quantization_beyond_the_mantissa_is_rejected(bits):
+    with pytest.raises(ValueError, match="quantization_bits"):
+        PredictionCache(quantization_bits=bits)
+
+
+# === Endpoint ===
+
+def test_repeated_payload_is_served_from_cache(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setenv("PREDICTION_CACHE_SIZE", "100")
+    hits_before, misses_before = HITS.value(), MISSES.value()
+
+    with TestClient(app) as c:
+        first = c.post("/predict", json=VALID_PAYLOAD).json()
+        reordered = dict(reversed(list(VALID_PAYLOAD.items())))
+        second = c.post("/predict", json=reordered).json()
+
+    assert second == first
+    assert HITS.value() - hits_before == 1
+    assert MISSES.value() - misses_before == 1
+
+    lines = [json.loads(line) for line in log_writer.LOG_FILE.read_text().splitlines()]
+    assert [line["cached"] for line in lines] == [False, True]
+    assert lines[1]["input_features"] == VALID_PAYLOAD
+
+
+def test_cache_is_dropped_with_the_model(monkeypatch):
+    monkeypatch.setenv("PREDICTION_CACHE_SIZE", "100")
+    hits_before = HITS.value()
+
+    with TestClient(app) as c:
+        c.post("/predict", json=VALID_PAYLOAD)
+    with TestClient(app) as c:
+        c.post("/predict", json=VALID_PAYLOAD)
+
+    assert HITS.value() == hits_before
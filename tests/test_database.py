@@ -0,0 +1,244 @@
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import MetaData
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+import api.app as app_module
+from api.app import app
+from api.database import (
+    FEATURE_TYPES,
+    PROBABILITY_BINS,
+    ROLLUP_TRIGGER_DDL,
+    _predictions_table,
+    partition_name,
+    partition_range,
+    predictions,
+    predictions_query,
+    reference_data,
+    rollup_boundary,
+    summarize,
+    summary_queries,
+    to_log_row,
+)
+from api.maintenance import refresh_statement
+from tests.test_api import VALID_PAYLOAD
+
+
+def compile_query(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+# === Schema ===
+
+def test_history_indexes_are_declared():
+    indexes = {index.name: [c.name for c in index.columns] for index in predictions.indexes}
+    assert indexes["ix_predictions_timestamp_id"] == ["timestamp", "id"]
+    assert indexes["ix_predictions_decision_timestamp"] == ["credit_decision", "timestamp", "id"]
+
+
+# === Typed feature columns ===
+
+def test_feature_columns_match_reference_data():
+    for name in FEATURE_TYPES:
+        assert type(predictions.c[name].type) is type(reference_data.c[name].type)
+        assert predictions.c[name].nullable
+
+
+def test_log_rows_rebuild_features_from_typed_columns():
+    row = to_log_row({"id": 1, "input_features": None, **VALID_PAYLOAD})
+    assert row == {"id": 1, "input_features": VALID_PAYLOAD}
+
+
+def test_log_rows_keep_legacy_json_features():
+    legacy = {"EXT_SOURCES_MEAN": 0.5}
+    row = to_log_row({"id": 1, "input_features": legacy, **dict.fromkeys(FEATURE_TYPES)})
+    assert row == {"id": 1, "input_features": legacy}
+
+
+# === Partitioning ===
+
+def test_partitioned_table_includes_timestamp_in_primary_key():
+    ddl = str(CreateTable(_predictions_table(MetaData(), partitioned=True)).compile(dialect=postgresql.dialect()))
+    assert "PRIMARY KEY (id, timestamp)" in ddl
+    assert ddl.rstrip().endswith("PARTITION BY RANGE (timestamp)")
+
+
+def test_partition_ranges_and_names():
+    assert partition_range(date(2025, 3, 31), "daily") == (date(2025, 3, 31), date(2025, 4, 1))
+    assert partition_range(date(2025, 12, 15), "monthly") == (date(2025, 12, 1), date(2026, 1, 1))
+    assert partition_name(date(2025, 3, 31), "daily") == "predictions_p20250331"
+    assert partition_name(date(2025, 12, 1), "monthly") == "predictions_p202512"
+
+
+# === Rollups ===
+
+def test_rollup_refresh_recomputes_only_dirty_hours():
+    sql = compile_query(refresh_statement())
+    assert sql.startswith("WITH dirty AS \n(DELETE FROM predictions_dirty_hours RETURNING")
+    assert "FROM dirty JOIN predictions ON predictions.timestamp >= dirty.hour" in sql
+    assert "ON CONFLICT (hour) DO UPDATE" in sql
+
+
+def test_rollup_rebuild_upserts_hours_with_raw_rows():
+    sql = compile_query(refresh_statement(rebuild=True))
+    # Upserted, never deleted: rollups of hours dropped by retention stay.
+    assert "DELETE FROM predictions_hourly" not in sql
+    assert "FROM predictions GROUP BY date_trunc('hour', predictions.timestamp) ON CONFLICT (hour) DO UPDATE" in sql
+
+
+def test_dirty_hours_trigger_reads_the_inserted_rows():
+    assert "AFTER INSERT ON predictions REFERENCING NEW TABLE AS inserted FOR EACH STATEMENT" in ROLLUP_TRIGGER_DDL[1]
+    assert "date_trunc('hour', timestamp) FROM inserted" in ROLLUP_TRIGGER_DDL[0]
+
+
+# === Query builder ===
+
+def test_default_query_orders_by_timestamp_then_id():
+    sql = compile_query(predictions_query())
+    assert "ORDER BY predictions.timestamp DESC, predictions.id DESC" in sql
+    assert "WHERE" not in sql
+
+
+def test_keyset_cursor_and_filters():
+    cursor = (datetime(2025, 1, 2, tzinfo=timezone.utc), 42)
+    sql = compile_query(predictions_query(
+        limit=10,
+        before=cursor,
+        start=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        decision="denied",
+    ))
+    assert "(predictions.timestamp, predictions.id) < ('2025-01-02 00:00:00+00:00', 42)" in sql
+    assert "predictions.timestamp >= '2025-01-01 00:00:00+00:00'" in sql
+    assert "predictions.credit_decision = 'denied'" in sql
+    assert "LIMIT 10" in sql
+
+
+# === Summary ===
+
+def test_summary_reads_whole_rolled_up_hours_from_rollups():
+    rollups, raw = map(compile_query, summary_queries(
+        "day",
+        start=datetime(2025, 1, 1, 6, 30, tzinfo=timezone.utc),
+        end=datetime(2025, 1, 9, tzinfo=timezone.utc),
+        rolled_up_until=datetime(2025, 1, 5, 12, tzinfo=timezone.utc),
+    ))
+    assert "FROM predictions_hourly" in rollups
+    assert "predictions_hourly.hour >= '2025-01-01 07:00:00+00:00'" in rollups
+    assert "predictions_hourly.hour < '2025-01-05 12:00:00+00:00'" in rollups
+    assert "date_trunc('day', predictions_hourly.hour)" in rollups
+    assert (
+        "predictions.timestamp < '2025-01-01 07:00:00+00:00' OR predictions.timestamp >= '2025-01-05 12:00:00+00:00'"
+        in raw
+    )
+
+
+def test_summary_without_usable_rollups_scans_raw_rows():
+    [raw] = summary_queries("hour", start=datetime(2025, 1, 1, 6, 30, tzinfo=timezone.utc))
+    assert "predictions_hourly" not in compile_query(raw)
+    [raw] = summary_queries(
+        "hour",
+        start=datetime(2025, 1, 1, 6, 30, tzinfo=timezone.utc),
+        end=datetime(2025, 1, 1, 7, 30, tzinfo=timezone.utc),
+        rolled_up_until=datetime(2025, 1, 2, tzinfo=timezone.utc),
+    )
+    assert "predictions_hourly" not in compile_query(raw)
+
+
+def test_summary_reads_raw_rows_from_the_oldest_unrefreshed_hour():
+    latest = datetime(2025, 1, 5, 12, tzinfo=timezone.utc)
+    late = datetime(2025, 1, 2, 3, tzinfo=timezone.utc)
+    assert rollup_boundary(latest, late) == late
+    assert rollup_boundary(latest, latest + timedelta(hours=1)) == latest
+    assert rollup_boundary(latest, None) == latest
+    assert rollup_boundary(None, late) is None
+
+
+def test_summary_merges_rollup_and_raw_buckets():
+    day = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    histogram = [0] * PROBABILITY_BINS
+    histogram[0], histogram[4], histogram[45] = 2, 1, 1
+    summary = summarize(
+        [
+            (day, 4, 1, 1, 1.2, histogram),
+            (day + timedelta(days=1), 1, 0, 0, 0.05, [1] + [0] * (PROBABILITY_BINS - 1)),
+            (day, 4, 1, 0, 1.2, histogram),
+        ],
+        "day",
+    )
+
+    assert (summary["total"], summary["approved"], summary["denied"], summary["cached"]) == (9, 7, 2, 1)
+    assert summary["approval_rate"] == 7 / 9
+    assert summary["probability_histogram"][:6] == [5, 0, 0, 0, 2, 0]
+    assert summary["probability_histogram"][45] == 2 and sum(summary["probability_histogram"]) == 9
+    # The 0.10 threshold falls on a bin edge.
+    assert summary["probability_bins"][:2] == [0.0, 0.02] and summary["probability_bins"][-1] == 1.0
+    assert 0.1 in summary["probability_bins"]
+    assert [(item["start"], item["total"], item["mean_probability"]) for item in summary["series"]] == [
+        (day, 8, 0.3),
+        (day + timedelta(days=1), 1, 0.05),
+    ]
+
+
+def test_empty_summary():
+    summary = summarize([], "hour")
+    assert summary["total"] == 0 and summary["approval_rate"] is None
+    assert summary["probability_histogram"] == [0] * PROBABILITY_BINS and summary["series"] == []
+
+
+# === Endpoint ===
+
+def test_malformed_cursor_returns_422():
+    with TestClient(app) as c:
+        response = c.get("/predictions", params={"before": "yesterday"})
+        assert response.status_code == 422
+
+
+def test_unknown_decision_returns_422():
+    with TestClient(app) as c:
+        response = c.get("/predictions", params={"decision": "maybe"})
+        assert response.status_code == 422
+
+
+def test_full_page_returns_next_cursor(monkeypatch):
+    timestamp = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    calls = []
+
+    async def fake_get_predictions(*args):
+        calls.append(args)
+        return [{"id": 7 - i, "timestamp": timestamp} for i in range(args[0])]
+
+    monkeypatch.setattr(app_module, "is_db_enabled", lambda: True)
+    monkeypatch.setattr(app_module, "get_predictions", fake_get_predictions)
+    with TestClient(app) as c:
+        response = c.get("/predictions", params={"limit": 2, "before": "2025-01-03T00:00:00+00:00,9"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Next-Cursor"] == "2025-01-02T03:04:05+00:00,6"
+    assert calls[0][2] == (datetime(2025, 1, 3, tzinfo=timezone.utc), 9)
+
+
+def test_summary_requires_database():
+    with TestClient(app) as c:
+        assert c.get("/predictions/summary").status_code == 503
+        assert c.get("/predictions/summary", params={"bucket": "minute"}).status_code == 422
+
+
+def test_summary_endpoint(monkeypatch):
+    calls = []
+
+    async def fake_get_prediction_summary(*args):
+        calls.append(args)
+        return summarize([(datetime(2025, 1, 1, tzinfo=timezone.utc), 2, 1, 0, 0.5, [1] * 2 + [0] * 8)], args[2], *args[:2])
+
+    monkeypatch.setattr(app_module, "is_db_enabled", lambda: True)
+    monkeypatch.setattr(app_module, "get_prediction_summary", fake_get_prediction_summary)
+    with TestClient(app) as c:
+        response = c.get("/predictions/summary", params={"start": "2025-01-01T00:00:00Z", "bucket": "hour"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["approval_rate"], body["bucket"]) == (2, 0.5, "hour")
+    assert body["series"] == [{"start": "2025-01-01T00:00:00Z", "total": 2, "denied": 1, "cached": 0, "mean_probability": 0.25}]
+    assert calls == [(datetime(2025, 1, 1, tzinfo=timezone.utc), None, "hour")]
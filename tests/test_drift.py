@@ -0,0 +1,140 @@
+import asyncio
+import os
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import api.drift as drift
+from api.app import app
+from api.drift import DriftMonitor, jensen_shannon, kolmogorov_smirnov, population_stability_index
+from tests.test_api import VALID_PAYLOAD
+from tests.test_tree_backend import applicant_rows
+
+NOW = 1_750_000_000.0
+
+
+def reference_monitor(n: int = 5000) -> DriftMonitor:
+    rng = np.random.default_rng(0)
+    return DriftMonitor(applicant_rows(n).astype(np.float64), rng.random(n))
+
+
+# === Statistics ===
+
+def test_identical_distributions_score_zero():
+    p = np.array([0.1, 0.2, 0.3, 0.4])
+    assert population_stability_index(p, p) == 0
+    assert kolmogorov_smirnov(p, p) == 0
+    assert jensen_shannon(p, p) == 0
+
+
+def test_disjoint_distributions_score_maximal():
+    p, q = np.array([1.0, 0.0]), np.array([0.0, 1.0])
+    assert kolmogorov_smirnov(p, q) == 1
+    assert jensen_shannon(p, q) == 1
+    assert population_stability_index(p, q) > 10
+
+
+# === Monitor ===
+
+def test_shifted_feature_is_flagged():
+    monitor = reference_monitor()
+    rows = applicant_rows(2000, seed=1).astype(np.float64)
+    rows[:, 9] -= 0.15
+    monitor.observe(rows, np.random.default_rng(1).random(2000), np.full(2000, NOW))
+
+    window = monitor.report(NOW)["windows"]["1h"]
+    assert window["count"] == 2000
+    assert window["features"]["EXT_SOURCE_2"]["drift"] is True
+    assert window["features"]["EXT_SOURCES_MEAN"]["drift"] is False
+    assert window["prediction"]["psi"] < 0.05
+
+
+def test_windows_forget_old_observations():
+    monitor = reference_monitor()
+    rows = applicant_rows(10, seed=2).astype(np.float64)
+    monitor.observe(rows, np.full(10, 0.1), np.full(10, NOW))
+
+    counts = {label: w["count"] for label, w in monitor.report(NOW + 2 * 3600)["windows"].items()}
+    assert counts == {"1h": 0, "24h": 10, "7d": 10}
+    assert monitor.report(NOW + 2 * 3600)["windows"]["1h"]["prediction"] is None
+    assert monitor.report(NOW + 8 * 86_400)["windows"]["7d"]["count"] == 0
+
+
+# === Workers ===
+
+def test_reports_sum_the_windows_of_every_worker(monkeypatch, tmp_path):
+    monkeypatch.setenv("METRICS_MULTIPROC_DIR", str(tmp_path))
+    first = reference_monitor().publish(tmp_path / drift.REFERENCE_FILE)
+    second = reference_monitor(3000).publish(tmp_path / drift.REFERENCE_FILE)
+    assert all(np.array_equal(a, b) for a, b in zip(first.edges, second.edges))
+
+    second.observe(applicant_rows(10, seed=3).astype(np.float64), np.full(10, 0.1), np.full(10, NOW))
+    second.write_snapshot(tmp_path)
+    # Stands for another worker, alive or not.
+    (tmp_path / f"drift-{os.getpid()}.npz").rename(tmp_path / "drift-1.npz")
+    first.observe(applicant_rows(5, seed=4).astype(np.float64), np.full(5, 0.1), np.full(5, NOW))
+
+    counts = {label: w["count"] for label, w in first.report(NOW + 2 * 3600)["windows"].items()}
+    assert counts == {"1h": 0, "24h": 15, "7d": 15}
+
+
+def test_later_workers_adopt_the_published_reference(monkeypatch, tmp_path):
+    monkeypatch.setenv("METRICS_MULTIPROC_DIR", str(tmp_path))
+    published = reference_monitor().publish(tmp_path / drift.REFERENCE_FILE)
+
+    async def no_sample(limit):
+        raise AssertionError("the reference was sampled again")
+
+    monkeypatch.setattr(drift, "get_reference_sample", no_sample)
+    asyncio.run(drift.load_reference(None))
+
+    monitor = drift.get_monitor()
+    drift.set_monitor(None)
+    assert monitor.reference_rows == published.reference_rows
+    assert np.array_equal(monitor.reference, published.reference)
+
+
+def test_reference_of_another_model_is_rebuilt(monkeypatch, tmp_path):
+    monkeypatch.setenv("METRICS_MULTIPROC_DIR", str(tmp_path))
+    stale = DriftMonitor(applicant_rows(500).astype(np.float64), np.full(500, 0.9), model="v1")
+    stale.publish(tmp_path / drift.REFERENCE_FILE)
+    stale.observe(applicant_rows(10, seed=3).astype(np.float64), np.full(10, 0.9), np.full(10, NOW))
+    stale.write_snapshot(tmp_path)
+    (tmp_path / f"drift-{os.getpid()}.npz").rename(tmp_path / "drift-1.npz")
+
+    async def sample(limit):
+        return [tuple(row) for row in applicant_rows(500).astype(np.float64)]
+
+    async def score(rows):
+        return np.random.default_rng(0).random(len(rows))
+
+    monkeypatch.setattr(drift, "get_reference_sample", sample)
+    asyncio.run(drift.load_reference(score, model="v2"))
+
+    monitor = drift.get_monitor()
+    drift.set_monitor(None)
+    assert monitor.model == "v2"
+    assert DriftMonitor.load(tmp_path / drift.REFERENCE_FILE).model == "v2"
+    # The old model's windows were binned on the old reference.
+    assert monitor.report(NOW)["windows"]["1h"]["count"] == 0
+
+
+# === Endpoint ===
+
+def test_drift_without_reference_returns_503():
+    with TestClient(app) as c:
+        assert c.get("/monitoring/drift").status_code == 503
+
+
+def test_logged_predictions_feed_the_monitor(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monitor = reference_monitor()
+
+    with TestClient(app) as c:
+        drift.set_monitor(monitor)
+        c.post("/predict/batch", json={"applicants": [VALID_PAYLOAD] * 3})
+        response = c.get("/monitoring/drift")
+
+    assert response.status_code == 200
+    assert set(response.json()["windows"]) == {"1h", "24h", "7d"}
+    assert monitor.report()["windows"]["1h"]["count"] == 3
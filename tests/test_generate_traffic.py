@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monitoring.generate_traffic import FEATURE_COLUMNS, generate_chunks, load_model, write_jsonl
+from tests.test_tree_backend import applicant_rows
+
+
+@pytest.fixture(scope="module")
+def model():
+    return load_model()
+
+
+@pytest.fixture(scope="module")
+def ref_data():
+    data = pd.DataFrame(applicant_rows(500).astype(np.float64), columns=FEATURE_COLUMNS)
+    data["DAYS_BIRTH"] = data["DAYS_BIRTH"].astype(np.int64)
+    return data
+
+
+# === Generation ===
+
+def test_chunks_are_time_ordered_and_sized(model, ref_data):
+    chunks = list(generate_chunks(ref_data, model, n=2500, days=2, chunk_size=1000))
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+
+    timestamps = pd.concat([chunk["timestamp"] for chunk in chunks])
+    assert timestamps.is_monotonic_increasing
+    assert timestamps.iloc[-1] - timestamps.iloc[0] <= pd.Timedelta(days=2)
+
+
+def test_same_seed_same_rows(model, ref_data):
+    first = next(generate_chunks(ref_data, model, n=200, seed=7))
+    second = next(generate_chunks(ref_data, model, n=200, seed=7))
+    pd.testing.assert_frame_equal(first.drop(columns="timestamp"), second.drop(columns="timestamp"))
+
+
+def test_drift_profiles(model, ref_data):
+    kwargs = dict(n=4000, chunk_size=4000, seed=1)
+    none = next(generate_chunks(ref_data, model, drift="none", **kwargs))
+    default = next(generate_chunks(ref_data, model, drift="default", **kwargs))
+    gradual = next(generate_chunks(ref_data, model, drift="gradual", **kwargs))
+
+    assert default["AMT_ANNUITY"].to_numpy() == pytest.approx((none["AMT_ANNUITY"] * 1.2).round(2).to_numpy())
+    assert (default["DAYS_BIRTH"] <= -1).all()
+    shift = none["EXT_SOURCE_2"] - gradual["EXT_SOURCE_2"]
+    assert shift.iloc[:400].mean() < 0.02 < 0.13 < shift.iloc[-400:].mean()
+
+
+def test_probabilities_match_model(model, ref_data):
+    chunk = next(generate_chunks(ref_data, model, n=100, drift="none"))
+    expected = model.predict_proba(chunk[model.feature_name_])[:, 1].round(6)
+    np.testing.assert_array_equal(chunk["probability_default"], expected)
+    assert ((chunk["probability_default"] >= 0.10) == (chunk["credit_decision"] == "denied")).all()
+
+
+# === Output ===
+
+def test_jsonl_lines_match_prediction_log_format(model, ref_data, tmp_path):
+    path = tmp_path / "predictions.jsonl"
+    for _ in write_jsonl(generate_chunks(ref_data, model, n=30, chunk_size=8), path):
+        pass
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 30
+    assert set(lines[0]) == {"timestamp", "input_features", "prediction", "probability_default", "credit_decision"}
+    assert list(lines[0]["input_features"]) == FEATURE_COLUMNS
+    assert isinstance(lines[0]["input_features"]["DAYS_BIRTH"], int)
@@ -0,0 +1,52 @@
+import asyncio
+
+import numpy as np
+import onnxruntime as ort
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.app import ONNX_MODEL_PATH, app
+from api.inference import SessionPool, build_session_options
+from tests.test_api import VALID_PAYLOAD
+
+ROWS = np.random.default_rng(0).random((32, 10), dtype=np.float32)
+
+
+# === Session options ===
+
+def test_session_options_are_applied():
+    options = build_session_options(
+        intra_op_threads=2,
+        inter_op_threads=1,
+        graph_optimization="basic",
+        execution_mode="parallel",
+    )
+    assert options.intra_op_num_threads == 2
+    assert options.inter_op_num_threads == 1
+    assert options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    assert options.execution_mode == ort.ExecutionMode.ORT_PARALLEL
+
+
+# === Session pool ===
+
+def test_pool_sessions_agree():
+    pool = SessionPool(ONNX_MODEL_PATH, size=3, options=build_session_options(intra_op_threads=1))
+    try:
+        expected = pool.predict_proba(ROWS)
+
+        async def main():
+            return await asyncio.gather(*(pool.run(ROWS) for _ in range(6)))
+
+        for probabilities in asyncio.run(main()):
+            np.testing.assert_array_equal(probabilities, expected)
+    finally:
+        pool.close()
+
+
+def test_app_uses_configured_pool_size(monkeypatch):
+    monkeypatch.setenv("ORT_SESSION_POOL_SIZE", "2")
+    monkeypatch.setenv("ORT_INTRA_OP_THREADS", "1")
+    with TestClient(app) as c:
+        assert len(app_module.predictor.sessions) == 2
+        response = c.post("/predict", json=VALID_PAYLOAD)
+        assert response.status_code == 200
@@ -0,0 +1,162 @@
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import api.jsonl_log as jsonl_log
+from api.bulk_load import read_chunks
+from api.jsonl_log import RotatingJsonlLog
+from tests.test_api import VALID_PAYLOAD
+
+
+def make_entries(n: int) -> list[dict]:
+    return [
+        {
+            "timestamp": datetime(2025, 1, 1, 0, 0, i, tzinfo=timezone.utc),
+            "input_features": VALID_PAYLOAD,
+            "prediction": 0,
+            "probability_default": 0.05,
+            "credit_decision": "approved",
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    monkeypatch.setattr(jsonl_log, "SETTLE_SECONDS", 0.0)
+
+
+# === Rotation ===
+
+def test_active_file_rotates_at_size_limit(tmp_path):
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", max_bytes=1000, compression="none")
+
+    assert log.append(make_entries(1)) is None
+    segment = log.append(make_entries(5))
+
+    assert segment is not None and segment.name.startswith("predictions-")
+    assert not log.path.exists()
+    assert len(segment.read_text().splitlines()) == 6
+    log.append(make_entries(1))
+    assert len(log.path.read_text().splitlines()) == 1
+
+
+def test_active_file_rotates_at_age_limit(tmp_path):
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", max_age=0.0, compression="none")
+    assert log.append(make_entries(1)) is not None
+
+
+def test_segments_are_compressed_once_settled(tmp_path, settled):
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", max_bytes=1, fsync="rotate")
+    segment = log.append(make_entries(3))
+    log.compress_segments()
+
+    compressed = segment.with_name(segment.name + ".gz")
+    assert not segment.exists()
+    assert len(gzip.decompress(compressed.read_bytes()).splitlines()) == 3
+    assert [len(chunk) for chunk in read_chunks(compressed)] == [3]
+
+
+def test_concurrent_compressions_of_a_segment_do_not_clash(tmp_path, monkeypatch):
+    # The writer and replay threads compress the same segment: the second one
+    # starts once the first has written part of its output, and finishes
+    # before the first writes the rest.
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", max_bytes=1)
+    segment = log.append(make_entries(50) * 10)
+    monkeypatch.setattr(jsonl_log, "SETTLE_SECONDS", 0.0)
+    open_gzip, copy = jsonl_log.gzip.open, jsonl_log.shutil.copyfileobj
+    turns, first_wrote, second_done = [], threading.Event(), threading.Event()
+
+    def gzip_in_turn(*args, **kwargs):
+        turns.append(threading.get_ident())
+        if len(turns) == 2:
+            first_wrote.wait(5)
+        return open_gzip(*args, **kwargs)
+
+    def copy_in_turn(src, dst):
+        if turns.index(threading.get_ident()) == 0:
+            dst.write(src.readline())
+            dst.flush()
+            first_wrote.set()
+            second_done.wait(5)
+        copy(src, dst)
+
+    def compress():
+        log.compress_segments()
+        if turns.index(threading.get_ident()) == 1:
+            second_done.set()
+
+    monkeypatch.setattr(jsonl_log.gzip, "open", gzip_in_turn)
+    monkeypatch.setattr(jsonl_log.shutil, "copyfileobj", copy_in_turn)
+    threads = [threading.Thread(target=compress) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    monkeypatch.undo()
+
+    compressed = segment.with_name(segment.name + ".gz")
+    assert not segment.exists()
+    assert len(gzip.decompress(compressed.read_bytes()).splitlines()) == 500
+    assert sorted(path.name for path in tmp_path.iterdir()) == [compressed.name]
+
+
+def test_unknown_options_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="compression"):
+        RotatingJsonlLog(tmp_path / "predictions.jsonl", compression="lz4")
+    with pytest.raises(ValueError, match="fsync"):
+        RotatingJsonlLog(tmp_path / "predictions.jsonl", fsync="always")
+
+
+# === Replay claims ===
+
+def test_claim_takes_active_file_and_segments(tmp_path, settled):
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", max_bytes=1)
+    log.append(make_entries(2))
+    log.append(make_entries(1))
+
+    claimed = log.claim_segments()
+    assert [(path.parent.name, path.name.endswith(".jsonl.gz")) for path in claimed] == [("replaying", True)] * 2
+    assert log.claim_segments() == []
+
+    log.release(claimed)
+    assert len(log.segments(".gz")) == 2
+    log.remove(log.claim_segments())
+    assert list(tmp_path.glob("*.*")) == []
+
+
+def test_unsettled_segments_are_not_claimed(tmp_path):
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", compression="none")
+    log.append(make_entries(1))
+    assert log.claim_segments() == []
+    assert [json.loads(line)["prediction"] for line in log.segments()[0].read_text().splitlines()] == [0]
+
+
+def test_claims_of_a_dead_process_are_taken_over(tmp_path, settled):
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", max_bytes=1)
+    log.append(make_entries(2))
+    [orphan] = log.claim_segments()
+    # Another worker still replaying its own claim holds the segment's lock.
+    other = RotatingJsonlLog(tmp_path / "predictions.jsonl")
+    assert other.claim_segments() == []
+
+    os.close(log._claims.pop(orphan))  # the claiming process dies
+    assert other.claim_segments() == [orphan]
+
+
+def test_segment_is_set_aside_after_repeated_failures(tmp_path, settled):
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", max_bytes=1)
+    log.append(make_entries(1))
+
+    for _ in range(jsonl_log.MAX_REPLAY_ATTEMPTS - 1):
+        [segment] = log.claim_segments()
+        assert log.reject(segment) is False
+    [segment] = log.claim_segments()
+    assert log.reject(segment) is True
+
+    assert log.claim_segments() == []
+    assert [path.name for path in log.failed_dir.iterdir()] == [segment.name]
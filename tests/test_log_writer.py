@@ -0,0 +1,158 @@
+import asyncio
+import json
+import sys
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+import psycopg
+import pytest
+from fastapi.testclient import TestClient
+
+import api.jsonl_log as jsonl_log
+
+import api.log_writer as log_writer
+from api.app import app
+from api.jsonl_log import RotatingJsonlLog
+from api.log_writer import ENTRIES_DROPPED, ENTRIES_REPLAYED, PredictionLogWriter, replay_segments
+from tests.test_api import VALID_PAYLOAD
+
+
+def make_entries(n: int) -> list[dict]:
+    return [
+        {
+            "timestamp": datetime.now(timezone.utc),
+            "input_features": {"EXT_SOURCES_MEAN": i / n},
+            "prediction": 0,
+            "probability_default": 0.05,
+            "credit_decision": "approved",
+        }
+        for i in range(n)
+    ]
+
+
+def read_lines(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+# === JSONL sink ===
+
+def test_entries_are_flushed_in_batches():
+
+    async def main():
+        writer = PredictionLogWriter(batch_size=10, flush_interval=0.01)
+        writer.start()
+        await writer.submit(make_entries(25))
+        await asyncio.sleep(0.1)
+        lines = read_lines(log_writer.LOG_FILE)
+        await writer.stop()
+        return lines
+
+    lines = asyncio.run(main())
+    assert len(lines) == 25
+    assert lines[0]["input_features"] == {"EXT_SOURCES_MEAN": 0.0}
+
+
+def test_stop_drains_pending_entries():
+
+    async def main():
+        writer = PredictionLogWriter(batch_size=1000, flush_interval=60)
+        writer.start()
+        await writer.submit(make_entries(7))
+        await asyncio.sleep(0)
+        await writer.stop()
+
+    asyncio.run(main())
+    assert len(read_lines(log_writer.LOG_FILE)) == 7
+
+
+def test_full_queue_drops_and_counts():
+    dropped_before = ENTRIES_DROPPED.value()
+
+    async def main():
+        writer = PredictionLogWriter(max_queue_size=5)
+        await writer.submit(make_entries(8))
+        await writer.stop()
+
+    asyncio.run(main())
+    assert ENTRIES_DROPPED.value() - dropped_before == 3
+    assert len(read_lines(log_writer.LOG_FILE)) == 5
+
+
+# === Endpoint hook ===
+
+def test_predict_logs_validated_features_and_response():
+    with TestClient(app) as c:
+        single = c.post("/predict", json=VALID_PAYLOAD).json()
+        batch = c.post("/predict/batch", json={"applicants": [VALID_PAYLOAD] * 2}).json()
+
+    lines = read_lines(log_writer.LOG_FILE)
+    assert len(lines) == 3
+    assert lines[0]["input_features"] == VALID_PAYLOAD
+    assert lines[0]["probability_default"] == single["probability_default"]
+    assert [line["credit_decision"] for line in lines[1:]] == [
+        p["credit_decision"] for p in batch["predictions"]
+    ]
+
+
+# === Replay ===
+
+def test_fallback_segments_are_replayed_when_database_is_available(monkeypatch):
+    monkeypatch.setattr(log_writer, "is_db_enabled", lambda: True)
+    monkeypatch.setattr(log_writer, "replay_segments", lambda log: 4 if log.path == log_writer.LOG_FILE else 0)
+    replayed_before = ENTRIES_REPLAYED.value()
+
+    async def main():
+        writer = PredictionLogWriter()
+        writer.start()
+        await writer.stop()
+
+    asyncio.run(main())
+    assert ENTRIES_REPLAYED.value() - replayed_before == 4
+
+
+@pytest.fixture
+def segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(jsonl_log, "SETTLE_SECONDS", 0.0)
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/test")
+    monkeypatch.setattr(psycopg, "connect", lambda url: nullcontext())
+    log = RotatingJsonlLog(tmp_path / "predictions.jsonl", max_bytes=1)
+    log.append(make_entries(2))
+    log.append(make_entries(3))
+    return log
+
+
+def test_missing_replay_dependency_leaves_segments_unclaimed(segments, monkeypatch):
+    monkeypatch.setitem(sys.modules, "api.bulk_load", None)
+    with pytest.raises(ImportError):
+        replay_segments(segments)
+    assert len(segments.segments(".gz")) == 2
+    assert not segments.replay_dir.exists()
+
+
+def test_failing_segment_does_not_block_the_others(segments, monkeypatch):
+    bad, good = sorted(path.name for path in segments.segments(".gz"))
+
+    def replay_segment(conn, segment, table):
+        if segment.name == bad:
+            raise ValueError("corrupt segment")
+        return 3
+
+    monkeypatch.setattr(log_writer, "replay_segment", replay_segment)
+    assert replay_segments(segments) == 3
+    assert [path.name for path in segments.segments(".gz")] == [bad]
+
+    for _ in range(jsonl_log.MAX_REPLAY_ATTEMPTS - 1):
+        assert replay_segments(segments) == 0
+    assert [path.name for path in segments.failed_dir.iterdir()] == [bad]
+    assert segments.claim_segments() == []
+
+
+def test_lost_connection_releases_every_claimed_segment(segments, monkeypatch):
+    def replay_segment(conn, segment, table):
+        raise psycopg.OperationalError("connection lost")
+
+    monkeypatch.setattr(log_writer, "replay_segment", replay_segment)
+    with pytest.raises(psycopg.OperationalError):
+        replay_segments(segments)
+    assert len(segments.segments(".gz")) == 2
+    assert list(segments.replay_dir.iterdir()) == []
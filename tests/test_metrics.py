@@ -0,0 +1,46 @@
+import json
+import os
+
+from api import metrics
+from api.metrics import Counter, Gauge, Histogram
+
+REQUESTS = Counter("test_requests", "Test counter", ("path",))
+DEPTH = Gauge("test_depth", "Test gauge")
+LATENCY = Histogram("test_latency_seconds", "Test histogram", buckets=(0.1, 1.0))
+
+
+# === Exposition format ===
+
+def test_render_prometheus_text():
+    REQUESTS.inc(path="/predict")
+    LATENCY.observe(0.5)
+    text = metrics.render()
+    assert "# TYPE test_requests counter" in text
+    assert 'test_requests_total{path="/predict"}' in text
+    assert 'test_latency_seconds_bucket{le="1.0"}' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"}' in text
+
+
+# === Multi-process aggregation ===
+
+def test_render_merges_worker_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setenv("METRICS_MULTIPROC_DIR", str(tmp_path))
+    own_requests = REQUESTS.value(path="/health")
+    REQUESTS.inc(path="/health")
+    DEPTH.set(2)
+
+    def other_worker(pid: int, requests: float, depth: float):
+        snapshot = {
+            "test_requests": [[["/health"], requests]],
+            "test_depth": [[[], depth]],
+            "test_latency_seconds": [[[], [[1, 0, 0], 0.05, 1]]],
+        }
+        (tmp_path / f"{pid}.json").write_text(json.dumps(snapshot))
+
+    other_worker(os.getppid(), 3, 5)
+    other_worker(2**22 + 1, 4, 7)
+
+    text = metrics.render()
+    assert f'test_requests_total{{path="/health"}} {own_requests + 8.0}' in text
+    assert "test_depth 7.0" in text
+    assert "test_latency_seconds_count" in text
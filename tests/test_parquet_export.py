@@ -0,0 +1,95 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from api.jsonl_log import append_jsonl
+from api.parquet_export import (
+    EXPORT_COLUMNS,
+    export_jsonl,
+    exported_days,
+    partition_dir,
+    read_predictions,
+    remove_replayed,
+    scan_predictions,
+)
+from tests.test_api import VALID_PAYLOAD
+
+
+def write_log(path, days=(1, 2, 3), per_day=4):
+    entries = [
+        {
+            "timestamp": datetime(2025, 1, day, 6 * hour, tzinfo=timezone.utc),
+            "input_features": VALID_PAYLOAD,
+            "prediction": hour % 2,
+            "probability_default": 0.1 * hour,
+            "credit_decision": "denied" if hour % 2 else "approved",
+        }
+        for day in days
+        for hour in range(per_day)
+    ]
+    append_jsonl(entries, path)
+    return path
+
+
+# === Export ===
+
+def test_jsonl_is_partitioned_by_utc_day(tmp_path):
+    root = tmp_path / "dataset"
+    assert export_jsonl([write_log(tmp_path / "predictions.jsonl")], root, chunk_size=5) == 12
+
+    assert exported_days(root) == [date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3)]
+    assert [path.name for path in (root / "date=2025-01-02").iterdir()] == ["jsonl-predictions.parquet"]
+    table = read_predictions(root)
+    assert table.num_rows == 12
+    assert set(EXPORT_COLUMNS) <= set(table.column_names)
+    assert table.column("DAYS_BIRTH").to_pylist()[0] == VALID_PAYLOAD["DAYS_BIRTH"]
+    # Logs from before the result cache have no cache hits, as on replay.
+    assert table.column("cached").to_pylist() == [False] * 12
+
+
+def test_reexporting_a_log_replaces_its_files(tmp_path):
+    root = tmp_path / "dataset"
+    log = write_log(tmp_path / "predictions.jsonl")
+    export_jsonl([log], root)
+    export_jsonl([log], root)
+
+    assert read_predictions(root).num_rows == 12
+    assert not list(root.rglob("*.tmp"))
+
+
+def test_replayed_segments_are_left_to_the_table_export(tmp_path):
+    root = tmp_path / "dataset"
+    pending = write_log(tmp_path / "predictions-20250101T000000.000000Z-1.jsonl", days=(1,))
+    replayed = write_log(tmp_path / "predictions-20250101T060000.000000Z-1.jsonl", days=(1,))
+    assert export_jsonl([pending, replayed], root, replayed={replayed.name}) == 4
+
+    # Replayed after its export: the table export of its day takes over.
+    export_jsonl([replayed], root)
+    remove_replayed(partition_dir(root, date(2025, 1, 1)), {replayed.name + ".gz"})
+    assert [path.name for path in partition_dir(root, date(2025, 1, 1)).iterdir()] == [
+        "jsonl-predictions-20250101T000000.000000Z-1.parquet"
+    ]
+
+
+# === Queries ===
+
+def test_reads_only_requested_columns_and_range(tmp_path):
+    root = tmp_path / "dataset"
+    export_jsonl([write_log(tmp_path / "predictions.jsonl")], root)
+
+    table = read_predictions(root, ["timestamp", "probability_default"], start=date(2025, 1, 2), end=date(2025, 1, 3))
+    assert table.column_names == ["timestamp", "probability_default"]
+    assert table.num_rows == 4
+
+    edge = read_predictions(root, ["prediction"], start=datetime(2025, 1, 1, 12, tzinfo=timezone.utc), end=date(2025, 1, 2))
+    assert edge.column("prediction").to_pylist() == [0, 1]
+
+
+def test_scan_yields_bounded_batches(tmp_path):
+    root = tmp_path / "dataset"
+    export_jsonl([write_log(tmp_path / "predictions.jsonl", days=(1,), per_day=4)], root)
+    batches = list(scan_predictions(root, ["prediction"], batch_size=3))
+    assert sum(batch.num_rows for batch in batches) == 4
+    assert max(batch.num_rows for batch in batches) <= 3
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.exceptions import RequestValidationError
+from fastapi.testclient import TestClient
+
+from api.app import FEATURE_ORDER, app, feature_parser, parse_batch
+from api.parsing import validate
+from api.schemas import CreditFeatures
+from tests.test_api import VALID_PAYLOAD
+
+
+def with_value(field, value):
+    payload = VALID_PAYLOAD.copy()
+    payload[field] = value
+    return payload
+
+
+def pydantic_errors(payload) -> list[dict]:
+    with pytest.raises(RequestValidationError) as error:
+        validate(CreditFeatures, payload)
+    return error.value.errors()
+
+
+# === Fast path ===
+
+def test_valid_payload_matches_pydantic_rows():
+    inputs, rows = feature_parser.rows(feature_parser.check([VALID_PAYLOAD, with_value("AMT_ANNUITY", 24903)]))
+    expected = CreditFeatures(**VALID_PAYLOAD).model_dump()
+
+    assert inputs == [expected, expected]
+    assert [type(value) for value in inputs[1].values()] == [type(value) for value in expected.values()]
+    assert rows.dtype == np.float32
+    np.testing.assert_array_equal(rows[0], np.array([expected[f] for f in FEATURE_ORDER], dtype=np.float32))
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("EXT_SOURCES_MEAN", True),
+        ("EXT_SOURCES_MEAN", "0.5"),
+        ("EXT_SOURCES_MEAN", None),
+        ("DAYS_BIRTH", -15750.0),
+        ("AMT_ANNUITY", 0.0),
+        ("DAYS_BIRTH", 0),
+        ("EXT_SOURCE_2", 1.0000001),
+        ("EXT_SOURCE_3", float("nan")),
+        ("INSTAL_AMT_PAYMENT_sum", 10**400),
+    ],
+)
+def test_anything_but_plain_in_range_numbers_is_left_to_pydantic(field, value):
+    assert feature_parser.check([with_value(field, value)]) is None
+
+
+def test_bounds_are_inclusive_or_strict_like_the_model():
+    edges = {"EXT_SOURCES_MEAN": 0.0, "EXT_SOURCE_2": 1.0, "DAYS_BIRTH": -30000, "AMT_ANNUITY": 5e-324}
+    assert feature_parser.check([{**VALID_PAYLOAD, **edges}]) is not None
+    assert feature_parser.check([with_value("DAYS_BIRTH", -1)]) is not None
+
+
+# === Fallback ===
+
+def test_coercions_fall_back_to_pydantic():
+    checked = parse_batch({"applicants": [with_value("EXT_SOURCES_MEAN", True) | {"DAYS_BIRTH": "-100"}]})
+    [data], _ = feature_parser.rows(checked)
+    assert data["EXT_SOURCES_MEAN"] == 1.0
+    assert data["DAYS_BIRTH"] == -100
+
+
+def test_errors_have_fastapi_body_locations():
+    errors = pydantic_errors(with_value("DAYS_BIRTH", 0))
+    assert [(e["type"], e["loc"]) for e in errors] == [("less_than", ("body", "DAYS_BIRTH"))]
+
+    with pytest.raises(RequestValidationError) as error:
+        parse_batch({"applicants": [{}]})
+    assert error.value.errors()[0]["loc"] == ("body", "applicants", 0, "EXT_SOURCES_MEAN")
+
+
+def test_bodies_are_decoded_like_fastapi_does(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    body = b'{"applicants": [' + json.dumps(VALID_PAYLOAD).encode() + b"]}"
+    with TestClient(app) as c:
+        bom = c.post("/predict/batch", content=b"\xef\xbb\xbf" + body, headers={"content-type": "application/vnd.api+json"})
+        truncated = c.post("/predict/batch", content=b'{"a":', headers={"content-type": "application/json"})
+        text = c.post("/predict/batch", content=body, headers={"content-type": "text/plain"})
+        empty = c.post("/predict/batch")
+
+    assert bom.status_code == 200
+    assert truncated.status_code == 422
+    assert truncated.json()["detail"] == [
+        {"type": "json_invalid", "loc": ["body", 5], "msg": "JSON decode error", "input": {}, "ctx": {"error": "Expecting value"}}
+    ]
+    assert text.status_code == 422
+    assert [(e["type"], e["loc"]) for e in empty.json()["detail"]] == [("missing", ["body"])]
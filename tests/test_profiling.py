@@ -0,0 +1,85 @@
+import asyncio
+import pstats
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.app import admin, app, lifespan
+from tests.test_api import VALID_PAYLOAD
+
+TOKEN = "test-admin-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture
+def admin_app(monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", TOKEN)
+    admin_app = FastAPI(lifespan=lifespan)
+    admin_app.include_router(admin)
+    admin_app.add_api_route("/predict", app_module.predict, methods=["POST"])
+    return admin_app
+
+
+# === Gating ===
+
+@pytest.mark.skipif(app_module.ADMIN_TOKEN is not None, reason="ADMIN_TOKEN is set")
+def test_admin_routes_are_not_registered_without_token():
+    with TestClient(app) as c:
+        assert c.post("/admin/profile/stacks", params={"seconds": 0.1}).status_code == 404
+
+
+def test_wrong_token_is_rejected(admin_app):
+    with TestClient(admin_app) as c:
+        assert c.post("/admin/profile/stacks", params={"seconds": 0.1}).status_code == 401
+        response = c.post("/admin/profile/stacks", params={"seconds": 0.1}, headers={"Authorization": "Bearer nope"})
+        assert response.status_code == 401
+        response = c.post(
+            "/admin/profile/stacks", params={"seconds": 0.1}, headers={"Authorization": "Bearer é".encode()}
+        )
+        assert response.status_code == 401
+
+
+# === Profilers ===
+
+def test_stack_samples_are_folded(admin_app):
+    with TestClient(admin_app) as c:
+        response = c.post("/admin/profile/stacks", params={"seconds": 0.2, "interval_ms": 5}, headers=AUTH)
+
+    assert response.status_code == 200
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert int(count) >= 1
+    assert ";" in stack
+
+
+def test_cprofile_dump_loads_with_pstats(admin_app, tmp_path):
+    with TestClient(admin_app) as c:
+        dump = c.post("/admin/profile/cprofile", params={"seconds": 0.1}, headers=AUTH)
+        text = c.post("/admin/profile/cprofile", params={"seconds": 0.1, "format": "text"}, headers=AUTH)
+
+    path = tmp_path / "api.pstats"
+    path.write_bytes(dump.content)
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert "function calls" in text.text
+
+
+def test_onnx_profile_records_operators_of_live_requests(admin_app):
+    async def main():
+        async with admin_app.router.lifespan_context(admin_app):
+            transport = httpx.ASGITransport(app=admin_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                async def predict_during_window():
+                    await asyncio.sleep(0.2)
+                    return await client.post("/predict", json=VALID_PAYLOAD)
+
+                return await asyncio.gather(
+                    client.post("/admin/profile/onnx", params={"seconds": 0.5}, headers=AUTH),
+                    predict_during_window(),
+                )
+
+    profile, prediction = asyncio.run(main())
+    assert prediction.status_code == 200
+    assert profile.status_code == 200
+    assert any(event.get("cat") == "Node" for event in profile.json())
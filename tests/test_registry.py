@@ -0,0 +1,190 @@
+import json
+import shutil
+import signal
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.app import FEATURE_ORDER, ONNX_MODEL_PATH, admin, app, lifespan
+from api.registry import load_registry, write_threshold
+from tests.conftest import write_manifest
+from tests.test_api import VALID_PAYLOAD
+
+AUTH = {"Authorization": "Bearer test-admin-token"}
+
+
+@pytest.fixture
+def manifest_versions():
+    return {
+        "primary": {"path": "model.onnx", "threshold": 0.10},
+        "strict": {"path": "model.onnx", "threshold": 0.0},
+    }
+
+
+# === Loading ===
+
+def test_without_manifest_the_bundled_model_is_served():
+    with TestClient(app) as c:
+        models = c.get("/models").json()
+    assert [(m["name"], m["threshold"], m["default"]) for m in models] == [("lightgbm_optimized", 0.10, True)]
+
+
+def test_feature_order_is_mapped_per_version(tmp_path):
+    shutil.copy(ONNX_MODEL_PATH, tmp_path / "model.onnx")
+    versions = {
+        "api-order": {"path": "model.onnx"},
+        "reversed": {"path": "model.onnx", "features": FEATURE_ORDER[::-1]},
+    }
+    write_manifest(tmp_path, versions, default="api-order")
+    registry = load_registry(tmp_path / "manifest.json", ONNX_MODEL_PATH, ONNX_MODEL_PATH, 0.10, FEATURE_ORDER)
+    try:
+        rows = np.random.default_rng(0).random((4, 10), dtype=np.float32)
+        reversed_version = registry.versions["reversed"]
+        np.testing.assert_array_equal(
+            reversed_version.predictor.predict_proba(reversed_version.inputs(rows)),
+            registry.default.predictor.predict_proba(rows[:, ::-1]),
+        )
+    finally:
+        for version in registry.versions.values():
+            version.predictor.close()
+
+
+def test_unknown_features_and_traffic_overflow_are_rejected(tmp_path):
+    shutil.copy(ONNX_MODEL_PATH, tmp_path / "model.onnx")
+    write_manifest(tmp_path, {"a": {"path": "model.onnx", "features": ["NOT_A_FEATURE"]}}, default="a")
+    with pytest.raises(ValueError, match="unknown features"):
+        load_registry(tmp_path / "manifest.json", ONNX_MODEL_PATH, ONNX_MODEL_PATH, 0.10, FEATURE_ORDER)
+
+    versions = {"a": {"path": "model.onnx"}, "b": {"path": "model.onnx", "traffic": 60}, "c": {"path": "model.onnx", "traffic": 60}}
+    write_manifest(tmp_path, versions, default="a")
+    with pytest.raises(ValueError, match="more than 100"):
+        load_registry(tmp_path / "manifest.json", ONNX_MODEL_PATH, ONNX_MODEL_PATH, 0.10, FEATURE_ORDER)
+
+
+# === Routing ===
+
+def test_header_pins_version_and_its_threshold(model_dir):
+    with TestClient(app) as c:
+        primary = c.post("/predict", json=VALID_PAYLOAD)
+        strict = c.post("/predict", json=VALID_PAYLOAD, headers={"X-Model-Version": "strict"})
+        unknown = c.post("/predict", json=VALID_PAYLOAD, headers={"X-Model-Version": "nope"})
+
+    assert primary.headers["X-Model-Version"] == "primary"
+    assert strict.headers["X-Model-Version"] == "strict"
+    assert strict.json()["probability_default"] == primary.json()["probability_default"]
+    assert strict.json()["credit_decision"] == "denied"
+    assert unknown.status_code == 404
+
+    lines = [json.loads(line) for line in (model_dir / "predictions.jsonl").read_text().splitlines()]
+    assert [line["model_version"] for line in lines] == ["primary", "strict"]
+
+
+def test_traffic_percentage_routes_unpinned_requests(model_dir):
+    write_manifest(
+        model_dir,
+        {"primary": {"path": "model.onnx"}, "candidate": {"path": "model.onnx", "traffic": 100}},
+        default="primary",
+    )
+    with TestClient(app) as c:
+        versions = {c.post("/predict", json=VALID_PAYLOAD).headers["X-Model-Version"] for _ in range(5)}
+        batch = c.post("/predict/batch", json={"applicants": [VALID_PAYLOAD] * 2})
+    assert versions == {"candidate"}
+    assert batch.headers["X-Model-Version"] == "candidate"
+
+
+# === Hot reload ===
+
+@pytest.fixture
+def admin_app(model_dir, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "test-admin-token")
+    admin_app = FastAPI(lifespan=lifespan)
+    admin_app.include_router(admin)
+    admin_app.add_api_route("/predict", app_module.predict, methods=["POST"])
+    return admin_app
+
+
+def test_reload_swaps_versions_and_clears_cache(admin_app, model_dir, monkeypatch):
+    monkeypatch.setenv("PREDICTION_CACHE_SIZE", "10")
+    with TestClient(admin_app) as c:
+        c.post("/predict", json=VALID_PAYLOAD)
+        previous = app_module.registry
+        assert len(app_module.prediction_cache) == 1
+
+        write_manifest(model_dir, {"v2": {"path": "model.onnx", "threshold": 0.5}}, default="v2")
+        reloaded = c.post("/admin/models/reload", headers=AUTH)
+        after = c.post("/predict", json=VALID_PAYLOAD)
+
+    assert reloaded.status_code == 200
+    assert [m["name"] for m in reloaded.json()] == ["v2"]
+    assert previous.default.predictor._executor._shutdown
+    assert after.headers["X-Model-Version"] == "v2"
+
+
+def test_failed_reload_keeps_current_versions(admin_app, model_dir):
+    with TestClient(admin_app) as c:
+        write_manifest(model_dir, {"broken": {"path": "missing.onnx"}}, default="broken")
+        assert c.post("/admin/models/reload", headers=AUTH).status_code == 500
+        response = c.post("/predict", json=VALID_PAYLOAD)
+
+    assert response.status_code == 200
+    assert response.headers["X-Model-Version"] == "primary"
+
+
+def test_threshold_update_applies_live_and_to_the_manifest(admin_app, model_dir):
+    with TestClient(admin_app) as c:
+        updated = c.put("/admin/models/strict/threshold", json={"threshold": 0.99}, headers=AUTH)
+        response = c.post("/predict", json=VALID_PAYLOAD, headers={"X-Model-Version": "strict"})
+        live_only = c.put("/admin/models/primary/threshold", params={"persist": False}, json={"threshold": 0.5}, headers=AUTH)
+        unknown = c.put("/admin/models/nope/threshold", json={"threshold": 0.5}, headers=AUTH)
+        invalid = c.put("/admin/models/strict/threshold", json={"threshold": 1.5}, headers=AUTH)
+
+    assert updated.status_code == live_only.status_code == 200
+    assert {m["name"]: m["threshold"] for m in live_only.json()} == {"primary": 0.5, "strict": 0.99}
+    assert response.json()["credit_decision"] == "approved"
+    manifest = json.loads((model_dir / "manifest.json").read_text())
+    assert {name: entry["threshold"] for name, entry in manifest["versions"].items()} == {"primary": 0.10, "strict": 0.99}
+    assert (unknown.status_code, invalid.status_code) == (404, 422)
+
+
+def test_threshold_update_needs_the_manifest_with_several_workers(admin_app, monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    with TestClient(admin_app) as c:
+        live_only = c.put("/admin/models/primary/threshold", params={"persist": False}, json={"threshold": 0.5}, headers=AUTH)
+        monkeypatch.delenv("MODEL_MANIFEST")
+        no_manifest = c.put("/admin/models/primary/threshold", json={"threshold": 0.5}, headers=AUTH)
+        threshold = app_module.registry.default.threshold
+
+    assert live_only.status_code == no_manifest.status_code == 409
+    assert threshold == 0.10
+
+
+def test_threshold_update_needs_api_serve_with_several_workers(admin_app, monkeypatch):
+    # uvicorn --workers sets WEB_CONCURRENCY but has no supervisor to signal.
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    monkeypatch.delenv("API_SUPERVISOR_PID", raising=False)
+    with TestClient(admin_app) as c:
+        response = c.put("/admin/models/primary/threshold", json={"threshold": 0.5}, headers=AUTH)
+        threshold = app_module.registry.default.threshold
+
+    assert response.status_code == 409
+    assert threshold == 0.10
+
+
+def test_threshold_update_reaches_every_worker(admin_app, model_dir, monkeypatch):
+    signals = []
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    monkeypatch.setenv("API_SUPERVISOR_PID", "4242")
+    monkeypatch.setattr(app_module.os, "kill", lambda pid, signum: signals.append((pid, signum)))
+    with TestClient(admin_app) as c:
+        updated = c.put("/admin/models/strict/threshold", json={"threshold": 0.99}, headers=AUTH)
+        # What another worker does on the forwarded signal.
+        write_threshold(model_dir / "manifest.json", "primary", 0.3)
+        c.portal.call(app_module.reload_thresholds)
+        thresholds = {name: version.threshold for name, version in app_module.registry.versions.items()}
+
+    assert updated.status_code == 200
+    assert signals == [(4242, signal.SIGUSR1)]
+    assert thresholds == {"primary": 0.3, "strict": 0.99}
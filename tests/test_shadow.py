@@ -0,0 +1,131 @@
+import asyncio
+import json
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api.shadow as shadow
+from api.app import app
+from api.jsonl_log import RotatingJsonlLog
+from api.shadow import ShadowScorer
+from tests.test_api import VALID_PAYLOAD
+
+
+@pytest.fixture
+def manifest_versions():
+    return {
+        "primary": {"path": "model.onnx", "threshold": 0.10},
+        "candidate": {"path": "model.onnx", "threshold": 0.0, "shadow": True},
+    }
+
+
+# === Queue ===
+
+class FakeVersion:
+    name = "fake"
+    threshold = 0.5
+
+
+def test_rows_beyond_queue_limit_are_dropped():
+    scorer = ShadowScorer([], max_queue_rows=3)
+    dropped_before = shadow.ROWS_DROPPED.value()
+    rows = np.zeros((2, 10), dtype=np.float32)
+
+    scorer.submit([{}, {}], rows, FakeVersion(), [0.1, 0.2])
+    scorer.submit([{}, {}], rows, FakeVersion(), [0.1, 0.2])
+
+    assert scorer._queued_rows == 2
+    assert shadow.ROWS_DROPPED.value() - dropped_before == 2
+
+
+def test_stop_scores_rows_still_queued(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+
+    class EchoVersion(FakeVersion):
+        name = "echo"
+
+        def use(self):
+            return nullcontext(self)
+
+        async def run(self, rows):
+            return rows[:, 0]
+
+    async def main():
+        scorer = ShadowScorer([EchoVersion()], max_batch_size=2)
+        rows = np.array([[0.9] + [0] * 9, [0.1] + [0] * 9, [0.7] + [0] * 9], dtype=np.float32)
+        for row in rows:
+            scorer.submit([{}], row[None], FakeVersion(), [0.6])
+        await scorer.stop()
+
+    asyncio.run(main())
+    lines = [json.loads(line) for line in (tmp_path / "shadow_predictions.jsonl").read_text().splitlines()]
+    assert [line["prediction"] for line in lines] == [1, 0, 1]
+    assert [line["primary_prediction"] for line in lines] == [1, 1, 1]
+
+
+def test_shadow_log_is_rotated(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    log = RotatingJsonlLog(tmp_path / "shadow_predictions.jsonl", max_bytes=1, compression="none")
+    scorer = ShadowScorer([], log=log)
+    entry = {"timestamp": datetime.now(timezone.utc), "model_version": "fake"}
+
+    asyncio.run(scorer._write([entry]))
+    asyncio.run(scorer._write([entry]))
+
+    assert len(log.segments()) == 2
+    assert not log.path.exists()
+
+
+def test_shadow_segments_are_replayed_into_their_table(monkeypatch):
+    monkeypatch.setattr(shadow, "is_db_enabled", lambda: True)
+    replayed = []
+
+    def replay_segments(log, table):
+        replayed.append((log.path, table))
+        return 2
+
+    monkeypatch.setattr(shadow, "replay_segments", replay_segments)
+    replayed_before = shadow.ROWS_REPLAYED.value()
+
+    async def main():
+        scorer = ShadowScorer([])
+        scorer.start()
+        await scorer.stop()
+
+    asyncio.run(main())
+    assert replayed == [(shadow.LOG_FILE, "shadow_predictions")]
+    assert shadow.ROWS_REPLAYED.value() - replayed_before == 2
+
+
+# === Serving ===
+
+def test_shadow_scores_are_logged_next_to_served_ones(model_dir):
+    with TestClient(app) as c:
+        single = c.post("/predict", json=VALID_PAYLOAD)
+        batch = c.post("/predict/batch", json={"applicants": [VALID_PAYLOAD] * 2})
+
+    assert single.headers["X-Model-Version"] == "primary"
+    assert batch.headers["X-Model-Version"] == "primary"
+    lines = [json.loads(line) for line in (model_dir / "shadow_predictions.jsonl").read_text().splitlines()]
+    assert len(lines) == 3
+    for line in lines:
+        assert line["model_version"] == "candidate"
+        assert line["primary_version"] == "primary"
+        assert line["primary_probability"] == single.json()["probability_default"]
+        assert line["probability_default"] == line["primary_probability"]
+        assert line["prediction"] == 1
+
+
+def test_shadow_versions_are_listed_but_never_serve(model_dir):
+    with TestClient(app) as c:
+        models = c.get("/models").json()
+        pinned = c.post("/predict", json=VALID_PAYLOAD, headers={"X-Model-Version": "candidate"})
+
+    assert [(m["name"], m["default"], m["shadow"]) for m in models] == [
+        ("primary", True, False),
+        ("candidate", False, True),
+    ]
+    assert pinned.status_code == 404
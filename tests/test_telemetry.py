@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.app import app
+from api.log_writer import FLUSH_SECONDS
+from api.telemetry import EXCEPTIONS, REQUESTS, STAGE_SECONDS
+from tests.test_api import VALID_PAYLOAD
+
+STAGES = ("validation", "array_build", "inference", "model_run", "log_enqueue")
+
+
+# === Request metrics ===
+
+def test_requests_are_counted_by_route_template_and_status():
+    before = {
+        status: REQUESTS.value(method="POST", route="/predict", status=status) for status in ("200", "422")
+    }
+    unmatched = REQUESTS.value(method="GET", route="unmatched", status="404")
+
+    with TestClient(app) as c:
+        c.post("/predict", json=VALID_PAYLOAD)
+        c.post("/predict", json={})
+        c.get("/no-such-path")
+
+    assert REQUESTS.value(method="POST", route="/predict", status="200") == before["200"] + 1
+    assert REQUESTS.value(method="POST", route="/predict", status="422") == before["422"] + 1
+    assert REQUESTS.value(method="GET", route="unmatched", status="404") == unmatched + 1
+
+
+def test_unhandled_exceptions_are_counted(monkeypatch):
+    async def fail(*args):
+        raise RuntimeError("boom")
+
+    before = EXCEPTIONS.value(route="/predictions", exception="RuntimeError")
+    monkeypatch.setattr(app_module, "is_db_enabled", lambda: True)
+    monkeypatch.setattr(app_module, "get_predictions", fail)
+
+    with TestClient(app, raise_server_exceptions=False) as c:
+        assert c.get("/predictions").status_code == 500
+
+    assert EXCEPTIONS.value(route="/predictions", exception="RuntimeError") == before + 1
+    assert REQUESTS.value(method="GET", route="/predictions", status="500") >= 1
+
+
+# === Prediction stages ===
+
+def test_predict_observes_every_stage(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    before = {name: STAGE_SECONDS.count(stage=name) for name in STAGES}
+    flushes = FLUSH_SECONDS.count(sink="jsonl")
+
+    with TestClient(app) as c:
+        c.post("/predict", json=VALID_PAYLOAD)
+        assert 'prediction_stage_seconds_bucket{stage="inference"' in c.get("/metrics").text
+
+    assert all(STAGE_SECONDS.count(stage=name) == before[name] + 1 for name in STAGES)
+    assert FLUSH_SECONDS.count(sink="jsonl") == flushes + 1
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.metrics import confusion_matrix
+
+import api.app as app_module
+from api.app import app
+from api.thresholds import ThresholdCurve, analyze, threshold_grid
+from tests.test_api import VALID_PAYLOAD
+
+
+def outcomes(n: int = 5000, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    labels = (rng.random(n) < 0.1).astype(int)
+    probabilities = np.clip(rng.beta(2, 8, n) + 0.3 * labels, 0, 1).round(3)
+    return probabilities, labels
+
+
+# === Engine ===
+
+def test_curve_matches_a_confusion_matrix_per_threshold():
+    probabilities, labels = outcomes()
+    table = ThresholdCurve(probabilities, labels).table(threshold_grid(0.05))
+
+    for i, threshold in enumerate(table["threshold"]):
+        tn, fp, fn, tp = confusion_matrix(labels, probabilities >= threshold, labels=[0, 1]).ravel()
+        assert (table["tn"][i], table["fp"][i], table["fn"][i], table["tp"][i]) == (tn, fp, fn, tp)
+        assert table["cost"][i] == fp + 10 * fn
+
+
+def test_optimal_threshold_is_the_cheapest_over_all_scores():
+    probabilities, labels = outcomes()
+    candidates = np.r_[np.unique(probabilities), 2.0]
+    costs = [((probabilities >= t) & (labels == 0)).sum() + 10 * ((probabilities < t) & (labels == 1)).sum() for t in candidates]
+
+    optimal = ThresholdCurve(probabilities, labels).optimal()
+    assert optimal["cost"] == min(costs)
+    assert optimal["threshold"] == candidates[len(costs) - 1 - np.argmin(costs[::-1])]
+
+
+def test_costs_and_ties():
+    curve = ThresholdCurve([0.2, 0.2, 0.6, 0.9], [0, 1, 0, 1])
+    assert curve.point(0.2, cost_fp=1, cost_fn=1) | {"threshold": 0} == {
+        "threshold": 0, "cost": 2.0, "tn": 0, "fp": 2, "fn": 0, "tp": 2, "recall": 1.0, "precision": 0.5, "f1": 2 / 3,
+    }
+    # 0.6 and 0.9 both cost 1: the higher threshold denies fewer applicants.
+    assert curve.optimal(cost_fp=1, cost_fn=1)["threshold"] == 0.9
+    assert ThresholdCurve([], []).optimal()["cost"] == 0
+
+
+def test_mismatched_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        ThresholdCurve([0.1, 0.2], [1])
+
+
+# === Endpoints ===
+
+def test_outcome_analysis():
+    probabilities, labels = outcomes(500)
+    payload = {"probabilities": probabilities.tolist(), "labels": labels.tolist(), "cost_fn": 5, "step": 0.25}
+    with TestClient(app) as c:
+        response = c.post("/thresholds/analysis", json=payload)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body == analyze(ThresholdCurve(probabilities, labels), cost_fn=5, step=0.25)
+    assert [point["threshold"] for point in body["curve"]] == [0, 0.25, 0.5, 0.75, 1]
+    assert body["current"] is None
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"probabilities": [0.1, 0.2], "labels": [1]},
+        {"probabilities": [0.1], "labels": [2]},
+        {"probabilities": [], "labels": []},
+    ],
+)
+def test_invalid_outcomes_return_422(payload):
+    with TestClient(app) as c:
+        assert c.post("/thresholds/analysis", json=payload).status_code == 422
+
+
+def test_reference_analysis_is_scored_once_per_model(monkeypatch):
+    calls = []
+
+    async def fake_get_labeled_reference(limit):
+        calls.append(limit)
+        return [(*VALID_PAYLOAD.values(), label) for label in (0, 1, 0)]
+
+    monkeypatch.setattr(app_module, "is_db_enabled", lambda: True)
+    monkeypatch.setattr(app_module, "get_labeled_reference", fake_get_labeled_reference)
+    with TestClient(app) as c:
+        served = app_module.registry.default.predictor
+        monkeypatch.setattr(served, "run", None)
+        name = c.get("/models").json()[0]["name"]
+        first = c.get(f"/models/{name}/thresholds", params={"cost_fn": 2})
+        second = c.get(f"/models/{name}/thresholds")
+        unknown = c.get("/models/nope/thresholds")
+
+    assert first.status_code == second.status_code == 200
+    assert calls == [50_000]
+    assert (first.json()["rows"], first.json()["positives"], first.json()["cost_fn"]) == (3, 1, 2)
+    assert second.json()["current"]["threshold"] == app_module.OPTIMAL_THRESHOLD
+    assert unknown.status_code == 404
+
+
+def test_reference_analysis_requires_database():
+    with TestClient(app) as c:
+        name = c.get("/models").json()[0]["name"]
+        assert c.get(f"/models/{name}/thresholds").status_code == 503
@@ -0,0 +1,103 @@
+import numpy as np
+import onnxruntime as ort
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import ONNX_MODEL_PATH, TREE_MODEL_PATH, app
+from api.tree_backend import TreeEnsemble, _Node
+from tests.test_api import VALID_PAYLOAD
+
+
+def applicant_rows(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = rng.random((n, 10), dtype=np.float32)
+    rows[:, 4] *= 1e6
+    rows[:, 5] *= 5e4
+    rows[:, 6] *= 20
+    rows[:, 7] = -rng.integers(7000, 25000, n)
+    rows[:, 8] *= 3
+    return rows
+
+
+def onnx_probabilities(rows: np.ndarray) -> np.ndarray:
+    session = ort.InferenceSession(str(ONNX_MODEL_PATH))
+    (probabilities,) = session.run(["probabilities"], {"features": rows})
+    return np.array([p[1] for p in probabilities])
+
+
+def walk(node: _Node, row: np.ndarray) -> float:
+    while not node.is_leaf:
+        value = row[node.feature]
+        left = node.missing_left if np.isnan(value) else value <= node.threshold
+        node = node.left if left else node.right
+    return node.value
+
+
+# === Parity with ONNX Runtime ===
+
+def test_compiled_artifact_matches_onnx():
+    rows = applicant_rows(2000)
+    ensemble = TreeEnsemble.load(TREE_MODEL_PATH)
+    np.testing.assert_allclose(ensemble.predict_proba(rows), onnx_probabilities(rows), atol=1e-6)
+
+
+def test_missing_values_follow_onnx_default_direction():
+    rows = applicant_rows(50, seed=1)
+    rows[::3, 0] = np.nan
+    rows[1::4, 2] = np.nan
+    rows[7] = np.nan
+    ensemble = TreeEnsemble.load(TREE_MODEL_PATH)
+    np.testing.assert_allclose(ensemble.predict_proba(rows), onnx_probabilities(rows), atol=1e-6)
+
+
+def test_compile_from_onnx_matches_saved_artifact(tmp_path):
+    pytest.importorskip("onnx")
+    compiled = TreeEnsemble.from_onnx(ONNX_MODEL_PATH)
+    compiled.save(tmp_path / "trees.npz")
+    rows = applicant_rows(100)
+    np.testing.assert_array_equal(
+        TreeEnsemble.load(tmp_path / "trees.npz").predict_proba(rows),
+        TreeEnsemble.load(TREE_MODEL_PATH).predict_proba(rows),
+    )
+
+
+# === Unbalanced and deeper trees ===
+
+@pytest.mark.parametrize("depth", [1, 4, 6])
+def test_random_trees_match_naive_walk(depth):
+    rng = np.random.default_rng(depth)
+
+    def grow(level: int) -> _Node:
+        if level == depth or (level > 0 and rng.random() < 0.3):
+            return _Node(value=rng.normal())
+        return _Node(
+            feature=int(rng.integers(0, 4)),
+            threshold=np.float32(rng.random()),
+            missing_left=bool(rng.random() < 0.5),
+            left=grow(level + 1),
+            right=grow(level + 1),
+        )
+
+    roots = [grow(0) for _ in range(25)]
+    roots[0] = _Node(feature=0, threshold=np.float32(0.5), left=grow(depth - 1), right=_Node(value=1.0))
+    ensemble = TreeEnsemble.from_trees(roots, base_score=0.25)
+
+    rows = rng.random((200, 4), dtype=np.float32)
+    rows[::7, 1] = np.nan
+    expected = [0.25 + sum(walk(root, row) for root in roots) for row in rows]
+    np.testing.assert_allclose(ensemble.decision_function(rows), expected, rtol=1e-12)
+
+
+# === API integration ===
+
+def test_predict_with_numpy_backend(monkeypatch):
+    with TestClient(app) as c:
+        expected = c.post("/predict", json=VALID_PAYLOAD).json()
+
+    monkeypatch.setenv("INFERENCE_BACKEND", "numpy")
+    with TestClient(app) as c:
+        data = c.post("/predict", json=VALID_PAYLOAD).json()
+        assert c.get("/health").json()["model_loaded"] is True
+
+    assert data["credit_decision"] == expected["credit_decision"]
+    assert data["probability_default"] == pytest.approx(expected["probability_default"], abs=1e-6)
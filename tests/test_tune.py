@@ -0,0 +1,80 @@
+import json
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("optuna")
+pytest.importorskip("lightgbm")
+
+from optuna.distributions import FloatDistribution
+from optuna.trial import TrialState
+
+from training import tune
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 4))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=400) > 1.2).astype(int)
+    df = pd.DataFrame(X, columns=[f"f{i}" for i in range(4)])
+    df["SK_ID_CURR"] = range(400)
+    df["TARGET"] = y
+    path = tmp_path / "data.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["tune", *args])
+    tune.main()
+
+
+# === Objective ===
+
+def test_business_cost_weights_false_negatives():
+    assert tune.business_cost([0, 0, 1, 1], [1, 0, 0, 0]) == 21.0
+
+
+def test_threshold_analysis_matches_notebook_layout():
+    table = tune.threshold_analysis([0, 1, 0, 1], [0.2, 0.8, 0.6, 0.4])
+    assert list(table.columns) == ["threshold", "cost", "tn", "fp", "fn", "tp", "recall", "precision", "f1"]
+    assert len(table) == 17
+    row = table.iloc[np.argmin(np.abs(table["threshold"] - 0.5))]
+    assert (row["tn"], row["fp"], row["fn"], row["tp"], row["cost"]) == (1, 1, 1, 1, 11)
+
+
+# === Search ===
+
+def test_parallel_search_writes_results_and_resumes(monkeypatch, dataset, tmp_path):
+    results = tmp_path / "results"
+    options = ["--models", "lightgbm", "--folds", "2", "--jobs", "2", "--data", str(dataset), "--results", str(results)]
+    run(monkeypatch, *options, "--trials", "4")
+
+    saved = json.loads((results / "optimal_hyperparameters.json").read_text())
+    assert set(saved) == {"timestamp", "lightgbm"}
+    assert saved["lightgbm"]["n_trials"] == 4
+    assert saved["lightgbm"]["best_cost"] <= 0
+    assert {"n_estimators", "num_leaves", "reg_lambda"} <= set(saved["lightgbm"]["best_params"])
+    with open(results / "lightgbm_optimized.pkl", "rb") as f:
+        assert pickle.load(f).get_params()["class_weight"] == "balanced"
+    assert len(pd.read_csv(results / "threshold_analysis_lightgbm_optimisé.csv")) == 17
+
+    run(monkeypatch, *options, "--trials", "6")
+    study = tune.load_study("lightgbm", tune.journal_path("lightgbm", results))
+    assert tune.finished_trials(study) == 6
+    assert json.loads((results / "optimal_hyperparameters.json").read_text())["lightgbm"]["n_trials"] == 6
+
+
+def test_interrupted_trials_are_requeued(tmp_path):
+    study = tune.load_study("lightgbm", tmp_path / "study.log")
+    trial = study.ask({"x": FloatDistribution(0, 1)})
+
+    assert tune.recover_interrupted(study) == 1
+    states = [t.state for t in study.get_trials(deepcopy=False)]
+    assert states == [TrialState.FAIL, TrialState.WAITING]
+    assert study.get_trials(deepcopy=False)[1].system_attrs["fixed_params"] == trial.params
+    assert tune.recover_interrupted(study) == 0
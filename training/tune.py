@@ -0,0 +1,282 @@
+"""Tune LightGBM and XGBoost hyperparameters with parallel, resumable Optuna studies.
+
+The search of ``train_model_improved_top_10.ipynb`` as a script: the same
+stratified 80/20 split, search spaces and class balancing, and the business
+cost (10 per false negative, 1 per false positive) averaged over
+``--folds`` stratified folds of the training set. Each study is shared by
+``--jobs`` worker processes through an Optuna journal file
+(``results/optuna/<model>.log``), which takes file locks, so no database is
+needed. A trial reports its mean cost after every fold and is pruned as soon
+as it is worse than the median of earlier trials at the same fold.
+
+Studies are resumable: running the command again continues until each study
+has ``--trials`` finished (complete or pruned) trials; failed trials are run
+again. Trials that an
+interrupted run left running are marked failed and queued again with their
+parameters. Once a study is done, the best parameters are refit on the whole
+training set (with the class balancing the trials used), scored on the test
+set, and written to ``results/`` as before: ``optimal_hyperparameters.json``,
+``<model>_optimized.pkl`` and ``threshold_analysis_<model>_optimisé.csv``.
+Convert a new LightGBM model to ONNX before serving it, and review the
+optimal threshold printed at the end.
+
+Usage:
+    uv run python -m training.tune
+    uv run python -m training.tune --models lightgbm --trials 100 --jobs 4
+"""
+
+import argparse
+import fcntl
+import json
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import confusion_matrix, f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from api.thresholds import ThresholdCurve
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DATA_PATH = PROJECT_ROOT / "data" / "dataset_top10_features_data.csv"
+RESULTS_DIR = PROJECT_ROOT / "results"
+
+MODELS = ("lightgbm", "xgboost")
+N_TRIALS = 50
+N_FOLDS = 3
+SEED = 42
+COST_FN = 10
+COST_FP = 1
+# Thresholds of the saved analysis, as in the notebook.
+ANALYSIS_THRESHOLDS = np.arange(0.1, 0.91, 0.05)
+
+
+def load_split(path: Path = DATA_PATH) -> tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
+    df = pd.read_csv(path)
+    X = df.drop(columns=["TARGET", "SK_ID_CURR"], errors="ignore")
+    y = df["TARGET"]
+    return train_test_split(X, y, test_size=0.2, random_state=SEED, stratify=y)
+
+
+def business_cost(y_true, y_pred) -> float:
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    return float(fn * COST_FN + fp * COST_FP)
+
+
+def suggest_params(trial, model: str) -> dict:
+    params = {
+        "n_estimators": trial.suggest_int("n_estimators", 100, 500),
+        "max_depth": trial.suggest_int("max_depth", 3, 10),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3, log=True),
+    }
+    if model == "lightgbm":
+        params["num_leaves"] = trial.suggest_int("num_leaves", 20, 100)
+        params["min_child_samples"] = trial.suggest_int("min_child_samples", 5, 50)
+    else:
+        params["min_child_weight"] = trial.suggest_int("min_child_weight", 1, 10)
+        params["gamma"] = trial.suggest_float("gamma", 0, 1.0)
+    params["subsample"] = trial.suggest_float("subsample", 0.6, 1.0)
+    params["colsample_bytree"] = trial.suggest_float("colsample_bytree", 0.6, 1.0)
+    params["reg_alpha"] = trial.suggest_float("reg_alpha", 1e-8, 10.0, log=True)
+    params["reg_lambda"] = trial.suggest_float("reg_lambda", 1e-8, 10.0, log=True)
+    return params
+
+
+def build_model(model: str, params: dict, y_train: pd.Series, threads: int = -1):
+    # The tuned parameters plus the fixed ones: class balancing and seeding.
+    if model == "lightgbm":
+        import lightgbm as lgb
+
+        return lgb.LGBMClassifier(
+            **params, class_weight="balanced", random_state=SEED, n_jobs=threads, verbose=-1
+        )
+    import xgboost as xgb
+
+    return xgb.XGBClassifier(
+        **params,
+        scale_pos_weight=(y_train == 0).sum() / (y_train == 1).sum(),
+        random_state=SEED,
+        n_jobs=threads,
+        eval_metric="logloss",
+    )
+
+
+def objective(model: str, X: pd.DataFrame, y: pd.Series, folds: int, threads: int):
+    import optuna
+
+    # Unshuffled stratified folds, the split cross_validate(cv=folds) used.
+    splits = list(StratifiedKFold(n_splits=folds).split(X, y))
+
+    def evaluate(trial) -> float:
+        params = suggest_params(trial, model)
+        costs = []
+        for fold, (train, valid) in enumerate(splits):
+            estimator = build_model(model, params, y.iloc[train], threads)
+            estimator.fit(X.iloc[train], y.iloc[train])
+            costs.append(business_cost(y.iloc[valid], estimator.predict(X.iloc[valid])))
+            trial.report(float(np.mean(costs)), fold)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+        return float(np.mean(costs))
+
+    return evaluate
+
+
+def journal_path(model: str, root: Path = RESULTS_DIR) -> Path:
+    return root / "optuna" / f"{model}.log"
+
+
+def load_study(model: str, path: Path, seed: int = SEED):
+    import optuna
+    from optuna.storages import JournalStorage
+    from optuna.storages.journal import JournalFileBackend
+
+    return optuna.create_study(
+        study_name=model,
+        storage=JournalStorage(JournalFileBackend(str(path))),
+        direction="minimize",
+        sampler=optuna.samplers.TPESampler(seed=seed, constant_liar=True),
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=5),
+        load_if_exists=True,
+    )
+
+
+def finished_trials(study) -> int:
+    from optuna.trial import TrialState
+
+    return len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)))
+
+
+def recover_interrupted(study) -> int:
+    # Journal storage has no heartbeat: trials still running when a run starts
+    # (the run lock guarantees no other run is live) were cut off.
+    from optuna.trial import TrialState
+
+    storage = study._storage
+    study_id = storage.get_study_id_from_name(study.study_name)
+    stale = study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+    for trial in stale:
+        storage.set_trial_state_values(
+            storage.get_trial_id_from_study_id_trial_number(study_id, trial.number), TrialState.FAIL
+        )
+        study.enqueue_trial(trial.params)
+    return len(stale)
+
+
+def run_worker(model: str, path: Path, data_path: Path, n_trials: int, folds: int, seed: int, threads: int):
+    import optuna
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    X_train, _, y_train, _ = load_split(data_path)
+    study = load_study(model, path, seed)
+    study.optimize(objective(model, X_train, y_train, folds, threads), n_trials=n_trials)
+
+
+def tune(model: str, path: Path, data_path: Path, n_trials: int, folds: int, jobs: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    study = load_study(model, path)
+    recovered = recover_interrupted(study)
+    if recovered:
+        print(f"  Requeued {recovered} trials interrupted by an earlier run")
+    done = finished_trials(study)
+    if done >= n_trials:
+        print(f"  {done} trials already finished")
+        return study
+
+    # Each worker gets its share of the remaining trials, so the study stops at
+    # n_trials exactly, and of the cores, so they don't oversubscribe them.
+    remaining = n_trials - done
+    jobs = min(jobs, remaining)
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    print(f"  {done}/{n_trials} trials finished, running the rest on {jobs} workers x {threads} threads...")
+    # Spawned, not forked: LightGBM's OpenMP runtime does not survive a fork.
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+        workers = [
+            pool.submit(
+                run_worker, model, path, data_path, remaining // jobs + (worker < remaining % jobs),
+                folds, SEED + worker, threads,
+            )
+            for worker in range(jobs)
+        ]
+        for worker in workers:
+            worker.result()
+    return load_study(model, path)
+
+
+def threshold_analysis(y_true, probabilities) -> pd.DataFrame:
+    table = ThresholdCurve(probabilities, np.asarray(y_true)).table(ANALYSIS_THRESHOLDS, COST_FP, COST_FN)
+    return pd.DataFrame(table).astype({name: int for name in ("cost", "tn", "fp", "fn", "tp")})
+
+
+def save_results(model: str, study, data_path: Path, results_dir: Path) -> dict:
+    X_train, X_test, y_train, y_test = load_split(data_path)
+    estimator = build_model(model, study.best_params, y_train)
+    estimator.fit(X_train, y_train)
+    probabilities = estimator.predict_proba(X_test)[:, 1]
+    predictions = estimator.predict(X_test)
+    print(f"  AUC-ROC  : {roc_auc_score(y_test, probabilities):.4f}")
+    print(f"  Recall   : {recall_score(y_test, predictions):.4f}")
+    print(f"  Precision: {precision_score(y_test, predictions, zero_division=0):.4f}")
+    print(f"  F1-score : {f1_score(y_test, predictions):.4f}")
+    print(f"  Cost     : {business_cost(y_test, predictions):.0f}")
+
+    with open(results_dir / f"{model}_optimized.pkl", "wb") as f:
+        pickle.dump(estimator, f)
+    threshold_analysis(y_test, probabilities).to_csv(results_dir / f"threshold_analysis_{model}_optimisé.csv", index=False)
+    optimal = ThresholdCurve(probabilities, np.asarray(y_test)).optimal(COST_FP, COST_FN)
+    print(f"  Optimal threshold: {optimal['threshold']:.4f} (cost {optimal['cost']:.0f})")
+
+    # Same layout as the notebook, including the negated cost.
+    return {
+        "best_params": study.best_params,
+        "best_cost": float(-study.best_value),
+        "n_trials": finished_trials(study),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS))
+    parser.add_argument("--trials", type=int, default=N_TRIALS, help="Finished trials per study")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes per study")
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="Training dataset CSV")
+    parser.add_argument("--results", type=Path, default=RESULTS_DIR, help="Output directory")
+    args = parser.parse_args()
+
+    import optuna
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    args.results.mkdir(parents=True, exist_ok=True)
+    params_path = args.results / "optimal_hyperparameters.json"
+    lock_path = args.results / "optuna" / "tune.lock"
+    lock_path.parent.mkdir(exist_ok=True)
+    with open(lock_path, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            parser.exit(1, f"Another tuning run holds {lock_path}\n")
+
+        optimal = json.loads(params_path.read_text()) if params_path.exists() else {}
+        for model in args.models:
+            started = time.perf_counter()
+            print(f"Tuning {model} ({args.trials} trials, {args.folds}-fold cost)...")
+            study = tune(model, journal_path(model, args.results), args.data, args.trials, args.folds, args.jobs)
+            print(f"  Best CV cost {study.best_value:.0f} in {time.perf_counter() - started:.0f}s")
+            print(f"Training {model} with the best parameters...")
+            optimal[model] = save_results(model, study, args.data, args.results)
+            # Written after each model, so a later failure keeps this one.
+            optimal["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            params_path.write_text(json.dumps(optimal, indent=4))
+
+    print(f"\nWritten {params_path}")
+
+
+if __name__ == "__main__":
+    main()